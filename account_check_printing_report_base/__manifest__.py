@@ -6,7 +6,7 @@
 
 {
     "name": "Account Check Printing Report Base",
-    "version": "14.0.1.0.0",
+    "version": "14.0.1.1.0",
     "license": "AGPL-3",
     "author": "ForgeFlow,"
     "Serpent Consulting Services Pvt. Ltd.,"
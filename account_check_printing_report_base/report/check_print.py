@@ -132,7 +132,7 @@ class ReportPromissoryNotePrint(models.AbstractModel):
     _description = "Report Promissory Note Print for A4"
 
     def amount2words(self, amount):
-        return lang.num2words_custom(
+        return lang.amount_to_words(
             amount, to="currency", lang=self.env.context.get("lang", "en_US")
         )
 
@@ -1,9 +1,17 @@
+import math
+from functools import lru_cache
+
 from num2words import CONVERTER_CLASSES, CONVERTES_TYPES, num2words
 from num2words.base import Num2Word_Base
 from num2words.lang_ES import Num2Word_ES
 
+from odoo.tools import float_round
+
 num2words_by_lang = {"es": "Num2WordESCustom"}
 
+# Number of conversions kept by ``cached_num2words``
+NUM2WORDS_CACHE_SIZE = 8192
+
 
 class Num2WordESCustom(Num2Word_ES):
     CURRENCY_FORMS = Num2Word_ES.CURRENCY_FORMS.copy()
@@ -38,3 +46,48 @@ def num2words_custom(number, ordinal=False, lang="en", to="cardinal", **kwargs):
         if to not in CONVERTES_TYPES:
             raise NotImplementedError()
         return getattr(converter, "to_{}".format(to))(number, **kwargs)
+
+
+@lru_cache(maxsize=NUM2WORDS_CACHE_SIZE)
+def cached_num2words(number, lang="en", to="cardinal"):
+    """``num2words_custom``, with the last conversions kept in an LRU cache
+    keyed by (number, lang, form)."""
+    return num2words_custom(number, lang=lang, to=to)
+
+
+def _split_amount(amount):
+    integer = math.floor(amount)
+    decimals = amount % 1
+    cents = 0
+    if decimals >= 10**-2:
+        cents = int(round(float_round(decimals * 100, precision_rounding=1)))
+    return integer, cents
+
+
+def amount_to_words(amount, lang="en", to="cardinal", cents_format=" and %s/100"):
+    """Return ``amount`` in words.
+
+    With ``to="cardinal"``, the check form: the integer part in words,
+    title-cased, followed by ``cents_format`` filled with the cents in
+    figures, e.g. "One Hundred Twenty-Three and 45/100". The words of the
+    integer part are cached whatever the cents.
+
+    With ``to="currency"``, the currency form of num2words, e.g. "three
+    euro, nine cents", cached by amount.
+    """
+    if to == "currency":
+        return cached_num2words(round(amount, 2), lang=lang, to=to)
+    integer, cents = _split_amount(amount)
+    words = cached_num2words(integer, lang=lang, to=to).title()
+    if cents:
+        words += cents_format % cents
+    return words
+
+
+def amounts_to_words(amounts, lang="en", to="cardinal", cents_format=" and %s/100"):
+    """Batch version of ``amount_to_words``: return the words of every
+    amount of ``amounts``, in order."""
+    return [
+        amount_to_words(amount, lang=lang, to=to, cents_format=cents_format)
+        for amount in amounts
+    ]
@@ -1,6 +1,8 @@
 # Copyright 2017 Tecnativa - Carlos Roca
 from odoo.tests.common import TransactionCase
 
+from odoo.addons.account_check_printing_report_base.report import lang
+
 
 class TestNum2WordsLangSolution(TransactionCase):
     def setUp(self):
@@ -25,3 +27,22 @@ class TestNum2WordsLangSolution(TransactionCase):
         amount_in_word_stars = self.propissory_note_amount.fill_stars(amount_in_word)
         stars = "*" * (100 - len(amount_in_word))
         self.assertEqual(amount_in_word_stars, amount_in_word + " " + stars)
+
+    def test_amount_to_words(self):
+        lang.cached_num2words.cache_clear()
+        words = lang.amounts_to_words([123.45, 123.0, 123.07, 1000.5])
+        self.assertEqual(
+            words,
+            [
+                "One Hundred And Twenty-Three and 45/100",
+                "One Hundred And Twenty-Three",
+                "One Hundred And Twenty-Three and 7/100",
+                "One Thousand and 50/100",
+            ],
+        )
+        # The words of 123 are converted once whatever the cents
+        self.assertEqual(lang.cached_num2words.cache_info().misses, 2)
+        self.assertEqual(
+            lang.amount_to_words(3.09, lang="es", to="currency"),
+            "tres euros con nueve céntimos",
+        )
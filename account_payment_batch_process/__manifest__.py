@@ -3,7 +3,7 @@
 
 {
     "name": "Account Payment Batch Processing",
-    "version": "14.0.1.2.0",
+    "version": "14.0.1.8.0",
     "license": "AGPL-3",
     "author": "Open Source Integrators, Odoo Community Association (OCA)",
     "summary": """
@@ -13,12 +13,19 @@
     "category": "Extra",
     "maintainer": "Open Source Integrators",
     "website": "https://github.com/OCA/account-payment",
-    "depends": ["account_check_printing", "account_payment_order"],
+    "depends": [
+        "account_check_printing",
+        "account_check_printing_report_base",
+        "account_payment_order",
+    ],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
         "wizard/account_payment_register.xml",
+        "views/account_journal.xml",
         "views/account_move.xml",
         "views/account_payment.xml",
+        "views/account_payment_batch_job.xml",
     ],
     "external_dependencies": {"python": ["num2words"]},
     "installable": True,
@@ -1,4 +1,7 @@
 # Copyright (C) 2021, Open Source Integrators
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+from . import account_journal
+from . import account_payment_batch_job
+from . import account_payment_batch_job_chunk
 from . import payment_adjustment_reason
@@ -0,0 +1,26 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models
+
+
+class AccountJournal(models.Model):
+    _inherit = "account.journal"
+
+    batch_payment_memo_max_length = fields.Integer(
+        string="Batch Payment Memo Max Length",
+        help="Maximum length of the memo of the payments made by the batch "
+        "payment wizard, e.g. the size of the remittance field of the bank. "
+        "0 for no limit.",
+    )
+    batch_payment_memo_overflow = fields.Selection(
+        [
+            ("truncate", "Truncate"),
+            ("spill", "Spill Over to Notes"),
+        ],
+        string="Batch Payment Memo Overflow",
+        default="truncate",
+        required=True,
+        help="What to do with the invoice references that do not fit in the "
+        "memo: drop them, or move them to the notes of the payment.",
+    )
@@ -0,0 +1,120 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import _, api, fields, models
+
+
+class AccountPaymentBatchJob(models.Model):
+    """Batch payment run processed in the background.
+
+    The groups of the batch payment wizard are split into chunks, see
+    ``account.payment.batch.job.chunk``, processed one transaction each by
+    the *Batch Payments: Process jobs* scheduled action.
+    """
+
+    _name = "account.payment.batch.job"
+    _description = "Batch Payment Job"
+    _order = "id desc"
+
+    name = fields.Char(required=True, readonly=True)
+    state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        default="pending",
+        required=True,
+        readonly=True,
+    )
+    user_id = fields.Many2one(
+        "res.users",
+        "User",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+    )
+    company_id = fields.Many2one(
+        "res.company",
+        "Company",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+    )
+    journal_id = fields.Many2one("account.journal", "Journal", readonly=True)
+    payment_method_id = fields.Many2one(
+        "account.payment.method", "Payment Method", readonly=True
+    )
+    payment_date = fields.Date("Payment Date", readonly=True)
+    payment_type = fields.Selection(
+        [("outbound", "Send Money"), ("inbound", "Receive Money")],
+        "Payment Type",
+        readonly=True,
+    )
+    currency_id = fields.Many2one("res.currency", "Currency", readonly=True)
+    is_customer = fields.Boolean("Is Customer?", readonly=True)
+    chunk_ids = fields.One2many(
+        "account.payment.batch.job.chunk", "job_id", "Chunks", readonly=True
+    )
+    chunk_count = fields.Integer("Chunks", compute="_compute_progress")
+    done_count = fields.Integer("Done Chunks", compute="_compute_progress")
+    failed_count = fields.Integer("Failed Chunks", compute="_compute_progress")
+    progress = fields.Float("Progress", compute="_compute_progress")
+    payment_ids = fields.Many2many(
+        "account.payment", string="Payments", compute="_compute_payment_ids"
+    )
+
+    @api.depends("chunk_ids.state")
+    def _compute_progress(self):
+        for job in self:
+            states = job.chunk_ids.mapped("state")
+            job.chunk_count = len(states)
+            job.done_count = states.count("done")
+            job.failed_count = states.count("failed")
+            job.progress = (
+                100.0 * job.done_count / job.chunk_count if job.chunk_count else 0.0
+            )
+
+    @api.depends("chunk_ids.payment_ids")
+    def _compute_payment_ids(self):
+        for job in self:
+            job.payment_ids = job.chunk_ids.payment_ids
+
+    def _update_state(self):
+        for job in self:
+            states = set(job.chunk_ids.mapped("state"))
+            if "pending" in states:
+                state = "running" if states - {"pending"} else "pending"
+            elif "failed" in states:
+                state = "failed"
+            else:
+                state = "done"
+            if job.state != state:
+                job.state = state
+
+    def action_retry(self):
+        """Put the failed chunks back in the queue."""
+        self.chunk_ids.filtered(lambda chunk: chunk.state == "failed").write(
+            {"state": "pending", "error": False}
+        )
+        self._update_state()
+        self.env.ref(
+            "account_payment_batch_process.ir_cron_process_batch_payment_jobs"
+        )._trigger()
+
+    def action_view_payments(self):
+        self.ensure_one()
+        view_id = self.env["ir.model.data"].get_object_reference(
+            "account_payment_batch_process",
+            "view_account_payment_tree_nocreate",
+        )[1]
+        return {
+            "name": _("Payments"),
+            "view_mode": "tree,form",
+            "res_model": "account.payment",
+            "views": [(view_id, "tree"), (False, "form")],
+            "type": "ir.actions.act_window",
+            "domain": [("id", "in", self.payment_ids.ids)],
+            "context": {"group_by": "partner_id"},
+        }
@@ -0,0 +1,140 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import json
+import logging
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountPaymentBatchJobChunk(models.Model):
+    """Groups of a batch payment job paid in one transaction.
+
+    A chunk is marked done in the transaction creating its payments, so a
+    crash rolls both back and the chunk is processed again from scratch.
+    Chunks are locked with ``FOR UPDATE SKIP LOCKED`` while processed, so
+    concurrent workers never pay the same groups twice.
+    """
+
+    _name = "account.payment.batch.job.chunk"
+    _description = "Batch Payment Job Chunk"
+    _order = "job_id, sequence"
+
+    job_id = fields.Many2one(
+        "account.payment.batch.job",
+        "Job",
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+    sequence = fields.Integer(readonly=True)
+    state = fields.Selection(
+        [("pending", "Pending"), ("done", "Done"), ("failed", "Failed")],
+        default="pending",
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    group_data = fields.Text(
+        readonly=True, help="Groups of the batch payment wizard, in JSON."
+    )
+    group_count = fields.Integer("Groups", readonly=True)
+    payment_ids = fields.Many2many("account.payment", string="Payments", readonly=True)
+    attempts = fields.Integer(readonly=True)
+    error = fields.Text(readonly=True)
+
+    def _get_group_data(self):
+        """Return the groups of the chunk, with their integer keys back."""
+        group_data = {}
+        for group_id, data in json.loads(self.group_data).items():
+            data["inv_val"] = {
+                int(inv_id): val for inv_id, val in data["inv_val"].items()
+            }
+            group_data[int(group_id)] = data
+        return group_data
+
+    def _get_wizard(self):
+        job = self.job_id
+        return (
+            self.env["account.payment.register"]
+            .with_user(job.user_id)
+            .with_company(job.company_id)
+            .new(
+                {
+                    "journal_id": job.journal_id.id,
+                    "payment_method_id": job.payment_method_id.id,
+                    "payment_date": job.payment_date,
+                    "payment_type": job.payment_type,
+                    "currency_id": job.currency_id.id,
+                    "is_customer": job.is_customer,
+                    "bulk_mode": True,
+                }
+            )
+        )
+
+    def _process(self):
+        """Pay the groups of the chunk."""
+        self.ensure_one()
+        group_data = self._get_group_data()
+        invoices = self.env["account.move"].browse(
+            [inv_id for data in group_data.values() for inv_id in data["inv_val"]]
+        )
+        paid = invoices.filtered(
+            lambda inv: inv.state != "posted"
+            or inv.payment_state not in ("not_paid", "partial")
+        )
+        if paid:
+            raise UserError(
+                _("These invoices are no longer open: %s")
+                % ", ".join(paid.mapped("name"))
+            )
+        wizard = self._get_wizard()
+        payments = wizard._create_batch_payments(group_data)
+        wizard._reconcile_batch_payments(payments, group_data)
+        self.write(
+            {
+                "state": "done",
+                "attempts": self.attempts + 1,
+                "payment_ids": [(6, 0, payments.ids)],
+            }
+        )
+
+    @api.model
+    def _cron_process(self, limit=None):
+        """Process the pending chunks, one transaction per chunk."""
+        count = 0
+        while limit is None or count < limit:
+            self.env.cr.execute(
+                """SELECT id FROM account_payment_batch_job_chunk
+                WHERE state = 'pending'
+                ORDER BY job_id, sequence
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+                """
+            )
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            chunk = self.browse(row[0])
+            try:
+                with self.env.cr.savepoint():
+                    chunk._process()
+            except Exception as error:
+                _logger.exception("Batch payment chunk %s failed", chunk.id)
+                self.env.clear()
+                chunk.write(
+                    {
+                        "state": "failed",
+                        "attempts": chunk.attempts + 1,
+                        "error": str(error),
+                    }
+                )
+            chunk.job_id._update_state()
+            # One transaction per chunk: the chunk state is committed with
+            # its payments
+            self.env.cr.commit()  # pylint: disable=invalid-commit
+            count += 1
+        return count
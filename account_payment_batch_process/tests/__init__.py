@@ -0,0 +1,6 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from . import test_batch_payment
+from . import test_batch_payment_benchmark
+from . import test_batch_payment_job
@@ -0,0 +1,59 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo import fields
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+class BatchPaymentCommon(AccountTestInvoicingCommon):
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.bank_journal = cls.company_data["default_journal_bank"]
+
+    @classmethod
+    def _create_invoices(cls, partners, amounts, move_type="out_invoice", **values):
+        """Create and post one invoice without taxes per partner and amount,
+        with the extra ``values``."""
+        account = (
+            cls.company_data["default_account_revenue"]
+            if move_type.startswith("out_")
+            else cls.company_data["default_account_expense"]
+        )
+        invoices = cls.env["account.move"].create(
+            [
+                {
+                    "move_type": move_type,
+                    "partner_id": partner.id,
+                    "invoice_date": fields.Date.today(),
+                    "invoice_line_ids": [
+                        (
+                            0,
+                            0,
+                            {
+                                "name": "Batch payment",
+                                "account_id": account.id,
+                                "quantity": 1.0,
+                                "price_unit": amount,
+                                "tax_ids": [(6, 0, [])],
+                            },
+                        )
+                    ],
+                    **values,
+                }
+                for partner, amount in zip(partners, amounts)
+            ]
+        )
+        invoices.action_post()
+        return invoices
+
+    def _create_wizard(self, invoices, **values):
+        """Open the batch payment wizard on ``invoices``."""
+        values.setdefault("journal_id", self.bank_journal.id)
+        return (
+            self.env["account.payment.register"]
+            .with_context(
+                batch=True, active_model="account.move", active_ids=invoices.ids
+            )
+            .create(values)
+        )
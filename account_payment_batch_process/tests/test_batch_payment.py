@@ -0,0 +1,127 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo.tests import tagged
+
+from ..wizard.account_payment_register import MEMO_SEPARATOR
+from .common import BatchPaymentCommon
+
+
+@tagged("post_install", "-at_install")
+class TestBatchPayment(BatchPaymentCommon):
+    def _pay_invoices(self, bulk_mode):
+        """Pay two invoices of partner A and one of partner B by partner.
+
+        :return: the payments, and what they paid described independently
+                 of the records, to compare runs on different invoices
+        """
+        invoices = self._create_invoices(
+            [self.partner_a, self.partner_a, self.partner_b], [100.0, 200.0, 300.0]
+        )
+        wizard = self._create_wizard(
+            invoices, group_by_partner=True, bulk_mode=bulk_mode
+        )
+        wizard.make_payments()
+        payments = invoices._get_reconciled_payments().sorted("id")
+        description = {
+            "payments": [
+                (
+                    payment.partner_id,
+                    payment.amount,
+                    payment.state,
+                    payment.is_reconciled,
+                    len(payment.ref.split(MEMO_SEPARATOR)),
+                    sorted(
+                        invoices.ids.index(inv.id)
+                        for inv in payment.reconciled_invoice_ids
+                    ),
+                )
+                for payment in payments
+            ],
+            "invoices": [
+                (invoice.payment_state, invoice.amount_residual) for invoice in invoices
+            ],
+        }
+        return payments, description
+
+    def test_bulk_mode_same_as_group_by_group(self):
+        payments, bulk = self._pay_invoices(bulk_mode=True)
+        _payments, sequential = self._pay_invoices(bulk_mode=False)
+        self.assertEqual(len(payments), 2)
+        self.assertEqual(bulk, sequential)
+        self.assertEqual(
+            bulk["payments"],
+            [
+                (self.partner_a, 300.0, "posted", True, 2, [0, 1]),
+                (self.partner_b, 300.0, "posted", True, 1, [2]),
+            ],
+        )
+        self.assertEqual(bulk["invoices"], [("paid", 0.0)] * 3)
+
+    def _render_memo(self, max_length, overflow):
+        self.bank_journal.write(
+            {
+                "batch_payment_memo_max_length": max_length,
+                "batch_payment_memo_overflow": overflow,
+            }
+        )
+        wizard = self.env["account.payment.register"].new(
+            {"journal_id": self.bank_journal.id}
+        )
+        return wizard._render_memo(["INV/001", "INV/002", "INV/003"])
+
+    def test_memo_max_length(self):
+        memo = "INV/001 : INV/002 : INV/003"
+        for overflow in ("truncate", "spill"):
+            self.assertEqual(self._render_memo(0, overflow), (memo, False))
+            self.assertEqual(self._render_memo(len(memo), overflow), (memo, False))
+        self.assertEqual(self._render_memo(20, "truncate"), ("INV/001 : ...", False))
+        self.assertEqual(
+            self._render_memo(20, "spill"), ("INV/001 : INV/002", "INV/003")
+        )
+        # Not even the first reference fits
+        self.assertEqual(self._render_memo(5, "truncate"), ("INV/0", False))
+        self.assertEqual(
+            self._render_memo(5, "spill"), ("INV/0", "01 : INV/002 : INV/003")
+        )
+
+    def test_memo_spill_over_to_notes(self):
+        invoices = self._create_invoices([self.partner_a] * 3, [10.0, 20.0, 30.0])
+        names = invoices.mapped("name")
+        self.bank_journal.write(
+            {
+                "batch_payment_memo_max_length": len(MEMO_SEPARATOR.join(names[:2])),
+                "batch_payment_memo_overflow": "spill",
+            }
+        )
+        wizard = self._create_wizard(
+            invoices, group_by_partner=True, communication=False
+        )
+        wizard.make_payments()
+        payment = invoices._get_reconciled_payments()
+        self.assertEqual(len(payment), 1)
+        self.assertEqual(payment.ref, MEMO_SEPARATOR.join(names[:2]))
+        self.assertEqual(payment.narration, names[2])
+        self.assertEqual(payment.amount, 60.0)
+
+    def test_partial_payment_keeps_invoice_open(self):
+        invoices = self._create_invoices(
+            [self.partner_a, self.partner_b], [100.0, 200.0]
+        )
+        wizard = self._create_wizard(invoices)
+        paid_line, open_line = wizard.invoice_payments
+        open_line.write({"amount": 150.0, "payment_difference_handling": "open"})
+        wizard.cheque_amount = 250.0
+        wizard.make_payments()
+        self.assertEqual(invoices[0].payment_state, "paid")
+        self.assertEqual(invoices[0].amount_residual, 0.0)
+        self.assertEqual(invoices[1].payment_state, "partial")
+        self.assertEqual(invoices[1].amount_residual, 50.0)
+        self.assertEqual(invoices[1].amount_residual_signed, 50.0)
+        receivable = invoices[1].line_ids.filtered(
+            lambda line: line.account_internal_type == "receivable"
+        )
+        self.assertEqual(receivable.amount_residual, 50.0)
+        self.assertFalse(receivable.reconciled)
+        payment = invoices[1]._get_reconciled_payments()
+        self.assertEqual(payment.amount, 150.0)
+        self.assertTrue(payment.is_reconciled)
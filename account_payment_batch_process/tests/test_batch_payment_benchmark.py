@@ -0,0 +1,88 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import logging
+import time
+
+from odoo.tests import tagged
+
+from .common import BatchPaymentCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "-at_install", "post_install", "batch_payment_benchmark")
+class TestBatchPaymentBenchmark(BatchPaymentCommon):
+    """Check that batch payments scale linearly with the number of groups.
+
+    The invoices are paid one payment each in bulk mode, for increasing
+    numbers of invoices. The queries per payment must not grow with the
+    number of payments; the timings are logged.
+
+    The memo of a payment grouping up to 10k invoices of a partner must
+    also be built in a time linear in the number of invoices.
+
+    Not part of the standard test run, use
+    ``--test-tags batch_payment_benchmark`` to run it.
+    """
+
+    sizes = (50, 500)
+    memo_sizes = (1000, 10000)
+    # Accepted growth of the queries per payment between the smallest and
+    # the largest batch
+    max_ratio = 1.5
+
+    def _run_batch(self, size):
+        invoices = self._create_invoices(
+            [self.partner_a] * size, [100.0 + index for index in range(size)]
+        )
+        wizard = self._create_wizard(invoices)
+        wizard.invalidate_cache()
+        queries = self.cr.sql_log_count
+        start = time.perf_counter()
+        wizard.make_payments()
+        elapsed = time.perf_counter() - start
+        queries = self.cr.sql_log_count - queries
+        self.assertEqual(set(invoices.mapped("payment_state")), {"paid"})
+        _logger.info(
+            "Batch payment of %d invoices: %d queries, %.2fs (%.1f ms/payment)",
+            size,
+            queries,
+            elapsed,
+            1000 * elapsed / size,
+        )
+        return queries / size
+
+    def test_batch_payment_linear_scaling(self):
+        small, large = [self._run_batch(size) for size in self.sizes]
+        self.assertLessEqual(large, small * self.max_ratio)
+
+    def _run_memo(self, size):
+        invoices = self._create_invoices(
+            [self.partner_a] * size, [1.0 + index for index in range(size)]
+        )
+        wizard = self._create_wizard(invoices, group_by_partner=True)
+        start = time.perf_counter()
+        group_data = wizard._get_group_data()
+        elapsed = time.perf_counter() - start
+        (data,) = group_data.values()
+        self.assertEqual(len(data["memo_parts"]), size)
+        self.assertLessEqual(len(data["memo"]), 140)
+        self.assertTrue(data["memo_spill"])
+        _logger.info(
+            "Memo of a payment of %d invoices: %.2fs (%.3f ms/invoice)",
+            size,
+            elapsed,
+            1000 * elapsed / size,
+        )
+        return elapsed / size
+
+    def test_batch_payment_memo_10k(self):
+        self.bank_journal.write(
+            {
+                "batch_payment_memo_max_length": 140,
+                "batch_payment_memo_overflow": "spill",
+            }
+        )
+        small, large = [self._run_memo(size) for size in self.memo_sizes]
+        # A quadratic memo would take 10 times longer per invoice
+        self.assertLessEqual(large, small * 3)
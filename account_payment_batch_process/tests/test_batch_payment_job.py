@@ -0,0 +1,95 @@
+# Copyright (C) 2021, Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import BatchPaymentCommon
+
+
+@tagged("post_install", "-at_install")
+class TestBatchPaymentJob(BatchPaymentCommon):
+    def setUp(self):
+        super().setUp()
+        self.env["ir.config_parameter"].sudo().set_param(
+            "account_payment_batch_process.job_chunk_size", 1
+        )
+        self.invoices = self._create_invoices(
+            [self.partner_a, self.partner_b], [100.0, 200.0]
+        )
+        action = self._create_wizard(
+            self.invoices, run_in_background=True
+        ).make_payments()
+        self.job = self.env["account.payment.batch.job"].browse(action["res_id"])
+        self.chunk_model = self.env["account.payment.batch.job.chunk"]
+        # The scheduled action commits after every chunk
+        commit_patcher = patch.object(self.env.cr, "commit")
+        commit_patcher.start()
+        self.addCleanup(commit_patcher.stop)
+
+    def test_job_chunks(self):
+        self.assertEqual(self.job.state, "pending")
+        self.assertEqual(self.job.chunk_count, 2)
+        self.assertEqual(self.job.chunk_ids.mapped("group_count"), [1, 1])
+        self.assertEqual(set(self.invoices.mapped("payment_state")), {"not_paid"})
+        self.assertEqual(self.chunk_model._cron_process(), 2)
+        self.assertEqual(self.job.state, "done")
+        self.assertEqual(self.job.progress, 100.0)
+        self.assertEqual(len(self.job.payment_ids), 2)
+        self.assertEqual(set(self.job.payment_ids.mapped("state")), {"posted"})
+        self.assertEqual(set(self.invoices.mapped("payment_state")), {"paid"})
+        self.assertEqual(self.chunk_model._cron_process(), 0)
+
+    def test_job_failing_chunk(self):
+        with patch.object(
+            type(self.env["account.payment.register"]),
+            "_reconcile_batch_payments",
+            side_effect=UserError("Reconciliation failed"),
+        ):
+            self.assertEqual(self.chunk_model._cron_process(), 2)
+        self.assertEqual(self.job.state, "failed")
+        self.assertEqual(self.job.failed_count, 2)
+        chunk = self.job.chunk_ids[0]
+        self.assertEqual(chunk.attempts, 1)
+        self.assertEqual(chunk.error, "Reconciliation failed")
+        # The payments created before the failure are rolled back
+        self.assertFalse(self.job.payment_ids)
+        self.assertFalse(
+            self.env["account.payment"].search(
+                [("partner_id", "in", self.invoices.partner_id.ids)]
+            )
+        )
+        self.assertEqual(set(self.invoices.mapped("payment_state")), {"not_paid"})
+        self.job.action_retry()
+        self.assertEqual(self.job.state, "pending")
+        self.assertFalse(self.job.chunk_ids.filtered("error"))
+        self.assertEqual(self.chunk_model._cron_process(), 2)
+        self.assertEqual(self.job.state, "done")
+        self.assertEqual(self.job.chunk_ids.mapped("attempts"), [2, 2])
+
+    def test_job_resume(self):
+        # The run is interrupted after the first chunk
+        self.assertEqual(self.chunk_model._cron_process(limit=1), 1)
+        self.assertEqual(self.job.state, "running")
+        self.assertEqual(self.job.done_count, 1)
+        self.assertEqual(self.invoices[0].payment_state, "paid")
+        self.assertEqual(self.invoices[1].payment_state, "not_paid")
+        self.assertEqual(self.chunk_model._cron_process(), 1)
+        self.assertEqual(self.job.state, "done")
+        for invoice in self.invoices:
+            self.assertEqual(len(invoice._get_reconciled_payments()), 1)
+        self.assertEqual(len(self.job.payment_ids), 2)
+
+    def test_job_invoice_no_longer_open(self):
+        # The second invoice is paid by someone else before its chunk runs
+        self.env["account.payment.register"].with_context(
+            active_model="account.move", active_ids=self.invoices[1].ids
+        ).create({"journal_id": self.bank_journal.id})._create_payments()
+        self.assertEqual(self.chunk_model._cron_process(), 2)
+        self.assertEqual(self.job.state, "failed")
+        chunk = self.job.chunk_ids.filtered(lambda chunk: chunk.state == "failed")
+        self.assertEqual(chunk, self.job.chunk_ids[1])
+        self.assertIn(self.invoices[1].name, chunk.error)
+        self.assertFalse(chunk.payment_ids)
+        self.assertEqual(len(self.invoices[1]._get_reconciled_payments()), 1)
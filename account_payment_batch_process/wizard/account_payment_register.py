@@ -1,20 +1,17 @@
 # Copyright (C) 2021, Open Source Integrators
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import json
 import logging
-import math
+import time
+from collections import defaultdict
 
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
-from odoo.tools import float_round
 from odoo.tools.float_utils import float_compare
 
-try:
-    from num2words import num2words
-except ImportError:
-    logging.getLogger(__name__).warning(
-        "The num2words python library is not installed."
-    )
-    num2words = None
+from odoo.addons.account_check_printing_report_base.report import lang
+
+_logger = logging.getLogger(__name__)
 
 MAP_INVOICE_TYPE_PARTNER_TYPE = {
     "out_invoice": "customer",
@@ -23,6 +20,9 @@ MAP_INVOICE_TYPE_PARTNER_TYPE = {
     "in_refund": "supplier",
 }
 
+# Separator of the invoice references in the memo of a payment
+MEMO_SEPARATOR = " : "
+
 # Since invoice amounts are unsigned,
 # this is how we know if money comes in or goes out
 MAP_INVOICE_TYPE_PAYMENT_SIGN = {
@@ -62,28 +62,70 @@ class AccountPaymentRegister(models.TransientModel):
         default=False,
         help="Enable grouping payments by partner",
     )
+    bulk_mode = fields.Boolean(
+        string="Bulk Processing",
+        default=True,
+        help="Create and post the payments of all the groups at once. "
+        "Disable to create and post them one group at a time.",
+    )
+    run_in_background = fields.Boolean(
+        string="Run in Background",
+        help="Process the payments in a background job, by chunks of groups "
+        "paid in separate transactions, instead of during the request.",
+    )
 
     def get_invoice_payment_line(self, invoice):
+        return self._get_invoice_payment_line_from_data(
+            self._read_invoice_data(invoice)[0]
+        )
+
+    def get_invoice_payments(self, invoices):
+        return [
+            self._get_invoice_payment_line_from_data(invoice_data)
+            for invoice_data in self._read_invoice_data(invoices)
+        ]
+
+    def _get_invoice_data_fields(self):
+        """Fields of the invoices read by ``_read_invoice_data``."""
+        return [
+            "name",
+            "state",
+            "payment_state",
+            "payment_mode_id",
+            "move_type",
+            "currency_id",
+            "partner_id",
+            "commercial_partner_id",
+            "amount_residual",
+        ]
+
+    def _read_invoice_data(self, invoices):
+        """Read the fields the batch wizard needs from all ``invoices`` at
+        once, many2one fields as bare ids."""
+        return invoices.read(self._get_invoice_data_fields(), load=None)
+
+    def _get_invoice_payment_line_from_data(self, invoice_data):
+        """Return the command creating the payment line of an invoice from
+        its data read by ``_read_invoice_data``.
+
+        This is the method to override to change the payment lines proposed
+        by the wizard, ``get_invoice_payment_line`` reads the invoice and
+        calls it.
+        """
         return (
             0,
             0,
             {
-                "partner_id": invoice.partner_id.id,
-                "invoice_id": invoice.id,
-                "balance": invoice.amount_residual or 0.0,
-                "amount": invoice.amount_residual or 0.0,
+                "partner_id": invoice_data["partner_id"],
+                "invoice_id": invoice_data["id"],
+                "balance": invoice_data["amount_residual"] or 0.0,
+                "amount": invoice_data["amount_residual"] or 0.0,
                 "payment_difference": 0.0,
                 "payment_difference_handling": "reconcile",
-                "note": "Payment of invoice %s" % invoice.name,
+                "note": "Payment of invoice %s" % invoice_data["name"],
             },
         )
 
-    def get_invoice_payments(self, invoices):
-        res = []
-        for invoice in invoices:
-            res.append(self.get_invoice_payment_line(invoice))
-        return res
-
     @api.model
     def default_get(self, fields_list):
         if self.env.context and not self.env.context.get("batch", False):
@@ -104,61 +146,53 @@ class AccountPaymentRegister(models.TransientModel):
                 _("The expected model for this action is 'account.move', not '%s'.")
                 % active_model
             )
-        # Checks on received invoice records
+        # Checks on received invoice records, all read at once
         invoices = self.env[active_model].browse(active_ids)
+        invoices_data = self._read_invoice_data(invoices)
+        first = invoices_data[0]
         if any(
-            invoice.state != "posted"
-            or invoice.payment_state not in ["not_paid", "partial"]
-            for invoice in invoices
+            data["state"] != "posted"
+            or data["payment_state"] not in ["not_paid", "partial"]
+            for data in invoices_data
         ):
             raise UserError(_("You can only register payments for open invoices."))
 
-        if any(inv.payment_mode_id != invoices[0].payment_mode_id for inv in invoices):
+        if any(
+            data["payment_mode_id"] != first["payment_mode_id"]
+            for data in invoices_data
+        ):
             raise UserError(
                 _(
                     "You can only register a batch payment for"
                     " invoices with the same payment mode."
                 )
             )
+        partner_type = MAP_INVOICE_TYPE_PARTNER_TYPE[first["move_type"]]
         if any(
-            MAP_INVOICE_TYPE_PARTNER_TYPE[inv.move_type]
-            != MAP_INVOICE_TYPE_PARTNER_TYPE[invoices[0].move_type]
-            for inv in invoices
+            MAP_INVOICE_TYPE_PARTNER_TYPE[data["move_type"]] != partner_type
+            for data in invoices_data
         ):
             raise UserError(
                 _(
                     "You cannot mix customer invoices and vendor bills in a single payment."
                 )
             )
-        if any(inv.currency_id != invoices[0].currency_id for inv in invoices):
+        if any(data["currency_id"] != first["currency_id"] for data in invoices_data):
             raise UserError(
                 _(
                     "In order to pay multiple bills at once, they must use the same currency."
                 )
             )
 
-        if "batch" in context and context.get("batch"):
-            is_customer = (
-                MAP_INVOICE_TYPE_PARTNER_TYPE[invoices[0].move_type] == "customer"
-            )
-            payment_lines = self.get_invoice_payments(invoices)
-            res.update({"invoice_payments": payment_lines, "is_customer": is_customer})
-        else:
-            # Checks on received invoice records
-            if any(
-                MAP_INVOICE_TYPE_PARTNER_TYPE[inv.move_type]
-                != MAP_INVOICE_TYPE_PARTNER_TYPE[invoices[0].move_type]
-                for inv in invoices
-            ):
-                raise UserError(
-                    _(
-                        "You cannot mix customer invoices and vendor bills in a single payment."
-                    )
-                )
+        is_customer = partner_type == "customer"
+        payment_lines = [
+            self._get_invoice_payment_line_from_data(data) for data in invoices_data
+        ]
+        res.update({"invoice_payments": payment_lines, "is_customer": is_customer})
 
         total_amount = sum(
-            inv.amount_residual * MAP_INVOICE_TYPE_PAYMENT_SIGN[inv.move_type]
-            for inv in invoices
+            data["amount_residual"] * MAP_INVOICE_TYPE_PAYMENT_SIGN[data["move_type"]]
+            for data in invoices_data
         )
         date_format = self.env["res.lang"]._lang_get(self.env.user.lang).date_format
         communication = "Batch payment of %s" % fields.Date.today().strftime(
@@ -167,10 +201,10 @@ class AccountPaymentRegister(models.TransientModel):
         res.update(
             {
                 "amount": abs(total_amount),
-                "currency_id": invoices[0].currency_id.id,
+                "currency_id": first["currency_id"],
                 "payment_type": is_customer and "outbound" or "inbound",
-                "partner_id": invoices[0].commercial_partner_id.id,
-                "partner_type": MAP_INVOICE_TYPE_PARTNER_TYPE[invoices[0].move_type],
+                "partner_id": first["commercial_partner_id"],
+                "partner_type": partner_type,
                 "company_id": self.env.user.company_id,
                 "communication": communication,
             }
@@ -202,6 +236,7 @@ class AccountPaymentRegister(models.TransientModel):
                 or self.payment_method_id.id,
                 "date": self.payment_date,
                 "ref": group_data["memo"],
+                "narration": group_data.get("memo_spill") or False,
                 "payment_type": self.payment_type,
                 "amount": group_data["total"],
                 "currency_id": self.currency_id.id,
@@ -224,31 +259,46 @@ class AccountPaymentRegister(models.TransientModel):
                 )
             )
 
-    def get_memo(self, memo, group_data, partner_id, data_get):
-        if memo:
-            memo = (
-                group_data[partner_id]["memo"]
-                + " : "
-                + memo
-                + "-"
-                + str(data_get.invoice_id.name)
-            )
-        else:
-            memo = (
-                group_data[partner_id]["memo"] + " : " + str(data_get.invoice_id.name)
-            )
-        return memo
+    def _get_memo_part(self, invoice):
+        if self.communication:
+            return self.communication + "-" + str(invoice.name)
+        return str(invoice.name)
+
+    def _render_memo(self, memo_parts):
+        """Render the memo of a payment from the references of its invoices.
+
+        The memo is cut at the maximum length of the journal, if any: the
+        references that do not fit are dropped and replaced by an ellipsis,
+        or spilled over to the notes of the payment.
+
+        :return: the memo and the spilled over memo, False if none
+        """
+        memo = MEMO_SEPARATOR.join(memo_parts)
+        max_length = self.journal_id.batch_payment_memo_max_length
+        if not max_length or len(memo) <= max_length:
+            return memo, False
+        spill = self.journal_id.batch_payment_memo_overflow == "spill"
+        suffix = "" if spill else MEMO_SEPARATOR + "..."
+        length = 0
+        count = 0
+        for part in memo_parts:
+            part_length = len(part) + (len(MEMO_SEPARATOR) if count else 0)
+            if length + part_length + len(suffix) > max_length:
+                break
+            length += part_length
+            count += 1
+        if not count:
+            # Not even the first reference fits
+            return memo[:max_length], memo[max_length:] if spill else False
+        memo = MEMO_SEPARATOR.join(memo_parts[:count])
+        if spill:
+            return memo, MEMO_SEPARATOR.join(memo_parts[count:])
+        return memo + suffix, False
 
     def total_amount_in_words(self, data_get, old_total=0):
-        check_amount_in_words = num2words(
-            math.floor(old_total + data_get.amount)
-        ).title()
-        decimals = (old_total + data_get.amount) % 1
-        if decimals >= 10**-2:
-            check_amount_in_words += _(" and %s/100") % str(
-                int(round(float_round(decimals * 100, precision_rounding=1)))
-            )
-        return check_amount_in_words
+        return lang.amount_to_words(
+            old_total + data_get.amount, cents_format=_(" and %s/100")
+        )
 
     def get_payment_invoice_value(self, name, data_get):
         return {
@@ -264,11 +314,6 @@ class AccountPaymentRegister(models.TransientModel):
     def update_group_pay_data(
         self, group_id, group_data, data_get, check_amount_in_words
     ):
-        # build memo value
-        if self.communication:
-            memo = self.communication + "-" + str(data_get.invoice_id.name)
-        else:
-            memo = str(data_get.invoice_id.name)
         name = ""
         if data_get.reason_code:
             name = str(data_get.reason_code.code)
@@ -294,7 +339,8 @@ class AccountPaymentRegister(models.TransientModel):
                     ],
                     "total": data_get.amount,
                     "check_amount_in_words": check_amount_in_words,
-                    "memo": memo,
+                    # rendered into the memo once the group is complete
+                    "memo_parts": [self._get_memo_part(data_get.invoice_id)],
                     "temp_invoice": data_get.invoice_id.id,
                     "inv_val": {data_get.invoice_id.id: inv_val},
                 }
@@ -309,19 +355,9 @@ class AccountPaymentRegister(models.TransientModel):
 
         if group_id in group_data:
             old_total = group_data[group_id]["total"]
-            # build memo value
-            if self.communication:
-                memo = (
-                    group_data[group_id]["memo"]
-                    + " : "
-                    + self.communication
-                    + "-"
-                    + str(line.invoice_id.name)
-                )
-            else:
-                memo = group_data[group_id]["memo"] + " : " + str(line.invoice_id.name)
-            # Calculate amount in words
-            check_amount_in_words = self.total_amount_in_words(line, old_total)
+            group_data[group_id]["memo_parts"].append(
+                self._get_memo_part(line.invoice_id)
+            )
             group_data[group_id].update(
                 {
                     "partner_id": line.invoice_id.partner_id.id,
@@ -329,9 +365,7 @@ class AccountPaymentRegister(models.TransientModel):
                         line.invoice_id.move_type
                     ],
                     "total": old_total + line.amount,
-                    "memo": memo,
                     "temp_invoice": line.invoice_id.id,
-                    "check_amount_in_words": check_amount_in_words,
                 }
             )
             # prepare name
@@ -346,12 +380,8 @@ class AccountPaymentRegister(models.TransientModel):
             inv_val = self.get_payment_invoice_value(name, line)
             group_data[group_id]["inv_val"].update({line.invoice_id.id: inv_val})
         else:
-            # calculate amount in words
-            check_amount_in_words = self.total_amount_in_words(line, 0)
-            # prepare name
-            self.update_group_pay_data(
-                group_id, group_data, line, check_amount_in_words
-            )
+            # the amount in words is set once the group total is known
+            self.update_group_pay_data(group_id, group_data, line, False)
 
     def _reconcile_open_invoices(
         self,
@@ -386,108 +416,244 @@ class AccountPaymentRegister(models.TransientModel):
                 }
             )
 
-    def make_payments(self):
-        # Make group data either for Customers or Vendors
-        context = dict(self._context or {})
+    def _update_open_invoices(self, invoices, inv_val):
+        """Set the residual amounts and payment states of ``invoices`` after
+        their reconciliation, in a single pass.
+
+        The invoices fully paid get their open items and partial reconciles
+        settled, the ones kept open keep the payment difference as residual.
+        Records getting the same values are written together and the
+        payments widget is computed once for all the invoices.
+        """
+        line_values = defaultdict(list)
+        partial_amounts = {}
+        invoice_values = defaultdict(list)
+        for inv in invoices:
+            values = inv_val[inv.id]
+            paid = values["payment_difference_handling"] != "open"
+            for line in inv.line_ids:
+                if line.amount_residual > 0 and paid:
+                    line_values[(0.0, True)].append(line.id)
+                    partial_amounts[line.id] = (inv.move_type, values["amount"])
+                elif line.reconciled and not paid:
+                    line_values[(values["payment_difference"], False)].append(line.id)
+                    partial_amounts[line.id] = (inv.move_type, values["amount"])
+            invoice_values[
+                ("paid" if paid else "partial", values["payment_difference"])
+            ].append(inv.id)
+        move_line_model = self.env["account.move.line"]
+        for (amount_residual, reconciled), line_ids in line_values.items():
+            move_line_model.browse(line_ids).write(
+                {
+                    "amount_residual": amount_residual,
+                    "amount_residual_currency": amount_residual,
+                    "reconciled": reconciled,
+                }
+            )
+        # First partial reconcile of every line, on the side of the invoice
+        partials = self.env["account.partial.reconcile"].search(
+            [
+                "|",
+                ("debit_move_id", "in", list(partial_amounts)),
+                ("credit_move_id", "in", list(partial_amounts)),
+            ],
+            order="id",
+        )
+        partial_ids_by_amount = defaultdict(list)
+        done_line_ids = set()
+        for partial in partials:
+            for line_id, move_type in (
+                (partial.debit_move_id.id, "out_invoice"),
+                (partial.credit_move_id.id, "in_invoice"),
+            ):
+                if line_id in done_line_ids or line_id not in partial_amounts:
+                    continue
+                if partial_amounts[line_id][0] != move_type:
+                    continue
+                done_line_ids.add(line_id)
+                partial_ids_by_amount[partial_amounts[line_id][1]].append(partial.id)
+        for amount, partial_ids in partial_ids_by_amount.items():
+            self.env["account.partial.reconcile"].browse(partial_ids).write(
+                {
+                    "amount": amount,
+                    "debit_amount_currency": amount,
+                    "credit_amount_currency": amount,
+                }
+            )
+        for (payment_state, amount_residual), invoice_ids in invoice_values.items():
+            self.env["account.move"].browse(invoice_ids).write(
+                {
+                    "payment_state": payment_state,
+                    "amount_residual": amount_residual,
+                    "amount_residual_signed": amount_residual,
+                }
+            )
+        invoices._compute_payments_widget_reconciled_info()
+
+    def _get_group_data(self):
         group_data = {}
         memo = self.communication or " "
-        context.update({"is_customer": self.is_customer})
-        self._check_amounts()
         for invoice_payment_line in self.invoice_payments:
             if invoice_payment_line.amount > 0:
                 self.get_amount(memo, group_data, invoice_payment_line)
-        # update context
-        context.update({"group_data": group_data})
-        # making partner wise payment
+        # Amounts in words of all the group totals at once
+        amounts_in_words = lang.amounts_to_words(
+            [data["total"] for data in group_data.values()],
+            cents_format=_(" and %s/100"),
+        )
+        for data, check_amount_in_words in zip(group_data.values(), amounts_in_words):
+            data["check_amount_in_words"] = check_amount_in_words
+            data["memo"], data["memo_spill"] = self._render_memo(data["memo_parts"])
+        return group_data
+
+    def _create_batch_payments(self, group_data):
+        """Create and post one payment per group of ``group_data``.
+
+        In bulk mode, all the payments are created with a single ``create``
+        and posted with a single ``action_post``.
+
+        :return: the payments, in the order of the groups
+        """
+        context = dict(self._context or {})
+        context.update({"is_customer": self.is_customer, "group_data": group_data})
+        payment_model = self.env["account.payment"].with_context(context)
+        if self.bulk_mode:
+            payments = payment_model.create(
+                [
+                    self.get_payment_values(group_data=data)
+                    for data in group_data.values()
+                ]
+            )
+            payments.action_post()
+            return payments
         payment_ids = []
-        for group in list(group_data):
+        for data in group_data.values():
             # update active_ids with active invoice ids
-            if context.get("active_ids", False) and group_data[group].get(
-                "inv_val", False
-            ):
-                context.update({"active_ids": list(group_data[group]["inv_val"])})
-            payment = (
-                self.env["account.payment"]
-                .with_context(context)
-                .create(self.get_payment_values(group_data=group_data[group]))
-            )
-            payment_ids.append(payment.id)
+            if context.get("active_ids", False) and data.get("inv_val", False):
+                payment_model = payment_model.with_context(
+                    active_ids=list(data["inv_val"])
+                )
+            payment = payment_model.create(self.get_payment_values(group_data=data))
             payment.action_post()
-            # Reconciliation
-            domain = [
-                ("account_internal_type", "in", ("receivable", "payable")),
-                ("reconciled", "=", False),
-            ]
-            payment_lines = payment.line_ids.filtered_domain(domain)
-            invoices = self.env["account.move"].browse(context.get("active_ids"))
-            lines = invoices.line_ids.filtered_domain(domain)
+            payment_ids.append(payment.id)
+        return payment_model.browse(payment_ids)
+
+    def _reconcile_batch_payments(self, payments, group_data):
+        """Reconcile the payment of every group with the group's invoices.
+
+        The open receivable and payable items of all the payments and
+        invoices are read once and dispatched by move, then every group is
+        reconciled account by account. The invoices of the groups keeping
+        invoices open are then updated all together, see
+        ``_update_open_invoices``.
+        """
+        invoices = self.env["account.move"].browse(
+            [inv_id for data in group_data.values() for inv_id in data["inv_val"]]
+        )
+        domain = [
+            ("account_internal_type", "in", ("receivable", "payable")),
+            ("reconciled", "=", False),
+        ]
+        line_ids_by_move = defaultdict(list)
+        for line in (payments.line_ids | invoices.line_ids).filtered_domain(domain):
+            line_ids_by_move[line.move_id.id].append(line.id)
+        move_line_model = self.env["account.move.line"]
+        # Invoice values of the groups keeping invoices open
+        open_inv_val = {}
+        for payment, data in zip(payments, group_data.values()):
+            move_ids = [payment.move_id.id] + list(data["inv_val"])
+            lines = move_line_model.browse(
+                [
+                    line_id
+                    for move_id in move_ids
+                    for line_id in line_ids_by_move[move_id]
+                ]
+            )
+            line_ids_by_account = defaultdict(list)
+            for line in lines:
+                line_ids_by_account[line.account_id.id].append(line.id)
+            payment_lines = move_line_model.browse(line_ids_by_move[payment.move_id.id])
             for account in payment_lines.account_id:
-                (payment_lines + lines).filtered_domain(
-                    [("account_id", "=", account.id), ("reconciled", "=", False)]
-                ).reconcile()
+                move_line_model.browse(line_ids_by_account[account.id]).reconcile()
             if any(
-                group_data[group]["inv_val"][inv.id]["payment_difference_handling"]
-                == "open"
-                for inv in invoices
+                values["payment_difference_handling"] == "open"
+                for values in data["inv_val"].values()
             ):
-                for inv in invoices:
-                    if (
-                        group_data[group]["inv_val"][inv.id][
-                            "payment_difference_handling"
-                        ]
-                        == "open"
-                    ):
-                        payment_state = "partial"
-                    else:
-                        payment_state = "paid"
-                    for line in inv.line_ids:
-                        if line.amount_residual > 0 and payment_state == "paid":
-                            line_amount = 0.0
-                            partial_amount = group_data[group]["inv_val"][inv.id][
-                                "amount"
-                            ]
-                            self._reconcile_open_invoices(
-                                line,
-                                inv,
-                                line_amount,
-                                line_amount,
-                                True,
-                                partial_amount,
-                                partial_amount,
-                                partial_amount,
-                            )
-                            continue
-                        if line.reconciled and payment_state == "partial":
-                            line_amount = group_data[group]["inv_val"][inv.id][
-                                "payment_difference"
-                            ]
-                            partial_amount = group_data[group]["inv_val"][inv.id][
-                                "amount"
-                            ]
-                            self._reconcile_open_invoices(
-                                line,
-                                inv,
-                                line_amount,
-                                line_amount,
-                                False,
-                                partial_amount,
-                                partial_amount,
-                                partial_amount,
-                            )
-                            continue
-                    inv.update(
+                open_inv_val.update(data["inv_val"])
+        if open_inv_val:
+            self._update_open_invoices(
+                self.env["account.move"].browse(list(open_inv_val)), open_inv_val
+            )
+
+    def _create_job(self, group_data):
+        """Create a background job paying ``group_data`` by chunks."""
+        chunk_size = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_payment_batch_process.job_chunk_size", 50)
+        )
+        groups = list(group_data.items())
+        chunks = [
+            dict(groups[index : index + chunk_size])
+            for index in range(0, len(groups), chunk_size)
+        ]
+        job = self.env["account.payment.batch.job"].create(
+            {
+                "name": self.communication or _("Batch Payment"),
+                "journal_id": self.journal_id.id,
+                "payment_method_id": self.payment_method_id.id,
+                "payment_date": self.payment_date,
+                "payment_type": self.payment_type,
+                "currency_id": self.currency_id.id,
+                "is_customer": self.is_customer,
+                "chunk_ids": [
+                    (
+                        0,
+                        0,
                         {
-                            "payment_state": payment_state,
-                            "amount_residual": group_data[group]["inv_val"][inv.id][
-                                "payment_difference"
-                            ],
-                            "amount_residual_signed": group_data[group]["inv_val"][
-                                inv.id
-                            ]["payment_difference"],
-                        }
+                            "sequence": sequence,
+                            "group_count": len(chunk),
+                            "group_data": json.dumps(chunk),
+                        },
                     )
-                    inv._compute_payments_widget_reconciled_info()
+                    for sequence, chunk in enumerate(chunks)
+                ],
+            }
+        )
+        self.env.ref(
+            "account_payment_batch_process.ir_cron_process_batch_payment_jobs"
+        )._trigger()
+        return job
 
+    def make_payments(self):
+        # Make group data either for Customers or Vendors
+        self._check_amounts()
+        if self.run_in_background:
+            job = self._create_job(self._get_group_data())
+            return {
+                "name": _("Batch Payment Job"),
+                "view_mode": "form",
+                "res_model": "account.payment.batch.job",
+                "res_id": job.id,
+                "type": "ir.actions.act_window",
+                "target": "current",
+            }
+        start = time.time()
+        group_data = self._get_group_data()
+        grouped = time.time()
+        # making partner wise payment
+        payments = self._create_batch_payments(group_data)
+        created = time.time()
+        self._reconcile_batch_payments(payments, group_data)
+        _logger.info(
+            "Batch payment of %d groups: grouping %.2fs, create and post %.2fs, "
+            "reconcile %.2fs",
+            len(group_data),
+            grouped - start,
+            created - grouped,
+            time.time() - created,
+        )
+        payment_ids = payments.ids
         view_id = self.env["ir.model.data"].get_object_reference(
             "account_payment_batch_process",
             "view_account_payment_tree_nocreate",
@@ -1,19 +1,9 @@
 # Copyright (C) 2019, Open Source Integrators
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
-import logging
-import math
-
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
-from odoo.tools import float_round
 
-try:
-    from num2words import num2words
-except ImportError:
-    logging.getLogger(__name__).warning(
-        "The num2words python library is not installed."
-    )
-    num2words = None
+from odoo.addons.account_check_printing_report_base.report import lang
 
 MAP_INVOICE_TYPE_PARTNER_TYPE = {
     "out_invoice": "customer",
@@ -70,13 +60,9 @@ class InvoicePaymentLine(models.TransientModel):
 
     @api.onchange("amount")
     def _onchange_amount(self):
-        check_amount_in_words = num2words(math.floor(self.amount), lang="en").title()
-        decimals = self.amount % 1
-        if decimals >= 10**-2:
-            check_amount_in_words += _(" and %s/100") % str(
-                int(round(float_round(decimals * 100, precision_rounding=1)))
-            )
-        self.check_amount_in_words = check_amount_in_words
+        self.check_amount_in_words = lang.amount_to_words(
+            self.amount, cents_format=_(" and %s/100")
+        )
         self.payment_difference = self.balance - self.amount
 
     @api.onchange("invoice_id")
@@ -0,0 +1,53 @@
+# Copyright (C) 2021 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo.tests import tagged
+
+from odoo.addons.account_payment_batch_process.tests.common import BatchPaymentCommon
+
+
+@tagged("post_install", "-at_install")
+class TestBatchPaymentDiscount(BatchPaymentCommon):
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.discount_account = cls.company_data["default_account_expense"]
+        cls.payment_term = cls.env["account.payment.term"].create(
+            {
+                "name": "5%10 NET30",
+                "is_discount": True,
+                "line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "value": "balance",
+                            "discount": 5.0,
+                            "discount_days": 10,
+                            "discount_expense_account_id": cls.discount_account.id,
+                            "discount_income_account_id": cls.discount_account.id,
+                            "days": 30,
+                        },
+                    )
+                ],
+            }
+        )
+
+    def test_discount_payment_lines(self):
+        invoices = self._create_invoices(
+            [self.partner_a], [100.0], invoice_payment_term_id=self.payment_term.id
+        ) + self._create_invoices([self.partner_a], [200.0])
+        self.assertEqual(invoices[0].discount_amt, 5.0)
+        wizard = self._create_wizard(invoices)
+        discounted, regular = wizard.invoice_payments
+        self.assertEqual(discounted.invoice_id, invoices[0])
+        self.assertEqual(discounted.balance, 100.0)
+        self.assertEqual(discounted.amount, 95.0)
+        self.assertEqual(discounted.payment_difference, 5.0)
+        self.assertEqual(discounted.payment_difference_handling, "reconcile")
+        self.assertEqual(discounted.writeoff_account_id, self.discount_account)
+        self.assertEqual(regular.invoice_id, invoices[1])
+        self.assertEqual(regular.amount, 200.0)
+        self.assertEqual(regular.payment_difference, 0.0)
+        self.assertEqual(
+            wizard.get_invoice_payment_line(invoices[0])[2]["amount"], 95.0
+        )
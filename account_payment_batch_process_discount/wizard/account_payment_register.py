@@ -63,9 +63,13 @@ class AccountPaymentRegister(models.TransientModel):
             )
         return res
 
-    def get_invoice_payment_line(self, invoice):
-        if invoice.discount_amt == 0.0:
-            return super().get_invoice_payment_line(invoice)
+    def _get_invoice_data_fields(self):
+        return super()._get_invoice_data_fields() + ["discount_amt"]
+
+    def _get_invoice_payment_line_from_data(self, invoice_data):
+        if not invoice_data["discount_amt"]:
+            return super()._get_invoice_payment_line_from_data(invoice_data)
+        invoice = self.env["account.move"].browse(invoice_data["id"])
         # Set payment date as today
         today = fields.Date.today()
         vals = self.get_batch_payment_amount(invoice, today)
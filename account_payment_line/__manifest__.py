@@ -7,7 +7,7 @@
     "author": "ForgeFlow S.L., Odoo Community Association (OCA)",
     "website": "https://github.com/OCA/account-payment",
     "category": "Account",
-    "version": "14.0.1.0.0",
+    "version": "14.0.1.4.0",
     "license": "AGPL-3",
     "depends": ["account"],
     "data": [
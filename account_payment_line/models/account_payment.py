@@ -1,10 +1,14 @@
 # Copyright 2022 ForgeFlow, S.L.
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl)
 
-from odoo import _, fields, models
+from collections import defaultdict
+
+from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 from odoo.tools import float_is_zero
 
+from .subset_sum import find_subset_sum
+
 
 class AccountPayment(models.Model):
     _inherit = "account.payment"
@@ -23,6 +27,33 @@ class AccountPayment(models.Model):
         string="Write-off Account",
         domain="[('deprecated', '=', False), ('company_id', '=', company_id)]",
     )
+    distribution_strategy = fields.Selection(
+        selection=lambda self: self._get_distribution_strategies(),
+        string="Distribution Strategy",
+        default="due_date",
+        required=True,
+        readonly=True,
+        states={"draft": [("readonly", False)]},
+        help="How the payment distribution proposal pays the pending items:\n"
+        "- Oldest Due First: by due date.\n"
+        "- First In First Out: by accounting date.\n"
+        "- Cash Discount First: the ones whose cash discount is not expired "
+        "first, by discount deadline.\n"
+        "- Exact Amount: the items whose residuals sum exactly to the amount, "
+        "by due date if there are none.",
+    )
+
+    @api.model
+    def _get_distribution_strategies(self):
+        """Return the strategies of the payment distribution proposal, each
+        one implemented by a ``_distribute_<strategy>`` method returning the
+        candidates with the amounts to apply to them."""
+        return [
+            ("due_date", _("Oldest Due First")),
+            ("fifo", _("First In First Out")),
+            ("discount", _("Cash Discount First")),
+            ("exact", _("Exact Amount")),
+        ]
 
     def _process_post_reconcile(self):
         for rec in self:
@@ -66,43 +97,183 @@ class AccountPayment(models.Model):
             and x.account_id.internal_type in ("receivable", "payable")
         )
 
+    def _prepare_counterpart_line_vals(self, invoice, aml, amount_to_apply):
+        self.ensure_one()
+        return {
+            "payment_id": self.id,
+            "name": "/",
+            "move_id": invoice.id,
+            "aml_id": aml.id,
+            "account_id": aml.account_id.id,
+            "partner_id": self.partner_id.commercial_partner_id.id,
+            "amount": amount_to_apply,
+        }
+
     def _hook_create_new_line(self, invoice, aml, amount_to_apply):
         line_model = self.env["account.payment.counterpart.line"]
         self.ensure_one()
         return line_model.create(
-            {
-                "payment_id": self.id,
-                "name": "/",
-                "move_id": invoice.id,
-                "aml_id": aml.id,
-                "account_id": aml.account_id.id,
-                "partner_id": self.partner_id.commercial_partner_id.id,
-                "amount": amount_to_apply,
-            }
+            self._prepare_counterpart_line_vals(invoice, aml, amount_to_apply)
         )
 
-    def action_propose_payment_distribution(self):
+    def _get_distribution_discount_date_sql(self):
+        """SQL expression of the deadline of the cash discount of a line,
+        from the modules adding them when installed."""
+        expressions = []
+        if "date_discount" in self.env["account.move.line"]._fields:
+            expressions.append("aml.date_discount")
+        if "discount_due_date" in self.env["account.move"]._fields:
+            expressions.append("move.discount_due_date")
+        if not expressions:
+            return "NULL::date"
+        return "COALESCE(%s)" % ", ".join(expressions)
+
+    def _get_distribution_candidates(self):
+        """Return the open receivable and payable lines of the moves of
+        ``_get_moves_domain``, ordered by due date, with one query.
+
+        :return: list of dicts with the ``id``, ``move_id``, ``date``,
+                 ``date_maturity``, ``date_discount`` and ``amount_residual``
+                 in company currency of the lines
+        """
+        self.ensure_one()
         move_model = self.env["account.move"]
-        for rec in self:
-            if self.is_internal_transfer:
-                continue
-            domain = self._get_moves_domain()
-            pending_invoices = move_model.search(domain, order="invoice_date_due ASC")
-            pending_amount = rec.amount
-            rec.line_payment_counterpart_ids.unlink()
-            for invoice in pending_invoices:
-                for aml in self._filter_amls(invoice.line_ids):
-                    amount_to_apply = 0
-                    amount_residual = rec.company_id.currency_id._convert(
-                        aml.amount_residual,
-                        rec.currency_id,
-                        rec.company_id,
-                        date=rec.date,
+        move_model.flush()
+        self.env["account.move.line"].flush()
+        query = move_model._where_calc(self._get_moves_domain())
+        move_model._apply_ir_rules(query, "read")
+        from_clause, where_clause, where_params = query.get_sql()
+        self.env.cr.execute(
+            """
+            SELECT aml.id, aml.move_id, move.date, aml.date_maturity,
+                {date_discount} AS date_discount, aml.amount_residual
+            FROM account_move_line aml
+            JOIN account_move move ON move.id = aml.move_id
+            JOIN res_partner partner ON partner.id = aml.partner_id
+            WHERE aml.move_id IN (
+                SELECT "account_move".id FROM {from_clause} WHERE {where_clause}
+            )
+            AND partner.commercial_partner_id = %s
+            AND aml.amount_residual != 0
+            AND aml.account_internal_type IN ('receivable', 'payable')
+            ORDER BY move.invoice_date_due, move.id, aml.date_maturity, aml.id
+            """.format(
+                date_discount=self._get_distribution_discount_date_sql(),
+                from_clause=from_clause,
+                where_clause=where_clause or "TRUE",
+            ),
+            list(where_params) + [self.partner_id.commercial_partner_id.id],
+        )
+        return self.env.cr.dictfetchall()
+
+    def _get_distribution_rate(self, rates):
+        """Rate from the company currency to the currency of the payment,
+        looked up once per currency and date in ``rates``."""
+        self.ensure_one()
+        company_currency = self.company_id.currency_id
+        key = (self.company_id, self.currency_id, self.date)
+        if key not in rates:
+            rates[key] = company_currency._get_conversion_rate(
+                company_currency, self.currency_id, self.company_id, self.date
+            )
+        return rates[key]
+
+    def _allocate_payment_distribution(self, residuals):
+        """Allocate the amount of the payment to the ``residuals``, in their
+        order.
+
+        :return: list of the amounts applied to each residual
+        """
+        self.ensure_one()
+        pending_amount = self.amount
+        amounts = []
+        for amount_residual in residuals:
+            amount_to_apply = 0
+            if pending_amount >= 0:
+                amount_to_apply = min(abs(amount_residual), pending_amount)
+                pending_amount -= abs(amount_residual)
+            amounts.append(amount_to_apply)
+        return amounts
+
+    def _distribute_in_order(self, candidates):
+        amounts = self._allocate_payment_distribution(
+            [candidate["residual"] for candidate in candidates]
+        )
+        return list(zip(candidates, amounts))
+
+    def _distribute_due_date(self, candidates):
+        return self._distribute_in_order(candidates)
+
+    def _distribute_fifo(self, candidates):
+        return self._distribute_in_order(
+            sorted(candidates, key=lambda x: (x["date"], x["move_id"], x["id"]))
+        )
+
+    def _distribute_discount(self, candidates):
+        # The discounts not expired first, by deadline, then the other lines
+        # in their order, by due date
+        def key(candidate):
+            date_discount = candidate["date_discount"]
+            if date_discount and date_discount >= self.date:
+                return (False, date_discount)
+            return (True,)
+
+        return self._distribute_in_order(sorted(candidates, key=key))
+
+    def _get_exact_match_time_budget(self):
+        return float(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("account_payment_line.exact_match_time_budget", 2.0)
+        )
+
+    def _distribute_exact(self, candidates):
+        """Pay in full the lines whose residuals sum exactly to the amount of
+        the payment, by due date otherwise."""
+        rounding = self.currency_id.rounding
+        subset = find_subset_sum(
+            [round(abs(candidate["residual"]) / rounding) for candidate in candidates],
+            round(self.amount / rounding),
+            self._get_exact_match_time_budget(),
+        )
+        if subset is None:
+            return self._distribute_due_date(candidates)
+        subset = set(subset)
+        return [
+            (candidate, abs(candidate["residual"]) if index in subset else 0)
+            for index, candidate in enumerate(candidates)
+        ]
+
+    def action_propose_payment_distribution(self):
+        aml_model = self.env["account.move.line"]
+        payments = self.filtered(lambda x: not x.is_internal_transfer)
+        # The journal items are reused for the new lines right after
+        payments.mapped("line_payment_counterpart_ids").with_context(
+            skip_counterpart_move_lines_reset=True
+        ).unlink()
+        rates = {}
+        vals_list = []
+        for rec in payments:
+            candidates = rec._get_distribution_candidates()
+            rate = rec._get_distribution_rate(rates)
+            for candidate in candidates:
+                candidate["residual"] = rec.currency_id.round(
+                    candidate["amount_residual"] * rate
+                )
+            distribution = getattr(rec, "_distribute_%s" % rec.distribution_strategy)(
+                candidates
+            )
+            amls = aml_model.browse([candidate["id"] for candidate, _ in distribution])
+            for aml, (_candidate, amount_to_apply) in zip(amls, distribution):
+                vals_list.append(
+                    rec._prepare_counterpart_line_vals(
+                        aml.move_id, aml, amount_to_apply
                     )
-                    if pending_amount >= 0:
-                        amount_to_apply = min(abs(amount_residual), pending_amount)
-                        pending_amount -= abs(amount_residual)
-                    rec._hook_create_new_line(invoice, aml, amount_to_apply)
+                )
+        self.env["account.payment.counterpart.line"].create(vals_list)
+        payments.filtered(
+            lambda x: x.state == "draft"
+        )._synchronize_counterpart_move_lines()
 
     def action_delete_counterpart_lines(self):
         if self.line_payment_counterpart_ids and self.state == "draft":
@@ -243,28 +414,109 @@ class AccountPayment(models.Model):
                     )
                 )
 
+    def _get_move_line_changes(self, line, vals):
+        """Return the values of ``vals`` differing from the ones of the move
+        ``line``."""
+        changes = {}
+        for name, value in vals.items():
+            field = line._fields[name]
+            if field.convert_to_cache(value, line) != field.convert_to_cache(
+                line[name], line
+            ):
+                changes[name] = value
+        return changes
+
+    def _get_counterpart_move_line_commands(self):
+        """Return the commands turning the lines of the move into the ones of
+        ``_prepare_move_line_default_vals``, only for the lines to create,
+        update or delete. The lines are matched by counterpart line, in the
+        order of creation. The lines left over, e.g. the ones of counterpart
+        lines proposed again, are then reused for the new counterpart lines.
+        """
+        self.ensure_one()
+        lines_by_payment_line = defaultdict(list)
+        for line in self.move_id.line_ids.sorted("id"):
+            lines_by_payment_line[line.payment_line_id.id].append(line)
+        commands = []
+        new_vals_list = []
+        for vals in self._prepare_move_line_default_vals():
+            lines = lines_by_payment_line[vals.get("payment_line_id", False)]
+            if not lines:
+                new_vals_list.append(vals)
+                continue
+            line = lines.pop(0)
+            changes = self._get_move_line_changes(line, vals)
+            if changes:
+                commands.append((1, line.id, changes))
+        spare_lines = sorted(
+            (line for lines in lines_by_payment_line.values() for line in lines),
+            key=lambda line: line.id,
+        )
+        for vals in new_vals_list:
+            if not spare_lines or not vals.get("payment_line_id"):
+                commands.append((0, 0, vals))
+                continue
+            line = spare_lines.pop(0)
+            changes = self._get_move_line_changes(line, vals)
+            if changes:
+                commands.append((1, line.id, changes))
+        return [(2, line.id) for line in spare_lines] + commands
+
+    def _synchronize_counterpart_move_lines(self, move_vals=None):
+        """Bring the lines of the moves in line with the counterpart lines of
+        the payments, writing only what changed."""
+        for rec in self:
+            vals = dict(move_vals or {})
+            commands = rec._get_counterpart_move_line_commands()
+            if commands:
+                vals["line_ids"] = commands
+            if vals:
+                rec.move_id.write(vals)
+
+    def _synchronize_to_moves(self, changed_fields):
+        # The standard synchronization expects a single counterpart line
+        if self._context.get("skip_account_move_synchronization"):
+            return
+        payments = self.filtered(
+            lambda x: x.line_payment_counterpart_ids
+            and x.move_id.line_ids.filtered("payment_line_id")
+        )
+        super(AccountPayment, self - payments)._synchronize_to_moves(changed_fields)
+        if not payments or not any(
+            field_name in changed_fields
+            for field_name in (
+                "date",
+                "amount",
+                "payment_type",
+                "partner_type",
+                "payment_reference",
+                "is_internal_transfer",
+                "currency_id",
+                "partner_id",
+                "destination_account_id",
+                "partner_bank_id",
+                "journal_id",
+            )
+        ):
+            return
+        for pay in payments.with_context(skip_account_move_synchronization=True):
+            pay._synchronize_counterpart_move_lines(
+                {
+                    "partner_id": pay.partner_id.id,
+                    "currency_id": pay.currency_id.id,
+                    "partner_bank_id": pay.partner_bank_id.id,
+                }
+            )
+
     def action_post(self):
         self._check_writeoff_lines()
-        for rec in self.filtered(lambda x: x.line_payment_counterpart_ids):
-            if rec.move_id.line_ids:
-                rec.move_id.line_ids.unlink()
-            rec.move_id.line_ids = [
-                (0, 0, line_vals) for line_vals in rec._prepare_move_line_default_vals()
-            ]
+        self.filtered(
+            lambda x: x.line_payment_counterpart_ids
+        )._synchronize_counterpart_move_lines()
         res = super(AccountPayment, self).action_post()
         self._process_post_reconcile()
         return res
 
-    def action_draft(self):
-        res = super().action_draft()
-        for rec in self.filtered(lambda x: x.line_payment_counterpart_ids):
-            # CHECK ME: force to recreate lines
-            # if document back to draft state,
-            # because we can change counterpart lines,
-            # but change will not be propagated properly
-            rec.move_id.line_ids.unlink()
-        return res
-
 
 class AccountPaymentCounterLine(models.Model):
     _name = "account.payment.counterpart.line"
@@ -284,6 +536,18 @@ class AccountPaymentCounterLine(models.Model):
         check_company=True,
     )
 
+    def unlink(self):
+        payments = self.mapped("payment_id")
+        res = super().unlink()
+        if self.env.context.get("skip_counterpart_move_lines_reset"):
+            return res
+        # Back to the standard lines of the payment once all its counterpart
+        # lines are gone
+        payments.filtered(
+            lambda x: x.state == "draft" and not x.line_payment_counterpart_ids
+        )._synchronize_counterpart_move_lines()
+        return res
+
     def _get_onchange_fields(self):
         return (
             "aml_id.amount_residual",
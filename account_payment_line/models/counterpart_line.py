@@ -83,41 +83,62 @@ class AccountPaymentCounterLinesAbstract(models.AbstractModel):
 
     @api.depends(lambda x: x._get_onchange_fields())
     def _compute_amounts(self):
+        # One read of the residuals of all the move lines, and one rate
+        # lookup by currencies, company and date
+        self.mapped("aml_id").mapped("amount_residual")
+        rates = {}
         for rec in self:
             payment_date = (
                 hasattr(rec.payment_id, "payment_date")
                 and rec.payment_id.payment_date
                 or rec.payment_id.date
             )
-            rec.amount_currency = rec.payment_id.currency_id._convert(
-                rec.amount,
-                rec.payment_id.company_id.currency_id,
-                rec.payment_id.company_id,
-                date=payment_date,
+            rec.amount_currency = rec._convert_to_company_currency(
+                rec.amount, payment_date, rates
             )
-            rec.aml_amount_residual = rec.aml_id.amount_residual
+            amount_residual = rec.aml_id.amount_residual
+            amount_residual_currency = rec.aml_id.amount_residual_currency
+            rec.aml_amount_residual = amount_residual
             rec.residual_after_payment = (
                 not rec.fully_paid
-                and max(abs(rec.aml_id.amount_residual) - rec.amount_currency, 0)
+                and max(abs(amount_residual) - rec.amount_currency, 0)
                 or 0.0
             )
             rec.writeoff_amount = (
-                rec.fully_paid and (rec.aml_id.amount_residual - rec.amount) or 0.0
+                rec.fully_paid and (amount_residual - rec.amount) or 0.0
             )
-            rec.aml_amount_residual_currency = rec.aml_id.amount_residual_currency
+            rec.aml_amount_residual_currency = amount_residual_currency
             rec.residual_after_payment_currency = (
                 not rec.fully_paid
-                and max(
-                    abs(rec.aml_id.amount_residual_currency) - rec.amount_currency, 0
-                )
+                and max(abs(amount_residual_currency) - rec.amount_currency, 0)
                 or 0.0
             )
             rec.writeoff_amount_currency = (
                 rec.fully_paid
-                and (rec.aml_id.amount_residual_currency - rec.amount_currency)
+                and (amount_residual_currency - rec.amount_currency)
                 or 0.0
             )
 
+    def _convert_to_company_currency(self, amount, date, rates):
+        """Convert ``amount`` from the currency of the payment as
+        ``res.currency._convert`` does, with the rates looked up once per
+        currencies, company and date in ``rates``."""
+        self.ensure_one()
+        from_currency = self.payment_id.currency_id
+        company = self.payment_id.company_id
+        to_currency = company.currency_id
+        if not (from_currency and to_currency and date):
+            # Let _convert complain about the missing values
+            return from_currency._convert(amount, to_currency, company, date=date)
+        if from_currency == to_currency:
+            return to_currency.round(amount)
+        key = (from_currency, to_currency, company, date)
+        if key not in rates:
+            rates[key] = from_currency._get_conversion_rate(
+                from_currency, to_currency, company, date
+            )
+        return to_currency.round(amount * rates[key])
+
     partner_id = fields.Many2one("res.partner", string="Partner", ondelete="restrict")
     commercial_partner_id = fields.Many2one(related="partner_id.commercial_partner_id")
     move_id = fields.Many2one(
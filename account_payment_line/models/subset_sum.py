@@ -0,0 +1,119 @@
+# Copyright 2022 ForgeFlow, S.L.
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl)
+
+import time
+
+# Up to this number of weights, the subsets are enumerated by halves
+MEET_IN_THE_MIDDLE_MAX_WEIGHTS = 32
+# Largest target of the dynamic programming, the weights taken first reduce
+# larger ones down to DYNAMIC_PROGRAMMING_FLOOR
+DYNAMIC_PROGRAMMING_MAX_TARGET = 1 << 22
+DYNAMIC_PROGRAMMING_FLOOR = 1 << 20
+# Bound of the bits of the reachable sums kept to rebuild the subset found
+DYNAMIC_PROGRAMMING_MAX_BITS = 1 << 29
+
+
+def _half_sums(weights, offset, target, deadline):
+    """Map the sums up to ``target`` of the subsets of ``weights`` to the
+    indexes of one of their subsets, shifted by ``offset``."""
+    sums = {0: ()}
+    for index, weight in enumerate(weights, offset):
+        if time.monotonic() > deadline:
+            raise TimeoutError()
+        for subtotal, subset in list(sums.items()):
+            total = subtotal + weight
+            if total <= target and total not in sums:
+                sums[total] = subset + (index,)
+    return sums
+
+
+def _meet_in_the_middle(weights, target, deadline):
+    middle = len(weights) // 2
+    first_sums = _half_sums(weights[:middle], 0, target, deadline)
+    second_sums = _half_sums(weights[middle:], middle, target, deadline)
+    for subtotal, subset in second_sums.items():
+        if target - subtotal in first_sums:
+            return list(first_sums[target - subtotal] + subset)
+    return None
+
+
+def _dynamic_programming(weights, indexes, target, deadline):
+    """Find a subset of the weights at ``indexes`` summing to ``target``, the
+    sums reachable with the first weights being the bits of an integer."""
+    mask = (1 << (target + 1)) - 1
+    reachable = 1
+    # Reachable sums before each weight, to rebuild the subset backwards
+    history = []
+    for index in indexes:
+        if time.monotonic() > deadline:
+            raise TimeoutError()
+        weight = weights[index]
+        if weight > target:
+            continue
+        history.append((index, reachable))
+        reachable = (reachable | (reachable << weight)) & mask
+        if reachable >> target & 1:
+            subset = []
+            total = target
+            for index, previous in reversed(history):
+                if not previous >> total & 1:
+                    subset.append(index)
+                    total -= weights[index]
+            return subset
+        if len(history) * (target + 1) > DYNAMIC_PROGRAMMING_MAX_BITS:
+            raise TimeoutError()
+    return None
+
+
+def _greedy_dynamic_programming(weights, target, deadline):
+    """Take the first weights until the rest of ``target`` is small enough for
+    the dynamic programming, then give them back one by one until it finds
+    the rest."""
+    taken = []
+    remaining = target
+    for index, weight in enumerate(weights):
+        if remaining - weight >= DYNAMIC_PROGRAMMING_FLOOR:
+            taken.append(index)
+            remaining -= weight
+    while remaining <= DYNAMIC_PROGRAMMING_MAX_TARGET:
+        taken_indexes = set(taken)
+        subset = _dynamic_programming(
+            weights,
+            [index for index in range(len(weights)) if index not in taken_indexes],
+            remaining,
+            deadline,
+        )
+        if subset is not None:
+            return sorted(taken + subset)
+        if not taken:
+            break
+        remaining += weights[taken.pop()]
+    return None
+
+
+def find_subset_sum(weights, target, time_budget):
+    """Find a subset of the positive integers ``weights`` summing exactly to
+    ``target``, giving up after ``time_budget`` seconds.
+
+    Small sets of weights are split in two halves whose sums are matched.
+    For the others, the first weights are taken while the rest of the
+    target is large, and a dynamic programming over the sums reachable with
+    the next ones, bounded in size, looks for the rest. The first weights
+    are then preferred, so they should be given by order of preference.
+
+    :return: sorted list of the indexes of the weights of the subset, None if
+             there is no such subset or it was not found in time
+    """
+    if target <= 0:
+        return None
+    if target in weights:
+        return [weights.index(target)]
+    if sum(weights) == target:
+        return list(range(len(weights)))
+    deadline = time.monotonic() + time_budget
+    try:
+        if len(weights) <= MEET_IN_THE_MIDDLE_MAX_WEIGHTS:
+            return _meet_in_the_middle(weights, target, deadline)
+        return _greedy_dynamic_programming(weights, target, deadline)
+    except TimeoutError:
+        return None
@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl)
 
 import json
+from datetime import timedelta
+from unittest.mock import patch
 
 from odoo import fields
 from odoo.exceptions import ValidationError
@@ -977,6 +979,103 @@ class TestAccountPaymentLines(TransactionCase):
             new_in_refund2 + new_in_invoice2,
         )
 
+    def test_10_payment_distribution_in_bulk(self):
+        new_out_invoice = self._create_invoice("out_invoice", self.customer, 100.0)
+        new_out_invoice2 = self._create_invoice("out_invoice", self.customer, 100.0)
+        payment_form = Form(
+            self.env["account.payment"].with_context(
+                default_journal_id=self.bank_journal.id
+            )
+        )
+        payment_form.partner_id = self.customer
+        payment_form.payment_type = "inbound"
+        payment_form.partner_type = "customer"
+        payment_form.currency_id = self.currency_2x
+        payment_form.amount = 300.0
+        payment = payment_form.save()
+        line_model = self.env["account.payment.counterpart.line"]
+        with patch.object(
+            type(line_model),
+            "create",
+            autospec=True,
+            side_effect=type(line_model).create,
+        ) as create:
+            payment.action_propose_payment_distribution()
+        self.assertEqual(create.call_count, 1)
+        lines = payment.line_payment_counterpart_ids.sorted("id")
+        self.assertEqual(lines.mapped("move_id"), new_out_invoice + new_out_invoice2)
+        # Residuals converted to the currency of the payment, by due date
+        self.assertEqual(lines.mapped("amount"), [200.0, 100.0])
+
+    def test_10_payment_distribution_exact_amount(self):
+        new_out_invoice = self._create_invoice("out_invoice", self.customer, 100.0)
+        new_out_invoice2 = self._create_invoice("out_invoice", self.customer, 70.0)
+        new_out_invoice3 = self._create_invoice("out_invoice", self.customer, 30.0)
+        payment = self._create_payment(self.customer, 130.0, "inbound", "customer")
+        payment.action_propose_payment_distribution()
+        lines = payment.line_payment_counterpart_ids.sorted("id")
+        self.assertEqual(
+            lines.mapped("move_id"),
+            new_out_invoice + new_out_invoice2 + new_out_invoice3,
+        )
+        self.assertEqual(lines.mapped("amount"), [100.0, 30.0, 0.0])
+        payment.distribution_strategy = "exact"
+        payment.action_propose_payment_distribution()
+        lines = payment.line_payment_counterpart_ids.sorted("id")
+        self.assertEqual(lines.mapped("amount"), [100.0, 0.0, 30.0])
+        # No exact match: by due date
+        payment.amount = 120.0
+        payment.action_propose_payment_distribution()
+        lines = payment.line_payment_counterpart_ids.sorted("id")
+        self.assertEqual(lines.mapped("amount"), [100.0, 20.0, 0.0])
+
+    def _get_distribution_candidate(self, index, date, date_discount, residual):
+        return {
+            "id": index,
+            "move_id": index,
+            "date": date,
+            "date_maturity": date + timedelta(days=30),
+            "date_discount": date_discount,
+            "amount_residual": residual,
+            "residual": residual,
+        }
+
+    def test_10_payment_distribution_fifo_discount(self):
+        payment = self._create_payment(self.customer, 250.0, "inbound", "customer")
+        today = payment.date
+        # By due date, as returned by _get_distribution_candidates
+        candidates = [
+            # No discount
+            self._get_distribution_candidate(1, today - timedelta(days=10), None, 100),
+            # Discount expired
+            self._get_distribution_candidate(
+                2, today - timedelta(days=30), today - timedelta(days=20), 100
+            ),
+            self._get_distribution_candidate(
+                3, today - timedelta(days=20), today + timedelta(days=5), 100
+            ),
+            self._get_distribution_candidate(
+                4, today - timedelta(days=25), today + timedelta(days=2), 100
+            ),
+        ]
+        distribution = payment._distribute_fifo(candidates)
+        self.assertEqual(
+            [(candidate["id"], amount) for candidate, amount in distribution],
+            [(2, 100), (4, 100), (3, 50), (1, 0)],
+        )
+        # The discounts not expired by deadline, then the others by due date
+        distribution = payment._distribute_discount(candidates)
+        self.assertEqual(
+            [(candidate["id"], amount) for candidate, amount in distribution],
+            [(4, 100), (3, 100), (1, 50), (2, 0)],
+        )
+        # A discount ending on the payment date is still valid
+        candidates[0]["date_discount"] = today
+        distribution = payment._distribute_discount(candidates)
+        self.assertEqual(
+            [candidate["id"] for candidate, _amount in distribution], [1, 4, 3, 2]
+        )
+
     def test_11_exceptions(self):
         new_out_invoice = self._create_invoice("out_invoice", self.customer, 100.0)
 
@@ -1012,3 +1111,142 @@ class TestAccountPaymentLines(TransactionCase):
                 ],
                 post=True,
             )
+
+    def _count_compute_amounts_queries(self, size):
+        invoices = self.env["account.move"]
+        for _index in range(size):
+            invoices |= self._create_invoice("out_invoice", self.customer, 100.0)
+        payment = self.env["account.payment"].create(
+            {
+                "journal_id": self.bank_journal.id,
+                "partner_id": self.customer.id,
+                "payment_type": "inbound",
+                "partner_type": "customer",
+                "currency_id": self.currency_2x.id,
+                "amount": 20.0 * size,
+                "line_payment_counterpart_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "move_id": invoice.id,
+                            "aml_id": invoice.line_ids.filtered(
+                                lambda x: x.account_id.internal_type == "receivable"
+                            ).id,
+                            "account_id": self.account_receivable.id,
+                            "partner_id": self.customer.id,
+                            "amount": 20.0,
+                        },
+                    )
+                    for invoice in invoices
+                ],
+            }
+        )
+        lines = payment.line_payment_counterpart_ids
+        self.env["account.payment"].invalidate_cache()
+        query_count = self.cr.sql_log_count
+        self.assertEqual(lines.mapped("amount_currency"), [10.0] * size)
+        self.assertEqual(lines.mapped("residual_after_payment"), [90.0] * size)
+        return self.cr.sql_log_count - query_count
+
+    def test_12_compute_amounts_query_count(self):
+        # The queries of the amounts don't depend on the number of lines
+        query_count = self._count_compute_amounts_queries(2)
+        self.assertLessEqual(query_count, 15)
+        self.assertEqual(self._count_compute_amounts_queries(10), query_count)
+
+    def test_13_repost_updates_changed_lines(self):
+        new_invoice = self._create_invoice("out_invoice", self.customer, 100.0)
+        new_invoice2 = self._create_invoice("out_invoice", self.customer, 100.0)
+        payment = self._create_payment(
+            self.customer,
+            200.0,
+            "inbound",
+            "customer",
+            [{"move_id": new_invoice}, {"move_id": new_invoice2}],
+            post=True,
+        )
+        move_lines = payment.move_id.line_ids
+        self.assertEqual(len(move_lines), 3)
+        line, line2 = payment.line_payment_counterpart_ids.sorted("id")
+        payment.action_draft()
+        self.assertEqual(payment.move_id.line_ids, move_lines)
+        payment.write(
+            {
+                "amount": 150.0,
+                "line_payment_counterpart_ids": [(1, line2.id, {"amount": 50.0})],
+            }
+        )
+        payment.action_post()
+        # The lines are updated in place
+        self.assertEqual(payment.move_id.line_ids, move_lines)
+        self.assertEqual(line.move_ids.credit, 100.0)
+        self.assertEqual(line2.move_ids.credit, 50.0)
+        self.assertEqual(new_invoice.amount_residual, 0.0)
+        self.assertEqual(new_invoice2.amount_residual, 50.0)
+        payment.action_draft()
+        payment.action_delete_counterpart_lines()
+        # Back to the standard lines of a payment
+        self.assertEqual(len(payment.move_id.line_ids), 2)
+        self.assertEqual(
+            payment.move_id.line_ids.filtered("credit").account_id,
+            payment.destination_account_id,
+        )
+
+    def test_14_propose_again_updates_lines_in_place(self):
+        self._create_invoice("out_invoice", self.customer, 100.0)
+        self._create_invoice("out_invoice", self.customer, 100.0)
+        payment = self._create_payment(
+            self.customer,
+            150.0,
+            "inbound",
+            "customer",
+            suggest_payment_distribution=True,
+            post=True,
+        )
+        move_lines = payment.move_id.line_ids
+        self.assertEqual(len(move_lines), 3)
+        counterpart_lines = payment.line_payment_counterpart_ids
+        payment.action_draft()
+        payment.action_propose_payment_distribution()
+        self.assertFalse(counterpart_lines.exists())
+        # The journal items are updated in place
+        self.assertEqual(payment.move_id.line_ids, move_lines)
+        self.assertEqual(
+            payment.move_id.line_ids.mapped("payment_line_id"),
+            payment.line_payment_counterpart_ids,
+        )
+        payment.action_post()
+        self.assertEqual(payment.move_id.line_ids, move_lines)
+        self.assertEqual(
+            sorted(payment.line_payment_counterpart_ids.move_ids.mapped("credit")),
+            [50.0, 100.0],
+        )
+
+    def test_15_propose_again_then_change_amount(self):
+        self._create_invoice("out_invoice", self.customer, 100.0)
+        self._create_invoice("out_invoice", self.customer, 100.0)
+        payment = self._create_payment(
+            self.customer,
+            150.0,
+            "inbound",
+            "customer",
+            suggest_payment_distribution=True,
+            post=True,
+        )
+        payment.action_draft()
+        payment.action_propose_payment_distribution()
+        # The amount goes through the synchronization of the counterpart lines
+        payment.amount = 120.0
+        payment.action_propose_payment_distribution()
+        payment.action_post()
+        self.assertEqual(payment.state, "posted")
+        self.assertEqual(len(payment.move_id.line_ids), 3)
+        self.assertEqual(
+            sorted(payment.line_payment_counterpart_ids.move_ids.mapped("credit")),
+            [20.0, 100.0],
+        )
+        self.assertEqual(
+            sum(payment.move_id.line_ids.mapped("debit")),
+            sum(payment.move_id.line_ids.mapped("credit")),
+        )
@@ -0,0 +1,93 @@
+# Copyright 2022 ForgeFlow, S.L.
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl)
+
+import logging
+import random
+import time
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import common, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "-at_install", "post_install", "payment_distribution_benchmark")
+class TestPaymentDistributionBenchmark(common.TransactionCase):
+    """Time every distribution strategy on 10k candidate lines.
+
+    The candidates are generated in memory as returned by
+    ``_get_distribution_candidates``, so only the allocation is timed.
+
+    Not part of the standard test run, use
+    ``--test-tags payment_distribution_benchmark`` to run it.
+    """
+
+    size = 10000
+    # Accepted time of a strategy (seconds), the exact amount one included
+    max_time = 5.0
+
+    def setUp(self):
+        super().setUp()
+        self.payment = self.env["account.payment"].create(
+            {
+                "partner_id": self.env["res.partner"].create({"name": "Bench"}).id,
+                "payment_type": "inbound",
+                "partner_type": "customer",
+                "amount": 0.0,
+            }
+        )
+        today = fields.Date.context_today(self.payment)
+        rng = random.Random(42)
+        self.candidates = []
+        for index in range(self.size):
+            date = today - timedelta(days=rng.randint(0, 365))
+            residual = rng.randint(100, 500000) / 100
+            self.candidates.append(
+                {
+                    "id": index + 1,
+                    "move_id": index + 1,
+                    "date": date,
+                    "date_maturity": date + timedelta(days=30),
+                    "date_discount": rng.random() < 0.5
+                    and date + timedelta(days=10)
+                    or None,
+                    "amount_residual": residual,
+                    "residual": residual,
+                }
+            )
+        subset = rng.sample(self.candidates, 25)
+        self.payment.amount = round(sum(c["residual"] for c in subset), 2)
+
+    def _run_benchmark(self, strategy):
+        start = time.perf_counter()
+        distribution = getattr(self.payment, "_distribute_%s" % strategy)(
+            list(self.candidates)
+        )
+        elapsed = time.perf_counter() - start
+        amount = round(sum(amount for _candidate, amount in distribution), 2)
+        _logger.info(
+            "Distribution strategy %s: %s candidates in %.3fs, %s lines paid",
+            strategy,
+            self.size,
+            elapsed,
+            len([amount for _candidate, amount in distribution if amount]),
+        )
+        self.assertEqual(len(distribution), self.size)
+        self.assertEqual(amount, self.payment.amount)
+        self.assertLess(elapsed, self.max_time)
+        return distribution
+
+    def test_distribution_due_date_benchmark_10k(self):
+        self._run_benchmark("due_date")
+
+    def test_distribution_fifo_benchmark_10k(self):
+        self._run_benchmark("fifo")
+
+    def test_distribution_discount_benchmark_10k(self):
+        self._run_benchmark("discount")
+
+    def test_distribution_exact_benchmark_10k(self):
+        distribution = self._run_benchmark("exact")
+        for candidate, amount in distribution:
+            self.assertIn(amount, (0, candidate["residual"]))
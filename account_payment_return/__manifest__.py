@@ -11,7 +11,7 @@
 
 {
     "name": "Account Payment Returns",
-    "version": "14.0.1.0.7",
+    "version": "14.0.1.5.0",
     "summary": "Manage the return of your payments",
     "license": "AGPL-3",
     "depends": ["mail", "account"],
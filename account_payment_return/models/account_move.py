@@ -3,7 +3,7 @@
 
 from operator import itemgetter
 
-from odoo import fields, models
+from odoo import fields, models, tools
 
 
 class AccountMove(models.Model):
@@ -81,6 +81,22 @@ class AccountMoveLine(models.Model):
         column2="partial_reconcile_id",
     )
 
+    def init(self):
+        super().init()
+        # Partial indexes used to match the payment return lines with the
+        # reconciled receivable items, see ``payment.return.line``
+        for column in ("name", "ref"):
+            index_name = "account_move_line_payment_return_%s_index" % column
+            if not tools.index_exists(self.env.cr, index_name):
+                # pylint: disable=sql-injection
+                self.env.cr.execute(
+                    """CREATE INDEX {index} ON account_move_line ({column})
+                    WHERE reconciled AND account_internal_type = 'receivable'
+                    """.format(
+                        index=index_name, column=column
+                    )
+                )
+
 
 class AccountPartialReconcile(models.Model):
     _inherit = "account.partial.reconcile"
@@ -7,9 +7,29 @@
 # Copyright 2022 NuoBiT Solutions, S.L. - Eric Antones <eantones@nuobit.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
-from odoo.tools import float_compare
+from odoo.tools import float_compare, float_repr
+
+# Confidence (%) of the matches of the payment return lines
+MATCH_CONFIDENCE_EXACT = 100
+MATCH_CONFIDENCE_REFERENCE = 90
+MATCH_CONFIDENCE_TRUNCATED = 70
+MATCH_CONFIDENCE_AMOUNT = 50
+# Confidence of a partner and amount match at the end of the window
+MATCH_CONFIDENCE_AMOUNT_FLOOR = 30
+# Shortest reference looked up as the truncation of a longer one
+MATCH_MIN_TRUNCATED_LENGTH = 6
+
+
+def normalize_reference(reference):
+    """Upper case ``reference`` without its separators and spaces."""
+    return re.sub(r"[\W_]+", "", reference or "").upper()
 
 
 class PaymentReturn(models.Model):
@@ -91,36 +111,67 @@ class PaymentReturn(models.Model):
             else:
                 rec.auto_reconcile_failure = False
 
+    def _get_duplicate_move_lines(self):
+        """Find the payment items returned twice, with a single query.
+
+        An item is returned twice when it is in two lines of the returns, or
+        in a line of the returns and in a line of a done return.
+
+        :return: list of (move line id, line id, duplicate line id), the
+                 duplicate line being the later line of the returns or the
+                 line of the done return
+        """
+        if not self.ids:
+            return []
+        field = self.env["payment.return.line"]._fields["move_line_ids"]
+        self.env["payment.return.line"].flush(["return_id", "move_line_ids"])
+        self.flush(["state"])
+        # pylint: disable=sql-injection
+        self.env.cr.execute(
+            """WITH batch AS (
+                SELECT rel.{move_line} AS move_line_id, rel.{line} AS line_id
+                FROM {relation} rel
+                JOIN payment_return_line l ON l.id = rel.{line}
+                WHERE l.return_id IN %(return_ids)s
+            )
+            SELECT b.move_line_id, b.line_id, other.{line}
+            FROM batch b
+            JOIN {relation} other ON other.{move_line} = b.move_line_id
+                AND other.{line} != b.line_id
+            JOIN payment_return_line ol ON ol.id = other.{line}
+            JOIN payment_return r ON r.id = ol.return_id
+            WHERE (ol.return_id IN %(return_ids)s AND other.{line} > b.line_id)
+                OR (ol.return_id NOT IN %(return_ids)s AND r.state = 'done')
+            ORDER BY b.line_id, other.{line}
+            """.format(
+                relation=field.relation, line=field.column1, move_line=field.column2
+            ),
+            {"return_ids": tuple(self.ids)},
+        )
+        return self.env.cr.fetchall()
+
     @api.constrains("line_ids")
     def _check_duplicate_move_line(self):
-        def append_error(error_line):
-            error_list.append(
+        duplicate_line_ids = []
+        for (
+            _move_line_id,
+            _line_id,
+            duplicate_line_id,
+        ) in self._get_duplicate_move_lines():
+            if duplicate_line_id not in duplicate_line_ids:
+                duplicate_line_ids.append(duplicate_line_id)
+        if duplicate_line_ids:
+            error_list = [
                 _("Payment Line: %s (%s) in Payment Return: %s")
                 % (
                     ", ".join(error_line.mapped("move_line_ids.name")),
                     error_line.partner_id.name,
                     error_line.return_id.name,
                 )
-            )
-
-        error_list = []
-        all_move_lines = self.env["account.move.line"]
-        for line in self.mapped("line_ids"):
-            for move_line in line.move_line_ids:
-                if move_line in all_move_lines:
-                    append_error(line)
-                all_move_lines |= move_line
-        if (not error_list) and all_move_lines:
-            duplicate_lines = self.env["payment.return.line"].search(
-                [
-                    ("move_line_ids", "in", all_move_lines.ids),
-                    ("return_id.state", "=", "done"),
-                ]
-            )
-            if duplicate_lines:
-                for line in duplicate_lines:
-                    append_error(line)
-        if error_list:
+                for error_line in self.env["payment.return.line"].browse(
+                    duplicate_line_ids
+                )
+            ]
             raise ValidationError(
                 _("Payment reference must be unique" "\n%s") % "\n".join(error_list)
             )
@@ -191,14 +242,13 @@ class PaymentReturn(models.Model):
         if not self.journal_id.return_auto_reconcile:
             return
         rounding = self.env.user.company_id.currency_id.rounding
-        counterpart_move_lines = self.env["account.move.line"].browse()
+        counterpart_ids = []
         for move_line in all_move_lines:
             move = move_line.move_id
             if len(move.line_ids) != 2:  # auto.reconciliation not possible
                 return
-            counterpart_move_lines |= move.line_ids.filtered(
-                lambda line: line != move_line
-            )
+            counterpart_ids += (move.line_ids - move_line).ids
+        counterpart_move_lines = self.env["account.move.line"].browse(counterpart_ids)
         if (
             counterpart_move_lines
             and float_compare(
@@ -214,56 +264,102 @@ class PaymentReturn(models.Model):
                 return
             lines_to_reconcile.reconcile()
 
+    def _link_returned_moves(self, returned_moves_by_partial):
+        """Link the new partial reconciles to the returned invoice items, in
+        a single statement.
+
+        :param returned_moves_by_partial: dict of partial reconcile ids to
+            the returned invoice move lines
+        """
+        partial_ids = []
+        move_line_ids = []
+        for partial_id, returned_moves in returned_moves_by_partial.items():
+            for move_line_id in returned_moves.ids:
+                partial_ids.append(partial_id)
+                move_line_ids.append(move_line_id)
+        if not partial_ids:
+            return
+        self.env.cr.execute(
+            """INSERT INTO account_partial_reconcile_account_move_line_rel
+                (partial_reconcile_id, move_line_id)
+            SELECT * FROM unnest(%s::integer[], %s::integer[])
+            ON CONFLICT DO NOTHING
+            """,
+            (partial_ids, move_line_ids),
+        )
+        self.env["account.partial.reconcile"].invalidate_cache(
+            ["origin_returned_move_ids"], list(returned_moves_by_partial)
+        )
+        self.env["account.move.line"].invalidate_cache(
+            ["partial_reconcile_returned_ids"], move_line_ids
+        )
+
     def action_confirm(self):
+        """Post the journal entry of the return and reconcile it.
+
+        All the lines of the journal entry are created at once, the returned
+        payment items are unreconciled at once and the new partial
+        reconciles are linked to the returned invoice items in a single
+        statement, so the confirmation scales with large bank reject files.
+        """
         self.ensure_one()
         # Check for incomplete lines
         if self.line_ids.filtered(lambda x: not x.move_line_ids):
             raise UserError(
                 _("You must input all moves references in the payment return.")
             )
-        invoices = self.env["account.move"]
-        move_line_model = self.env["account.move.line"]
+        move_line_model = self.env["account.move.line"].with_context(
+            check_move_validity=False
+        )
         move = self.env["account.move"].create(self._prepare_return_move_vals())
-        total_amount = 0.0
-        all_move_lines = self.env["account.move.line"]
-        # First loop to generate the move lines and compute the total amount
-        return_line_map = {}
-        for return_line in self.line_ids:
-            move_line2_vals = return_line._prepare_return_move_line_vals(move)
-            move_line2 = move_line_model.with_context(check_move_validity=False).create(
-                move_line2_vals
-            )
-            total_amount += move_line2.debit
-            return_line_map[return_line] = move_line2
-        move_line_vals = self._prepare_move_line(move, total_amount)
+        return_lines = self.line_ids
+        # Debit lines of the returns first, in the order of the return lines
+        vals_list = [
+            return_line._prepare_return_move_line_vals(move)
+            for return_line in return_lines
+        ]
+        total_amount = sum(vals["debit"] for vals in vals_list)
         # credit_move_line: credit on transfer or bank account
-        credit_move_line = move_line_model.create(move_line_vals)
-        move._post()
-        for return_line in self.line_ids:
-            move_line2 = return_line_map[return_line]
-            for move_line in return_line.move_line_ids:
-                # move_line: credit on customer account (from payment move)
-                # returned_moves: debit on customer account (from invoice move)
-                returned_moves = move_line.matched_debit_ids.mapped("debit_move_id")
-                all_move_lines |= move_line
-                invoices |= returned_moves.mapped("move_id")
-                move_line.remove_move_reconcile()
-                (move_line | move_line2).with_context(
-                    check_move_validity=False
-                ).reconcile()
-                return_line.move_line_ids.mapped("matched_debit_ids").write(
-                    {"origin_returned_move_ids": [(6, 0, returned_moves.ids)]}
-                )
+        vals_list.append(self._prepare_move_line(move, total_amount))
+        for return_line in return_lines:
             if return_line.expense_amount:
-                expense_lines_vals = return_line._prepare_expense_lines_vals(move)
-                move_line_model.with_context(check_move_validity=False).create(
-                    expense_lines_vals
-                )
-            extra_lines_vals = return_line._prepare_extra_move_lines(move)
-            move_line_model.create(extra_lines_vals)
+                vals_list += return_line._prepare_expense_lines_vals(move)
+            vals_list += return_line._prepare_extra_move_lines(move)
+        move_lines = move_line_model.create(vals_list)
+        return_move_lines = move_lines[: len(return_lines)]
+        credit_move_line = move_lines[len(return_lines)]
+        move._post()
+        # all_move_lines: credit on customer account (from payment moves)
+        # returned_moves: debit on customer account (from invoice moves)
+        all_move_lines = return_lines.mapped("move_line_ids")
+        returned_moves_by_line = {
+            return_line: return_line.move_line_ids.mapped(
+                "matched_debit_ids.debit_move_id"
+            )
+            for return_line in return_lines
+        }
+        all_move_lines.remove_move_reconcile()
+        for return_line, move_line2 in zip(return_lines, return_move_lines):
+            (return_line.move_line_ids | move_line2).with_context(
+                check_move_validity=False
+            ).reconcile()
+        self._link_returned_moves(
+            {
+                partial.id: returned_moves_by_line[return_line]
+                for return_line in return_lines
+                for partial in return_line.move_line_ids.matched_debit_ids
+            }
+        )
         # Reconcile (if option enabled)
         self._auto_reconcile(credit_move_line, all_move_lines, total_amount)
         # Write directly because we returned payments just now
+        invoices = self.env["account.move"].browse(
+            {
+                move_id
+                for returned_moves in returned_moves_by_line.values()
+                for move_id in returned_moves.move_id.ids
+            }
+        )
         invoices.write(self._prepare_invoice_returned_vals())
         self.write({"state": "done", "move_id": move.id})
         return True
@@ -340,6 +436,19 @@ class PaymentReturnLine(models.Model):
         string="Charges Partner",
         domain=[("supplier_rank", ">", 0)],
     )
+    match_confidence = fields.Integer(
+        string="Match Confidence (%)",
+        readonly=True,
+        help="Confidence of the automatic matching of the payment references. "
+        "Empty when they have been set by hand.",
+    )
+    match_suggestion_id = fields.Many2one(
+        comodel_name="account.move.line",
+        string="Suggested Payment Reference",
+        readonly=True,
+        help="Payment item found by the automatic matching with a confidence "
+        "too low to be set as the payment reference.",
+    )
 
     def _compute_amount(self):
         for line in self:
@@ -356,6 +465,8 @@ class PaymentReturnLine(models.Model):
     @api.onchange("move_line_ids")
     def _onchange_move_line(self):
         self._compute_amount()
+        self.match_confidence = 0
+        self.match_suggestion_id = False
 
     @api.onchange("expense_amount")
     def _onchange_expense_amount(self):
@@ -364,11 +475,52 @@ class PaymentReturnLine(models.Model):
             self.expense_account = journal.default_expense_account_id
             self.expense_partner_id = journal.default_expense_partner_id
 
+    def _filter_match_partner(self, records):
+        """Keep the ``records`` of the partner of the line, if any."""
+        self.ensure_one()
+        if not self.partner_id:
+            return records
+        return records.filtered(lambda x: x.partner_id == self.partner_id)
+
+    def _search_moves_by_name(self, move_type):
+        """Search at once the moves of ``move_type`` named as the references
+        of the lines, grouped by name.
+        """
+        moves_by_name = defaultdict(list)
+        moves = self.env["account.move"].search(
+            [
+                ("name", "in", list(set(self.mapped("reference")))),
+                ("move_type", "=", move_type),
+            ]
+        )
+        for move in moves:
+            moves_by_name[move.name].append(move.id)
+        return {
+            name: moves.browse(move_ids) for name, move_ids in moves_by_name.items()
+        }
+
+    def _write_match_vals(self, vals_by_line):
+        """Write the values of the matched lines, once for all the lines with
+        the same values.
+
+        :param vals_by_line: list of (line, vals)
+        """
+        lines_by_key = defaultdict(list)
+        vals_by_key = {}
+        for line, vals in vals_by_line:
+            key = repr(sorted(vals.items()))
+            vals_by_key[key] = vals
+            lines_by_key[key].append(line.id)
+        for key, line_ids in lines_by_key.items():
+            self.browse(line_ids).write(vals_by_key[key])
+
     def match_invoice(self):
+        invoices_by_name = self._search_moves_by_name("out_invoice")
+        vals_by_line = []
         for line in self:
-            domain = line.partner_id and [("partner_id", "=", line.partner_id.id)] or []
-            domain += [("name", "=", line.reference), ("move_type", "=", "out_invoice")]
-            invoice = self.env["account.move"].search(domain)
+            invoice = line._filter_match_partner(
+                invoices_by_name.get(line.reference, self.env["account.move"])
+            )
             if invoice:
                 invoice_line_ids = invoice.line_ids.filtered(
                     lambda line: line.account_id.user_type_id.type
@@ -381,61 +533,304 @@ class PaymentReturnLine(models.Model):
                     "matched_credit_ids.credit_move_id"
                 )
                 if payment_lines:
-                    line.move_line_ids = payment_lines[0].ids
+                    vals = {
+                        "move_line_ids": [(6, 0, payment_lines[0].ids)],
+                        "match_confidence": MATCH_CONFIDENCE_EXACT,
+                    }
                     if not line.concept:
-                        line.concept = _("Invoice: %s") % invoice.name
+                        vals["concept"] = _("Invoice: %s") % invoice.name
+                    vals_by_line.append((line, vals))
+        self._write_match_vals(vals_by_line)
 
     def match_move_lines(self):
+        lines_by_journal = defaultdict(lambda: self.env["payment.return.line"])
+        vals_by_line = []
         for line in self:
-            domain = line.partner_id and [("partner_id", "=", line.partner_id.id)] or []
-            if line.return_id.journal_id:
+            lines_by_journal[line.return_id.journal_id] |= line
+        for journal, lines in lines_by_journal.items():
+            references = list(set(lines.mapped("reference")))
+            domain = []
+            if journal:
                 domain += [
-                    ("journal_id", "=", line.return_id.journal_id.id),
+                    ("journal_id", "=", journal.id),
                     ("move_id.move_type", "=", "entry"),
                 ]
             domain.extend(
                 [
-                    ("account_id.internal_type", "=", "receivable"),
+                    ("account_internal_type", "=", "receivable"),
                     ("reconciled", "=", True),
                     "|",
-                    ("name", "=", line.reference),
-                    ("ref", "=", line.reference),
+                    ("name", "in", references),
+                    ("ref", "in", references),
                 ]
             )
+            move_line_ids_by_reference = defaultdict(list)
             move_lines = self.env["account.move.line"].search(domain)
-            if move_lines:
-                line.move_line_ids = move_lines.ids
-                if not line.concept:
-                    line.concept = _("Move lines: %s") % ", ".join(
-                        move_lines.mapped("name")
-                    )
+            for move_line in move_lines:
+                for reference in {move_line.name, move_line.ref}:
+                    if reference:
+                        move_line_ids_by_reference[reference].append(move_line.id)
+            for line in lines:
+                matched_lines = line._filter_match_partner(
+                    move_lines.browse(move_line_ids_by_reference[line.reference])
+                )
+                if matched_lines:
+                    vals = {
+                        "move_line_ids": [(6, 0, matched_lines.ids)],
+                        "match_confidence": MATCH_CONFIDENCE_EXACT,
+                    }
+                    if not line.concept:
+                        vals["concept"] = _("Move lines: %s") % ", ".join(
+                            matched_lines.mapped("name")
+                        )
+                    vals_by_line.append((line, vals))
+        self._write_match_vals(vals_by_line)
 
     def match_move(self):
+        moves_by_name = self._search_moves_by_name("entry")
+        vals_by_line = []
         for line in self:
-            domain = line.partner_id and [("partner_id", "=", line.partner_id.id)] or []
-            domain += [("name", "=", line.reference), ("move_type", "=", "entry")]
-            move = self.env["account.move"].search(domain)
+            move = line._filter_match_partner(
+                moves_by_name.get(line.reference, self.env["account.move"])
+            )
             if move:
-                line.move_line_ids = move.line_ids.filtered(
-                    lambda l: (l.account_internal_type == "receivable" and l.reconciled)
-                ).ids
+                vals = {
+                    "move_line_ids": [
+                        (
+                            6,
+                            0,
+                            move.line_ids.filtered(
+                                lambda l: (
+                                    l.account_internal_type == "receivable"
+                                    and l.reconciled
+                                )
+                            ).ids,
+                        )
+                    ],
+                    "match_confidence": MATCH_CONFIDENCE_EXACT,
+                }
                 if not line.concept:
-                    line.concept = _("Move: %s") % move.ref
+                    vals["concept"] = _("Move: %s") % move.ref
+                vals_by_line.append((line, vals))
+        self._write_match_vals(vals_by_line)
 
-    def _find_match(self):
-        # we filter again to remove all ready matched lines in inheritance
-        lines2match = self.filtered(lambda x: ((not x.move_line_ids) and x.reference))
-        lines2match.match_invoice()
+    @api.model
+    def _get_match_strategies(self):
+        """Names of the matching methods, in the order they are tried.
 
-        lines2match = lines2match.filtered(
-            lambda x: ((not x.move_line_ids) and x.reference)
+        Every method receives the lines still unmatched by the previous ones
+        and must match them all at once. Override to add or reorder
+        strategies.
+        """
+        return ["match_invoice", "match_move_lines", "match_move", "match_fuzzy"]
+
+    def _get_match_candidates(self):
+        """Search the payment items the lines can be matched with by
+        ``match_fuzzy``: reconciled receivable credits of the companies and
+        the bank journal of the returns, within the matching window and not
+        in another payment return yet.
+        """
+        window = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("payment_return.match_window_days", 90)
         )
-        lines2match.match_move_lines()
+        today = fields.Date.context_today(self)
+        date_from = min(line.date or line.return_id.date or today for line in self)
+        domain = [
+            ("company_id", "in", self.mapped("return_id.company_id").ids),
+            ("account_internal_type", "=", "receivable"),
+            ("reconciled", "=", True),
+            ("credit", ">", 0),
+            ("date", ">=", date_from - timedelta(days=window)),
+        ]
+        journals = self.mapped("return_id.journal_id")
+        if journals:
+            domain += [
+                ("journal_id", "in", journals.ids),
+                ("move_id.move_type", "=", "entry"),
+            ]
+        candidates = self.env["account.move.line"].search(domain)
+        returned = self.search(
+            [("move_line_ids", "in", candidates.ids), ("id", "not in", self.ids)]
+        )
+        return candidates - returned.mapped("move_line_ids")
 
-        lines2match = lines2match.filtered(
-            lambda x: ((not x.move_line_ids) and x.reference)
+    @api.model
+    def _get_match_references(self, move_lines):
+        """Return the references a payment return line can give for each of
+        the candidate ``move_lines``.
+
+        :return: dict of move line ids to lists of (reference, confidence)
+        """
+        references = defaultdict(list)
+        for move_line in move_lines:
+            for reference in (move_line.name, move_line.ref, move_line.move_id.name):
+                if reference:
+                    references[move_line.id].append(
+                        (reference, MATCH_CONFIDENCE_REFERENCE)
+                    )
+        return references
+
+    @api.model
+    def _build_match_index(self, move_lines):
+        """Index the candidate ``move_lines`` by normalized reference and by
+        partner and amount, so every return line is ranked with a few
+        lookups whatever the number of candidates.
+        """
+        digits = self.env["decimal.precision"].precision_get("Account")
+        by_reference = defaultdict(dict)
+        for move_line_id, references in self._get_match_references(move_lines).items():
+            for reference, confidence in references:
+                key = normalize_reference(reference)
+                if key and confidence > by_reference[key].get(move_line_id, 0):
+                    by_reference[key][move_line_id] = confidence
+        by_amount = defaultdict(list)
+        partners = {}
+        for move_line in move_lines:
+            partners[move_line.id] = move_line.partner_id.id
+            by_amount[
+                (move_line.partner_id.id, float_repr(move_line.credit, digits))
+            ].append((move_line.date, move_line.id))
+        return {
+            "digits": digits,
+            "references": by_reference,
+            "sorted_references": sorted(by_reference),
+            "amounts": by_amount,
+            "partners": partners,
+        }
+
+    def _rank_match_candidates(self, index, window):
+        """Rank the candidates of the index for the line.
+
+        A candidate is found by the normalized reference of the line, by a
+        longer reference the one of the line is the truncation of, or by
+        the partner and amount of the line within the matching window. The
+        confidence of the latter decays from ``MATCH_CONFIDENCE_AMOUNT`` on
+        the date of the line to ``MATCH_CONFIDENCE_AMOUNT_FLOOR`` at the
+        start of the window.
+
+        :return: list of (confidence, move line id), best first
+        """
+        self.ensure_one()
+        scores = defaultdict(int)
+
+        def add(move_line_id, confidence):
+            scores[move_line_id] = max(scores[move_line_id], confidence)
+
+        key = normalize_reference(self.reference)
+        if key:
+            for move_line_id, confidence in index["references"].get(key, {}).items():
+                add(move_line_id, confidence)
+        if len(key) >= MATCH_MIN_TRUNCATED_LENGTH:
+            sorted_references = index["sorted_references"]
+            position = bisect_left(sorted_references, key)
+            while position < len(sorted_references) and sorted_references[
+                position
+            ].startswith(key):
+                reference = sorted_references[position]
+                if reference != key:
+                    for move_line_id, confidence in index["references"][
+                        reference
+                    ].items():
+                        add(
+                            move_line_id,
+                            confidence
+                            - MATCH_CONFIDENCE_REFERENCE
+                            + MATCH_CONFIDENCE_TRUNCATED,
+                        )
+                position += 1
+        if self.partner_id and self.amount:
+            date = self.date or self.return_id.date or fields.Date.context_today(self)
+            amount_key = (self.partner_id.id, float_repr(self.amount, index["digits"]))
+            for move_line_date, move_line_id in index["amounts"].get(amount_key, []):
+                days = (date - move_line_date).days
+                if 0 <= days <= window:
+                    decay = days / window if window else 0.0
+                    add(
+                        move_line_id,
+                        round(
+                            MATCH_CONFIDENCE_AMOUNT
+                            - (MATCH_CONFIDENCE_AMOUNT - MATCH_CONFIDENCE_AMOUNT_FLOOR)
+                            * decay
+                        ),
+                    )
+        if self.partner_id:
+            scores = {
+                move_line_id: confidence
+                for move_line_id, confidence in scores.items()
+                if index["partners"][move_line_id] == self.partner_id.id
+            }
+        return sorted(
+            ((confidence, move_line_id) for move_line_id, confidence in scores.items()),
+            reverse=True,
         )
-        lines2match.match_move()
+
+    def match_fuzzy(self):
+        """Match the lines with the payment items of a matching index built
+        once for all of them, see ``_rank_match_candidates``.
+
+        The best candidate is kept when no other candidate has the same
+        confidence. Below the minimum confidence, it is only suggested and
+        the line is left unmatched.
+        """
+        params = self.env["ir.config_parameter"].sudo()
+        window = int(params.get_param("payment_return.match_window_days", 90))
+        min_confidence = int(
+            params.get_param(
+                "payment_return.match_min_confidence", MATCH_CONFIDENCE_TRUNCATED
+            )
+        )
+        move_lines = self._get_match_candidates()
+        if not move_lines:
+            return
+        index = self._build_match_index(move_lines)
+        used = set()
+        vals_by_line = []
+        for line in self:
+            ranking = [
+                candidate
+                for candidate in line._rank_match_candidates(index, window)
+                if candidate[1] not in used
+            ]
+            if not ranking:
+                continue
+            if len(ranking) > 1 and ranking[1][0] == ranking[0][0]:
+                continue
+            confidence, move_line_id = ranking[0]
+            if confidence < min_confidence:
+                vals_by_line.append(
+                    (
+                        line,
+                        {
+                            "match_suggestion_id": move_line_id,
+                            "match_confidence": confidence,
+                        },
+                    )
+                )
+                continue
+            used.add(move_line_id)
+            move_line = move_lines.browse(move_line_id)
+            vals = {
+                "move_line_ids": [(6, 0, move_line.ids)],
+                "match_suggestion_id": False,
+                "match_confidence": confidence,
+            }
+            if not line.concept:
+                vals["concept"] = _("Move lines: %s") % move_line.name
+            vals_by_line.append((line, vals))
+        self._write_match_vals(vals_by_line)
+
+    def _find_match(self):
+        # we filter again to remove all ready matched lines in inheritance
+        lines2match = self
+        for strategy in self._get_match_strategies():
+            lines2match = lines2match.filtered(
+                lambda x: ((not x.move_line_ids) and x.reference)
+            )
+            if not lines2match:
+                break
+            getattr(lines2match, strategy)()
         self._get_partner_from_move()
         self.filtered(lambda x: not x.amount)._compute_amount()
 
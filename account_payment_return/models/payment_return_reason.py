@@ -1,7 +1,7 @@
 # Copyright 2016 Tecnativa - Carlos Dauden
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 
 
 class PaymentReturnReason(models.Model):
@@ -11,6 +11,52 @@ class PaymentReturnReason(models.Model):
     code = fields.Char()
     name = fields.Char(string="Reason", translate=True)
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        self.clear_caches()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if "code" in vals:
+            self.clear_caches()
+        return super().write(vals)
+
+    def unlink(self):
+        self.clear_caches()
+        return super().unlink()
+
+    @api.model
+    @tools.ormcache()
+    def _get_code_map(self):
+        """Map the codes of all the reasons to their ids, read once and kept
+        until a reason is created, deleted or its code changed."""
+        self.flush(["code"])
+        self.env.cr.execute(
+            "SELECT code, id FROM payment_return_reason "
+            "WHERE code IS NOT NULL ORDER BY id"
+        )
+        code_map = {}
+        for code, reason_id in self.env.cr.fetchall():
+            code_map.setdefault(code.strip(), reason_id)
+        return code_map
+
+    @api.model
+    def resolve(self, codes):
+        """Map the ISO 20022 external reason ``codes`` to the reasons with
+        exactly these codes, without querying the database once the codes
+        are loaded.
+
+        :param codes: iterable of reason codes, the empty ones are ignored
+        :return: dict code -> payment.return.reason id, for the known codes
+        """
+        code_map = self._get_code_map()
+        reason_ids = {}
+        for code in set(codes):
+            reason_id = code and code_map.get(code.strip())
+            if reason_id:
+                reason_ids[code] = reason_id
+        return reason_ids
+
     @api.model
     def name_search(self, name, args=None, operator="ilike", limit=100):
         args = args or []
@@ -5,6 +5,8 @@
 # License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
 
 import json
+from datetime import timedelta
+from unittest.mock import patch
 
 from odoo.exceptions import UserError, ValidationError
 from odoo.tests.common import Form, SavepointCase
@@ -210,6 +212,111 @@ class TestPaymentReturn(SavepointCase):
             self.payment_line.partner_id.id,
         )
 
+    def test_find_match_strategies(self):
+        self.payment_return.line_ids.write(
+            {
+                "partner_id": False,
+                "move_line_ids": [(6, 0, [])],
+                "amount": 0.0,
+                "reference": self.invoice.name,
+            }
+        )
+        line_model = type(self.env["payment.return.line"])
+        with patch.object(
+            line_model, "_get_match_strategies", return_value=["match_move"]
+        ):
+            self.payment_return.button_match()
+        self.assertFalse(self.payment_return.line_ids.move_line_ids)
+        self.payment_return.button_match()
+        self.assertEqual(self.payment_return.line_ids.move_line_ids, self.payment_line)
+
+    def test_write_match_vals(self):
+        line_model = self.env["payment.return.line"]
+        lines = line_model.create(
+            [
+                {"return_id": self.payment_return.id, "reference": reference}
+                for reference in ("REF1", "REF2", "REF3")
+            ]
+        )
+        vals = {
+            "move_line_ids": [(6, 0, self.payment_line.ids)],
+            "match_confidence": 90,
+        }
+        other_vals = dict(vals, match_confidence=70)
+        with patch.object(
+            type(line_model), "write", autospec=True, side_effect=type(line_model).write
+        ) as write:
+            line_model._write_match_vals(
+                [(lines[0], vals), (lines[1], other_vals), (lines[2], vals)]
+            )
+        # One write for every set of values
+        self.assertEqual(write.call_count, 2)
+        self.assertEqual(lines.mapped("match_confidence"), [90, 70, 90])
+        self.assertEqual(lines.move_line_ids, self.payment_line)
+
+    def _prepare_fuzzy_match(self, reference, partner=False, amount=0.0):
+        self.payment_line.name = "RF-2022/000123"
+        self.payment_return.line_ids.write(
+            {
+                "partner_id": partner,
+                "move_line_ids": [(6, 0, [])],
+                "amount": amount,
+                "reference": reference,
+            }
+        )
+        self.payment_return.button_match()
+        return self.payment_return.line_ids
+
+    def test_find_match_fuzzy_reference(self):
+        line = self._prepare_fuzzy_match("rf 2022 000123")
+        self.assertEqual(line.move_line_ids, self.payment_line)
+        self.assertEqual(line.match_confidence, 90)
+
+    def test_find_match_fuzzy_truncated(self):
+        line = self._prepare_fuzzy_match("RF2022/0001")
+        self.assertEqual(line.move_line_ids, self.payment_line)
+        self.assertEqual(line.match_confidence, 70)
+
+    def test_find_match_fuzzy_amount(self):
+        line = self._prepare_fuzzy_match(
+            "UNKNOWN", self.partner.id, self.payment_line.credit
+        )
+        # Only suggested below the default minimum confidence
+        self.assertFalse(line.move_line_ids)
+        self.assertEqual(line.match_suggestion_id, self.payment_line)
+        self.assertEqual(line.match_confidence, 50)
+        self.env["ir.config_parameter"].sudo().set_param(
+            "payment_return.match_min_confidence", 30
+        )
+        line = self._prepare_fuzzy_match(
+            "UNKNOWN", self.partner.id, self.payment_line.credit
+        )
+        self.assertEqual(line.move_line_ids, self.payment_line)
+        self.assertFalse(line.match_suggestion_id)
+        self.assertEqual(line.match_confidence, 50)
+        line = self._prepare_fuzzy_match("UNKNOWN", self.partner_1.id, 10.0)
+        self.assertFalse(line.move_line_ids)
+
+    def test_find_match_fuzzy_amount_window(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "payment_return.match_min_confidence", 30
+        )
+        # A payment made 10 days before the return is still matched
+        self.payment_return.line_ids.date = self.payment_line.date + timedelta(days=10)
+        line = self._prepare_fuzzy_match(
+            "UNKNOWN", self.partner.id, self.payment_line.credit
+        )
+        self.assertEqual(line.move_line_ids, self.payment_line)
+        self.assertEqual(line.match_confidence, 48)
+        # but not when outside the window
+        self.env["ir.config_parameter"].sudo().set_param(
+            "payment_return.match_window_days", 5
+        )
+        line = self._prepare_fuzzy_match(
+            "UNKNOWN", self.partner.id, self.payment_line.credit
+        )
+        self.assertFalse(line.move_line_ids)
+
     def test_find_match_move(self):
         self.payment_move.name = "TESTMOVEXX01"
         self.payment_return.write(
@@ -261,6 +368,21 @@ class TestPaymentReturn(SavepointCase):
         line.reason_id = reason.name_search("Reason Test")[0]
         self.assertEqual(line.reason_id.code, "RTEST")
 
+    def test_reason_resolve(self):
+        reason_model = self.env["payment.return.reason"]
+        reason = reason_model.create({"code": "XT01", "name": "Reason XT01"})
+        reason_long = reason_model.create({"code": "XT011", "name": "Reason XT011"})
+        self.assertEqual(
+            reason_model.resolve(["XT01", "XT011", "XT0", "", False]),
+            {"XT01": reason.id, "XT011": reason_long.id},
+        )
+        with self.assertQueryCount(0):
+            reason_model.resolve(["XT01", "RTEST"])
+        reason.code = "XT02"
+        self.assertEqual(reason_model.resolve(["XT01", "XT02"]), {"XT02": reason.id})
+        reason_long.unlink()
+        self.assertFalse(reason_model.resolve(["XT011"]))
+
     def test_compute_total(self):
         self.assertEqual(self.payment_return.total_amount, 500)
         self.payment_return.write(
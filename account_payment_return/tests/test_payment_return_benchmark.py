@@ -0,0 +1,172 @@
+# License AGPL-3 - See http://www.gnu.org/licenses/agpl-3.0.html
+
+import logging
+import time
+
+from odoo.exceptions import ValidationError
+from odoo.tests import common, tagged
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "-at_install", "post_install", "payment_return_benchmark")
+class TestPaymentReturnBenchmark(common.TransactionCase):
+    """Time the confirmation of payment returns of growing sizes.
+
+    Every return line returns the payment of its own invoice and has a
+    bank charge. The time spent by line of a large return is compared with
+    the one of a 10 lines return, so a confirmation that no longer scales
+    linearly with the number of lines fails.
+
+    The duplicate payment items check is timed on a 10k lines return.
+
+    Not part of the standard test run, use
+    ``--test-tags payment_return_benchmark`` to run it.
+    """
+
+    # Accepted growth of the time by line, compared with a 10 lines return
+    max_ratio = 3.0
+    # Accepted time of the duplicate check of a 10k lines return (seconds)
+    max_duplicate_check_time = 2.0
+
+    def setUp(self):
+        super().setUp()
+        self.account = self.env["account.account"].create(
+            {
+                "name": "Benchmark receivable",
+                "code": "BENCHREC",
+                "user_type_id": self.env.ref("account.data_account_type_receivable").id,
+                "reconcile": True,
+            }
+        )
+        self.bank_journal = self.env["account.journal"].create(
+            {
+                "name": "Benchmark Bank Journal",
+                "code": "BENCH",
+                "type": "bank",
+                "default_expense_account_id": self.account.id,
+            }
+        )
+        self.partners = self.env["res.partner"].create(
+            [
+                {
+                    "name": "Benchmark %s" % index,
+                    "property_account_receivable_id": self.account.id,
+                }
+                for index in range(10)
+            ]
+        )
+
+    def _create_payment_return(self, size):
+        partners = self.partners
+        invoices = self.env["account.move"].create(
+            [
+                {
+                    "move_type": "out_invoice",
+                    "partner_id": partners[index % len(partners)].id,
+                    "invoice_line_ids": [
+                        (
+                            0,
+                            0,
+                            {
+                                "name": "Benchmark",
+                                "quantity": 1.0,
+                                "price_unit": 100.0 + index % 50,
+                            },
+                        )
+                    ],
+                }
+                for index in range(size)
+            ]
+        )
+        invoices.action_post()
+        payments = (
+            self.env["account.payment.register"]
+            .with_context(active_model="account.move", active_ids=invoices.ids)
+            .create({"group_payment": False})
+            ._create_payments()
+        )
+        payment_lines = payments.move_id.line_ids.filtered(
+            lambda line: line.account_id == self.account
+        )
+        payment_return = self.env["payment.return"].create(
+            {
+                "journal_id": self.bank_journal.id,
+                "line_ids": [
+                    (
+                        0,
+                        0,
+                        {
+                            "partner_id": line.partner_id.id,
+                            "move_line_ids": [(6, 0, line.ids)],
+                            "amount": line.credit,
+                            "expense_account": self.account.id,
+                            "expense_amount": 1.0,
+                            "expense_partner_id": line.partner_id.id,
+                        },
+                    )
+                    for line in payment_lines
+                ],
+            }
+        )
+        return payment_return, invoices
+
+    def _confirm(self, size):
+        payment_return, invoices = self._create_payment_return(size)
+        self.env["account.move.line"].flush()
+        self.env.cache.invalidate()
+        start = time.perf_counter()
+        payment_return.action_confirm()
+        self.env["account.move.line"].flush()
+        elapsed = time.perf_counter() - start
+        _logger.info(
+            "payment return of %s lines confirmed in %.2fs (%.2fms by line)",
+            size,
+            elapsed,
+            elapsed * 1000 / size,
+        )
+        self.assertEqual(payment_return.state, "done")
+        # One debit by return, one bank credit, two lines by bank charge
+        self.assertEqual(len(payment_return.move_id.line_ids), size * 3 + 1)
+        self.assertEqual(set(invoices.mapped("payment_state")), {"not_paid"})
+        self.assertEqual(
+            payment_return.line_ids.move_line_ids.matched_debit_ids.origin_returned_move_ids,
+            invoices.line_ids.filtered(lambda line: line.account_id == self.account),
+        )
+        return elapsed / size
+
+    def _run_benchmark(self, size):
+        reference = self._confirm(10)
+        if size == 10:
+            return
+        self.assertLess(self._confirm(size), reference * self.max_ratio)
+
+    def test_payment_return_benchmark_10(self):
+        self._run_benchmark(10)
+
+    def test_payment_return_benchmark_1k(self):
+        self._run_benchmark(1000)
+
+    def test_payment_return_benchmark_10k(self):
+        self._run_benchmark(10000)
+
+    def test_duplicate_check_benchmark_10k(self):
+        payment_return, _invoices = self._create_payment_return(10000)
+        start = time.perf_counter()
+        payment_return._check_duplicate_move_line()
+        elapsed = time.perf_counter() - start
+        _logger.info("duplicate check of 10000 return lines in %.2fs", elapsed)
+        self.assertLess(elapsed, self.max_duplicate_check_time)
+        line = payment_return.line_ids[-1]
+        with self.assertRaises(ValidationError):
+            payment_return.line_ids = [
+                (
+                    0,
+                    0,
+                    {
+                        "partner_id": line.partner_id.id,
+                        "move_line_ids": [(6, 0, line.move_line_ids.ids)],
+                        "amount": line.amount,
+                    },
+                )
+            ]
@@ -6,7 +6,7 @@
 {
     "name": "Account Payment Return Import",
     "category": "Accounting",
-    "version": "14.0.1.0.2",
+    "version": "14.0.1.3.0",
     "development_status": "Mature",
     "summary": "This module adds a generic wizard to import payment return"
     "file formats. Is only the base to be extended by another"
@@ -19,6 +19,7 @@
         "security/ir.model.access.csv",
         "views/payment_return_view.xml",
         "wizard/payment_return_import_view.xml",
+        "views/payment_return_import_log_view.xml",
     ],
     "installable": True,
 }
@@ -1,2 +1,3 @@
 from . import payment_return
+from . import payment_return_import_log
 from . import payment_return_line
@@ -0,0 +1,117 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import hashlib
+from contextlib import contextmanager
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+
+class PaymentReturnImportLog(models.Model):
+    """Progress of the import of a payment return file.
+
+    The import records here how many transactions of the file it has
+    processed, so an import committed by chunks and interrupted resumes
+    after the last committed chunk when the same file is imported again.
+    The file is locked while it is imported, so the same file is never
+    imported twice at the same time.
+    """
+
+    _name = "payment.return.import.log"
+    _description = "Payment Return Import Log"
+    _order = "id desc"
+
+    checksum = fields.Char(required=True, readonly=True, index=True)
+    state = fields.Selection(
+        [("in_progress", "In Progress"), ("done", "Done"), ("failed", "Failed")],
+        default="in_progress",
+        required=True,
+        readonly=True,
+    )
+    transaction_count = fields.Integer(
+        "Processed Transactions",
+        readonly=True,
+        help="Number of transactions of the file already processed, in the "
+        "order of the file.",
+    )
+    payment_return_id = fields.Many2one(
+        "payment.return",
+        "Last Payment Return",
+        readonly=True,
+        help="Payment return the last processed transaction was added to.",
+    )
+    payment_return_ids = fields.Many2many(
+        "payment.return",
+        "payment_return_import_log_return_rel",
+        "log_id",
+        "return_id",
+        "Payment Returns",
+        readonly=True,
+    )
+    error = fields.Text(readonly=True)
+
+    @api.model
+    def _get_checksum(self, data_file):
+        return hashlib.sha1(data_file).hexdigest()
+
+    @api.model
+    def _try_lock(self, cr, data_file):
+        """Take the lock of the import of ``data_file`` in the transaction of
+        ``cr``. It is taken on the checksum of the file, so it also covers
+        the creation of its log.
+
+        :raise: UserError if another import of the file holds the lock
+        """
+        # The first 60 bits of the checksum fit in the bigint of the lock
+        key = int(self._get_checksum(data_file)[:15], 16)
+        cr.execute("SELECT pg_try_advisory_xact_lock(%s)", (key,))
+        if not cr.fetchone()[0]:
+            raise UserError(_("This file is already being imported."))
+
+    @api.model
+    @contextmanager
+    def _lock_file(self, data_file, commit=False):
+        """Lock the import of ``data_file`` while it runs.
+
+        Without ``commit``, the lock is held by the transaction of the import
+        until its end. With ``commit``, it is held by a transaction of its
+        own until exiting the context, so the import can commit its chunks
+        without releasing it.
+        """
+        if not commit:
+            self._try_lock(self.env.cr, data_file)
+            yield
+            return
+        with self.pool.cursor() as cr:
+            self._try_lock(cr, data_file)
+            yield
+
+    @api.model
+    def _get_log(self, data_file):
+        """Return the unfinished log of the import of ``data_file``, or a
+        new one. The file must be locked with ``_lock_file``."""
+        checksum = self._get_checksum(data_file)
+        log = self.search(
+            [("checksum", "=", checksum), ("state", "!=", "done")], limit=1
+        )
+        if log:
+            log.write({"state": "in_progress", "error": False})
+            return log
+        return self.create({"checksum": checksum})
+
+    def _commit(self):
+        """Commit the progress of the import."""
+        self.env.cr.commit()  # pylint: disable=invalid-commit
+
+    def _chunk_done(self, transaction_count, payment_return, commit=False):
+        """Record a processed chunk, committing it if asked."""
+        self.ensure_one()
+        vals = {"transaction_count": transaction_count}
+        if payment_return:
+            vals.update(
+                payment_return_id=payment_return.id,
+                payment_return_ids=[(4, payment_return.id)],
+            )
+        self.write(vals)
+        if commit:
+            self._commit()
@@ -2,6 +2,10 @@
 # Copyright 2021 Tecnativa - Víctor Martínez
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
+import hashlib
+from io import BytesIO
+from zipfile import ZipFile
+
 from odoo.exceptions import UserError
 from odoo.tests.common import Form
 
@@ -130,3 +134,88 @@ class TestImportBase(TestPaymentReturnFile):
                 "TEST123456",
                 local_account="NL77ABNA0574908765",
             )
+
+    def _get_import_data(self):
+        header = (
+            "account_number,name,date,amount,unique_import_id,concept,"
+            "reason_code,reason,partner_name,reference\n"
+        )
+        rows = [
+            "%s,M%s,2017-07-10,125.45,%s,Test payment return,RTEST,Reason Test,"
+            "Test partner,\n" % (self.acc_number, index, index)
+            for index in range(1, 3)
+        ]
+        return (header + "".join(rows)).encode()
+
+    def test_payment_return_import_chunked(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "payment_return_import.chunk_size", 1
+        )
+        data_file = self._get_import_data()
+        payment_returns, _notifications = self.env[
+            "payment.return.import"
+        ]._import_file(data_file)
+        self.assertEqual(set(payment_returns.mapped("name")), {"M1", "M2"})
+        self.assertEqual(len(payment_returns.line_ids), 2)
+        log = self.env["payment.return.import.log"].search(
+            [("checksum", "=", hashlib.sha1(data_file).hexdigest())]
+        )
+        self.assertEqual(log.state, "done")
+        self.assertEqual(log.transaction_count, 2)
+        self.assertEqual(log.payment_return_ids, payment_returns)
+        with self.assertRaises(UserError):
+            self.env["payment.return.import"]._import_file(data_file)
+
+    def test_payment_return_import_resume(self):
+        data_file = self._get_import_data()
+        log = self.env["payment.return.import.log"].create(
+            {
+                "checksum": hashlib.sha1(data_file).hexdigest(),
+                "state": "failed",
+                "transaction_count": 1,
+            }
+        )
+        payment_returns, _notifications = self.env[
+            "payment.return.import"
+        ]._import_file(data_file)
+        self.assertEqual(payment_returns.mapped("name"), ["M2"])
+        self.assertFalse(self.env["payment.return"].search([("name", "=", "M1")]))
+        self.assertEqual(log.state, "done")
+        self.assertEqual(log.transaction_count, 2)
+
+    def test_payment_return_import_locked(self):
+        data_file = self._get_import_data()
+        log_model = self.env["payment.return.import.log"]
+        # Held by another transaction, as an import committing its chunks
+        with log_model._lock_file(data_file, commit=True):
+            with self.assertRaises(UserError):
+                self.env["payment.return.import"]._import_file(data_file)
+        self.assertFalse(
+            log_model.search([("checksum", "=", hashlib.sha1(data_file).hexdigest())])
+        )
+
+    def _test_zip_import_bad_member(self, processes):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "payment_return_import.parse_processes", processes
+        )
+        data = BytesIO()
+        with ZipFile(data, "w") as archive:
+            archive.writestr("bad.csv", b"\xff\xfe\x00")
+            archive.writestr("returns.csv", self._get_import_data())
+        payment_returns, notifications = self.env["payment.return.import"]._import_file(
+            data.getvalue()
+        )
+        self.assertEqual(set(payment_returns.mapped("name")), {"M1", "M2"})
+        self.assertEqual(len(notifications), 1)
+        self.assertIn("bad.csv", notifications[0]["message"])
+        log = self.env["payment.return.import.log"].search(
+            [("checksum", "=", hashlib.sha1(data.getvalue()).hexdigest())]
+        )
+        self.assertEqual(log.state, "done")
+        self.assertIn("bad.csv", log.error)
+
+    def test_zip_import_bad_member(self):
+        self._test_zip_import_bad_member(1)
+
+    def test_zip_import_bad_member_parallel(self):
+        self._test_zip_import_bad_member(2)
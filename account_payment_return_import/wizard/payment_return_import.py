@@ -4,6 +4,9 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import base64
+import logging
+import multiprocessing
+import os
 from io import BytesIO
 from zipfile import BadZipfile, ZipFile  # BadZipFile in Python >= 3.2
 
@@ -14,6 +17,36 @@ from odoo.addons.base_iban.models.res_partner_bank import pretty_iban
 
 from .base_parser import BaseParser
 
+_logger = logging.getLogger(__name__)
+
+_parse_process_state = {}
+
+
+class _NoDatabaseCursor(object):
+    """Cursor of the processes parsing the files of a zip, which must not
+    query the database: the connection inherited from the parent process
+    belongs to it."""
+
+    def __init__(self, dbname):
+        self.dbname = dbname
+
+    def __getattr__(self, name):
+        raise RuntimeError("The files of a zip are parsed without database access.")
+
+
+def _init_parse_process(wizard, data_file):
+    """Open the zip once in each process of the parsing pool, with an
+    environment without database access."""
+    cr = _NoDatabaseCursor(wizard.env.cr.dbname)
+    _parse_process_state["wizard"] = wizard.with_env(wizard.env(cr=cr))
+    _parse_process_state["archive"] = ZipFile(BytesIO(data_file), "r")
+
+
+def _parse_process_member(filename):
+    return _parse_process_state["wizard"]._parse_member(
+        _parse_process_state["archive"], filename
+    )
+
 
 class PaymentReturnImport(models.TransientModel):
     _name = "payment.return.import"
@@ -42,6 +75,11 @@ class PaymentReturnImport(models.TransientModel):
         "bank and select them here.",
     )
     match_after_import = fields.Boolean(default=True)
+    commit_per_chunk = fields.Boolean(
+        help="Commit the imported transactions by chunks. An interrupted "
+        "import is resumed after the last committed chunk by importing the "
+        "same file again.",
+    )
 
     def import_file(self):
         """Process the file chosen in the wizard, create bank payment return(s)
@@ -69,58 +107,211 @@ class PaymentReturnImport(models.TransientModel):
         return action
 
     @api.model
-    def _parse_all_files(self, data_file):
-        """Parse one or multiple files from zip-file.
-
-        :param data_file: Decoded raw content of the file
-        :return: List of payment returns dictionaries for further processing.
-        """
-        payment_return_raw_list = []
-        files = [data_file]
+    def _get_archive_members(self, data_file):
+        """Return the names of the files of the zip, None if the file is not
+        a zip."""
         try:
             with ZipFile(BytesIO(data_file), "r") as archive:
-                files = [
-                    archive.read(filename)
+                return [
+                    filename
                     for filename in archive.namelist()
                     if not filename.endswith("/")
                 ]
         except BadZipfile:
-            pass
-        # Parse the file(s)
-        for import_file in files:
+            return None
+
+    @api.model
+    def _get_import_files(self, data_file):
+        """Return the raw content of the file, or of the files of the zip."""
+        filenames = self._get_archive_members(data_file)
+        if filenames is None:
+            return [data_file]
+        with ZipFile(BytesIO(data_file), "r") as archive:
+            return [archive.read(filename) for filename in filenames]
+
+    @api.model
+    def _get_parse_processes(self, member_count):
+        """Number of processes parsing the files of a zip, 1 to parse them
+        in the current process, 0 for one per CPU."""
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return 1
+        processes = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("payment_return_import.parse_processes", 1)
+        )
+        return min(processes or os.cpu_count() or 1, member_count)
+
+    @api.model
+    def _parse_member(self, archive, filename):
+        """Parse the file ``filename`` of ``archive``.
+
+        :return: tuple (filename, list of payment returns, error message)
+        """
+        try:
+            vals = self._parse_file(archive.read(filename))
+            vals = [vals] if isinstance(vals, dict) else list(vals)
+        except Exception as error:
+            _logger.warning("Unable to parse %s.", filename, exc_info=True)
+            return filename, [], str(error)
+        return filename, vals, False
+
+    @api.model
+    def _iter_parse_archive(self, data_file, filenames):
+        """Parse the files of the zip, in a pool of forked processes when
+        there are several ones. Every file is read from the archive by the
+        process parsing it. These processes have no database access, so
+        ``_parse_file`` must not query it: the reasons of the transactions,
+        for instance, are resolved by ``_complete_payment_return``.
+
+        :return: generator of the results of ``_parse_member``, in the order
+                 of the archive
+        """
+        processes = self._get_parse_processes(len(filenames))
+        if processes <= 1:
+            with ZipFile(BytesIO(data_file), "r") as archive:
+                for filename in filenames:
+                    yield self._parse_member(archive, filename)
+            return
+        # The forked processes inherit the wizard and the content of the file,
+        # only the file names and the parsed values are pickled.
+        context = multiprocessing.get_context("fork")
+        with context.Pool(
+            processes, initializer=_init_parse_process, initargs=(self, data_file)
+        ) as pool:
+            yield from pool.imap(_parse_process_member, filenames)
+
+    @api.model
+    def _iter_parse_all_files(self, data_file, errors=None):
+        """Parse one or multiple files from zip-file, lazily.
+
+        :param data_file: Decoded raw content of the file
+        :param errors: list receiving (file name, error message) for each
+                       file of the zip that can't be parsed. These errors
+                       are raised if not given.
+        :return: Generator of payment returns dictionaries for further
+                 processing.
+        """
+        filenames = self._get_archive_members(data_file)
+        if filenames is None:
             # The appropriate implementation module(s) returns the payment
-            # returns. We support a list of dictionaries or a simple
+            # returns. We support an iterable of dictionaries or a simple
             # dictionary.
-
-            # Actually we don't care wether all the files have the
-            # same format.
-            vals = self._parse_file(import_file)
-            if isinstance(vals, list):
-                payment_return_raw_list += vals
+            vals = self._parse_file(data_file)
+            if isinstance(vals, dict):
+                yield vals
             else:
-                payment_return_raw_list.append(vals)
-        return payment_return_raw_list
+                yield from vals
+            return
+        # Actually we don't care wether all the files have the same format.
+        for filename, vals, error in self._iter_parse_archive(data_file, filenames):
+            if error:
+                if errors is None:
+                    raise UserError(error)
+                errors.append((filename, error))
+            yield from vals
+
+    @api.model
+    def _parse_all_files(self, data_file):
+        """Parse one or multiple files from zip-file.
+
+        :param data_file: Decoded raw content of the file
+        :return: List of payment returns dictionaries for further processing.
+        """
+        return list(self._iter_parse_all_files(data_file))
+
+    @api.model
+    def _get_chunk_size(self):
+        return int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("payment_return_import.chunk_size", 1000)
+        )
 
     @api.model
     def _import_file(self, data_file):
-        """Create bank payment return(s) from file."""
-        # The appropriate implementation module returns the required data
-        payment_returns = self.env["payment.return"]
-        notifications = []
-        payment_return_raw_list = self._parse_all_files(data_file)
-        # Check raw data:
-        self._check_parsed_data(payment_return_raw_list)
-        # Import all payment returns:
-        for payret_vals in payment_return_raw_list:
-            payret_vals = self._complete_payment_return(payret_vals)
-            payment_return, new_notifications = self._create_payment_return(payret_vals)
-            if payment_return:
-                payment_returns += payment_return
-            notifications.extend(new_notifications)
+        """Create bank payment return(s) from file.
+
+        The payment returns are parsed one by one and their transactions
+        are created by chunks. With ``commit_per_chunk``, every chunk is
+        committed with the progress of the import log, so the import of the
+        same file resumes after the last committed chunk.
+        """
+        commit = self.commit_per_chunk
+        log_model = self.env["payment.return.import.log"]
+        with log_model._lock_file(data_file, commit):
+            log = log_model._get_log(data_file)
+            if commit:
+                log._commit()
+            try:
+                notifications = self._import_payment_returns(data_file, log, commit)
+            except Exception as error:
+                if not commit:
+                    raise
+                self.env.cr.rollback()
+                log.write({"state": "failed", "error": str(error)})
+                log._commit()
+                raise
+            log.state = "done"
+            if commit:
+                log._commit()
+        payment_returns = log.payment_return_ids
         if not payment_returns:
             raise UserError(_("You have already imported this file."))
         return payment_returns, notifications
 
+    @api.model
+    def _import_payment_returns(self, data_file, log, commit=False):
+        """Import the payment returns of the file not processed yet by
+        ``log``.
+
+        :return: notifications of the import
+        """
+        chunk_size = self._get_chunk_size()
+        ignored_line_ids = []
+        empty_payment_returns = []
+        parse_errors = []
+        position = 0
+        for payret_vals in self._iter_parse_all_files(data_file, parse_errors):
+            transactions = payret_vals.get("transactions")
+            if not transactions:
+                empty_payment_returns.append(payret_vals)
+                continue
+            start = position
+            position += len(transactions)
+            # Skip what an interrupted import has already committed
+            skip = max(log.transaction_count - start, 0)
+            if skip >= len(transactions):
+                continue
+            payment_return = self.env["payment.return"]
+            if skip:
+                payment_return = log.payment_return_id
+            payret_vals["transactions"] = transactions[skip:]
+            payret_vals = self._complete_payment_return(payret_vals)
+            transactions = payret_vals.pop("transactions")
+            imported_ids = self._get_imported_unique_ids(transactions)
+            for index in range(0, len(transactions), chunk_size):
+                chunk = transactions[index : index + chunk_size]
+                payment_return, ignored = self._create_payment_return_lines(
+                    payret_vals, chunk, imported_ids, payment_return
+                )
+                ignored_line_ids += ignored
+                log._chunk_done(
+                    start + skip + index + len(chunk), payment_return, commit
+                )
+        if parse_errors:
+            error = "\n".join(
+                "%s: %s" % (filename, message) for filename, message in parse_errors
+            )
+            if not position:
+                raise UserError(error)
+            log.error = error
+        elif not position:
+            self._check_parsed_data(empty_payment_returns)
+        return self._get_parse_error_notifications(
+            parse_errors
+        ) + self._get_ignored_notifications(ignored_line_ids)
+
     @api.model
     def _parse_file(self, data_file):
         """Each module adding a file support must extends this method. It
@@ -223,70 +414,125 @@ class PaymentReturnImport(models.TransientModel):
             # By now journal and account_number must be known
             if not payret_vals["journal_id"]:
                 raise UserError(_("Can not determine journal for import."))
+        reason_ids = self.env["payment.return.reason"].resolve(
+            line_vals.get("reason_code")
+            for line_vals in payret_vals["transactions"]
+            if not line_vals.get("reason_id")
+        )
         for line_vals in payret_vals["transactions"]:
             unique_import_id = line_vals.get("unique_import_id", False)
             if unique_import_id:
                 line_vals["unique_import_id"] = (
                     account_number and (account_number + "-") or ""
                 ) + unique_import_id
-            if not line_vals.get("reason"):
-                reason = self.env["payment.return.reason"].name_search(
-                    line_vals.pop("reason_code")
-                )
-                if reason:
-                    line_vals["reason_id"] = reason[0][0]
+            reason_code = line_vals.pop("reason_code", False)
+            if not line_vals.get("reason") and not line_vals.get("reason_id"):
+                reason_id = reason_ids.get(reason_code)
+                if reason_id:
+                    line_vals["reason_id"] = reason_id
         return payret_vals
 
     @api.model
-    def _create_payment_return(self, payret_vals):
-        """Create bank payment return from imported values, filtering out
-        already imported transactions, and return data used by the
-        reconciliation widget
+    def _get_imported_unique_ids(self, transactions):
+        """Return the unique import ids of ``transactions`` already imported,
+        with one query."""
+        unique_ids = [
+            line_vals["unique_import_id"]
+            for line_vals in transactions
+            if line_vals.get("unique_import_id")
+        ]
+        if not unique_ids:
+            return set()
+        return set(
+            self.env["payment.return.line"]
+            .sudo()
+            .search([("unique_import_id", "in", unique_ids)])
+            .mapped("unique_import_id")
+        )
+
+    @api.model
+    def _create_payment_return_lines(
+        self, payret_vals, transactions, imported_ids, payment_return=None
+    ):
+        """Add the ``transactions`` not imported yet to ``payment_return``,
+        created from ``payret_vals`` if not given.
+
+        :return: the payment return and the unique ids of the ignored
+                 transactions
         """
-        pr_model = self.env["payment.return"]
-        prl_model = self.env["payment.return.line"]
-        # Filter out already imported transactions and create payment return
         ignored_line_ids = []
         filtered_st_lines = []
-        for line_vals in payret_vals["transactions"]:
-            unique_id = (
-                "unique_import_id" in line_vals and line_vals["unique_import_id"]
-            )
-            if not unique_id or not bool(
-                prl_model.sudo().search([("unique_import_id", "=", unique_id)], limit=1)
-            ):
-                filtered_st_lines.append(line_vals)
-            else:
+        for line_vals in transactions:
+            unique_id = line_vals.get("unique_import_id")
+            if unique_id and unique_id in imported_ids:
                 ignored_line_ids.append(unique_id)
-        payment_return = pr_model.browse()
-        if len(filtered_st_lines) > 0:
-            # Remove values that won't be used to create records
-            payret_vals.pop("transactions", None)
-            for line_vals in filtered_st_lines:
+            else:
                 line_vals.pop("account_number", None)
-            # Create the payment return
-            payret_vals["line_ids"] = [[0, False, line] for line in filtered_st_lines]
-            payment_return = pr_model.create(payret_vals)
-        # Prepare import feedback
-        notifications = []
+                filtered_st_lines.append(line_vals)
+        if not filtered_st_lines:
+            return payment_return, ignored_line_ids
+        if payment_return:
+            self.env["payment.return.line"].create(
+                [dict(line, return_id=payment_return.id) for line in filtered_st_lines]
+            )
+        else:
+            payment_return = self.env["payment.return"].create(
+                dict(
+                    payret_vals,
+                    line_ids=[(0, False, line) for line in filtered_st_lines],
+                )
+            )
+        return payment_return, ignored_line_ids
+
+    @api.model
+    def _get_parse_error_notifications(self, parse_errors):
+        """Prepare the feedback on the files of the zip that can't be
+        parsed."""
+        return [
+            {
+                "type": "warning",
+                "message": _("The file %s could not be imported: %s")
+                % (filename, message),
+            }
+            for filename, message in parse_errors
+        ]
+
+    @api.model
+    def _get_ignored_notifications(self, ignored_line_ids):
+        """Prepare the feedback on the already imported transactions."""
         num_ignored = len(ignored_line_ids)
-        if num_ignored > 0:
-            notifications += [
-                {
-                    "type": "warning",
-                    "message": _(
-                        "%d transactions had already been imported and were ignored."
-                    )
-                    % num_ignored
-                    if num_ignored > 1
-                    else _("1 transaction had already been imported and was ignored."),
-                    "details": {
-                        "name": _("Already imported items"),
-                        "model": "payment.return.line",
-                        "ids": prl_model.search(
-                            [("unique_import_id", "in", ignored_line_ids)]
-                        ).ids,
-                    },
-                }
-            ]
-        return payment_return, notifications
+        if not num_ignored:
+            return []
+        return [
+            {
+                "type": "warning",
+                "message": _(
+                    "%d transactions had already been imported and were ignored."
+                )
+                % num_ignored
+                if num_ignored > 1
+                else _("1 transaction had already been imported and was ignored."),
+                "details": {
+                    "name": _("Already imported items"),
+                    "model": "payment.return.line",
+                    "ids": self.env["payment.return.line"]
+                    .search([("unique_import_id", "in", ignored_line_ids)])
+                    .ids,
+                },
+            }
+        ]
+
+    @api.model
+    def _create_payment_return(self, payret_vals):
+        """Create bank payment return from imported values, filtering out
+        already imported transactions, and return data used by the
+        reconciliation widget
+        """
+        transactions = payret_vals.pop("transactions", [])
+        payment_return, ignored_line_ids = self._create_payment_return_lines(
+            payret_vals,
+            transactions,
+            self._get_imported_unique_ids(transactions),
+            self.env["payment.return"],
+        )
+        return payment_return, self._get_ignored_notifications(ignored_line_ids)
@@ -3,7 +3,12 @@
 # Copyright 2022 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from odoo import models
+from collections import defaultdict
+
+from odoo import api, models
+
+# Confidence (%) of a match by the EndToEndId of a payment order
+MATCH_CONFIDENCE_END_TO_END = 95
 
 
 class PaymentReturnLine(models.Model):
@@ -11,24 +16,64 @@ class PaymentReturnLine(models.Model):
 
     def _find_match(self):
         """Include in the matches the lines coming from payment orders."""
+        lines = self.filtered(lambda x: not x.move_line_ids and x.reference)
+        references = list(set(lines.mapped("reference")))
+        move_ids = [int(ref) for ref in references if ref.isdigit()]
+        payments = self.env["account.payment"].search(
+            [
+                "|",
+                # Compatibility with old approach - To be removed on v16
+                ("old_bank_payment_line_name", "in", references),
+                ("move_id", "in", move_ids),
+                ("payment_order_id", "!=", False),
+            ],
+        )
+        payment_ids_by_reference = defaultdict(list)
+        for payment in payments:
+            for reference in {
+                payment.old_bank_payment_line_name,
+                str(payment.move_id.id),
+            }:
+                if reference:
+                    payment_ids_by_reference[reference].append(payment.id)
         matched = self.env["payment.return.line"]
-        for line in self.filtered(lambda x: not x.move_line_ids and x.reference):
-            move_id = int(line.reference) if line.reference.isdigit() else -1
-            payments = self.env["account.payment"].search(
-                [
-                    "|",
-                    # Compatibility with old approach - To be removed on v16
-                    ("old_bank_payment_line_name", "=", line.reference),
-                    ("move_id", "=", move_id),
-                    ("payment_order_id", "!=", False),
-                ],
+        vals_by_line = []
+        for line in lines:
+            line_payments = payments.browse(payment_ids_by_reference[line.reference])
+            if not line_payments:
+                continue
+            move_lines = self.env["account.move.line"]
+            for payment in line_payments:
+                move_lines |= payment.move_id.line_ids.filtered(
+                    lambda x: x.account_id == payment.destination_account_id
+                    and x.partner_id == payment.partner_id
+                )
+            vals_by_line.append(
+                (
+                    line,
+                    {
+                        "partner_id": line_payments[0].partner_id.id,
+                        "match_confidence": 100,
+                        "move_line_ids": [(6, 0, move_lines.ids)],
+                    },
+                )
             )
-            if payments:
-                line.partner_id = payments[0].partner_id
-                matched += line
-                for payment in payments:
-                    line.move_line_ids |= payment.move_id.line_ids.filtered(
-                        lambda x: x.account_id == payment.destination_account_id
-                        and x.partner_id == payment.partner_id
-                    )
+            matched |= line
+        self._write_match_vals(vals_by_line)
         return super(PaymentReturnLine, self - matched)._find_match()
+
+    @api.model
+    def _get_match_references(self, move_lines):
+        """Add the EndToEndId of the payment orders the items come from."""
+        references = super()._get_match_references(move_lines)
+        for move_line in move_lines.filtered("payment_id.payment_order_id"):
+            payment = move_line.payment_id
+            for reference in (
+                str(payment.move_id.id),
+                payment.old_bank_payment_line_name,
+            ):
+                if reference:
+                    references[move_line.id].append(
+                        (reference, MATCH_CONFIDENCE_END_TO_END)
+                    )
+        return references
@@ -1 +1,3 @@
 from . import test_import_iso20022
+from . import test_parser_benchmark
+from . import test_reason_registry
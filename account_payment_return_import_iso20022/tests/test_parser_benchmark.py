@@ -0,0 +1,74 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import re
+import resource
+import tempfile
+import time
+
+from odoo.modules.module import get_module_resource
+from odoo.tests import common, tagged
+
+from ..wizard.camt_parser import CamtParser
+from ..wizard.pain_parser import PainParser
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "-at_install", "post_install", "payment_return_parser_benchmark")
+class TestParserBenchmark(common.BaseCase):
+    """Stream large camt.054 and pain.002 files through the parsers.
+
+    The files are built by repeating a transaction of the test files and
+    read from disk, the throughput and the peak memory of the process are
+    logged.
+
+    Not part of the standard test run, use
+    ``--test-tags payment_return_parser_benchmark`` to run it.
+    """
+
+    def _run_benchmark(self, parser, file_name, tag, size):
+        with open(
+            get_module_resource(
+                "account_payment_return_import_iso20022", "test_files", file_name
+            ),
+            "rb",
+        ) as test_file:
+            data = test_file.read()
+        transaction = re.search(rb"<%s>.*?</%s>" % (tag, tag), data, re.S).group(0)
+        head, tail = data.split(transaction, 1)
+        # Drop the other transactions of the test file
+        tail = re.sub(rb"<%s>.*?</%s>" % (tag, tag), b"", tail, flags=re.S)
+        with tempfile.TemporaryFile() as large_file:
+            large_file.write(head)
+            for _i in range(size):
+                large_file.write(transaction)
+            large_file.write(tail)
+            file_size = large_file.tell()
+            large_file.seek(0)
+            start = time.perf_counter()
+            count = 0
+            for payment_return in parser.iter_parse(large_file):
+                count += len(payment_return["transactions"])
+            elapsed = time.perf_counter() - start
+        _logger.info(
+            "%s: %s transactions (%.0f MB) in %.2fs, %.0f transactions/s, "
+            "peak memory %.0f MB",
+            file_name,
+            count,
+            file_size / 1024 / 1024,
+            elapsed,
+            count / elapsed,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        )
+        self.assertEqual(count, size)
+
+    def test_camt_parser_benchmark_100k(self):
+        self._run_benchmark(
+            CamtParser(), "test-sepa-camt-unpaid.xml", b"TxDtls", 100000
+        )
+
+    def test_pain_parser_benchmark_100k(self):
+        self._run_benchmark(
+            PainParser(), "test-sepa-pain-unpaid.xml", b"TxInfAndSts", 100000
+        )
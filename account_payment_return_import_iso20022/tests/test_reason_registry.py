@@ -0,0 +1,74 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import re
+from unittest.mock import patch
+
+from odoo.modules.module import get_module_resource
+from odoo.sql_db import Cursor
+from odoo.tests import tagged
+
+from odoo.addons.account_payment_return_import.tests import TestPaymentReturnFile
+
+
+@tagged("-standard", "-at_install", "post_install", "payment_return_reason_benchmark")
+class TestReasonRegistry(TestPaymentReturnFile):
+    """Import a large camt.054 file, resolving the reasons of all its
+    transactions with a single query.
+
+    Not part of the standard test run, use
+    ``--test-tags payment_return_reason_benchmark`` to run it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = cls.env.ref("base.main_company")
+        cls.acc_bank = cls.env["res.partner.bank"].create(
+            {
+                "acc_number": "NL77ABNA0574908765",
+                "bank_name": "TEST BANK",
+                "company_id": cls.company.id,
+                "partner_id": cls.company.partner_id.id,
+            }
+        )
+        cls.journal = cls.env["account.journal"].create(
+            {
+                "name": "Test Bank Journal",
+                "code": "BANK",
+                "type": "bank",
+                "bank_account_id": cls.acc_bank.id,
+            }
+        )
+
+    def _get_camt_file(self, size):
+        with open(
+            get_module_resource(
+                "account_payment_return_import_iso20022",
+                "test_files",
+                "test-sepa-camt-unpaid.xml",
+            ),
+            "rb",
+        ) as test_file:
+            data = test_file.read()
+        transaction = re.search(rb"<TxDtls>.*?</TxDtls>", data, re.S).group(0)
+        return data.replace(transaction, transaction * size, 1)
+
+    def test_import_reason_single_query_50k(self):
+        data_file = self._get_camt_file(50000)
+        self.env["payment.return.reason"].clear_caches()
+        with patch.object(
+            Cursor, "execute", autospec=True, side_effect=Cursor.execute
+        ) as execute:
+            payment_returns, _notifications = self.env[
+                "payment.return.import"
+            ]._import_file(data_file)
+        reason_queries = [
+            call
+            for call in execute.call_args_list
+            if re.search(r'FROM "?payment_return_reason\b', str(call.args[1]))
+        ]
+        self.assertEqual(len(reason_queries), 1)
+        self.assertEqual(len(payment_returns.line_ids), 50000)
+        self.assertEqual(
+            set(payment_returns.line_ids.mapped("reason_id.code")), {"AC06"}
+        )
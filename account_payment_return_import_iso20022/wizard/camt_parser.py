@@ -5,6 +5,8 @@ import re
 
 from lxml import etree
 
+from .xml_stream import get_root_namespace, get_xpath, iterparse, release
+
 RE_CAMT = re.compile(r"(^urn:iso:std:iso:20022:tech:xsd:camt." r"|^ISO:camt.)")
 RE_CAMT_VERSION = re.compile(
     r"(^urn:iso:std:iso:20022:tech:xsd:camt.054.001.02" r"|^ISO:camt.054.001.02)"
@@ -12,7 +14,11 @@ RE_CAMT_VERSION = re.compile(
 
 
 class CamtParser(object):
-    """Parser for CAMT Bank to Customer Debit Credit Notification."""
+    """Parser for CAMT Bank to Customer Debit Credit Notification.
+
+    The transactions keep the ``reason_code`` of the file: their reasons
+    are resolved by ``_complete_payment_return`` of the import wizard.
+    """
 
     @staticmethod
     def parse_amount(ns, node):
@@ -20,9 +26,7 @@ class CamtParser(object):
         if node is None:
             return 0.0
         amount = 0.0
-        amount_node = node.xpath(
-            "./ns:AmtDtls/ns:InstdAmt/ns:Amt", namespaces={"ns": ns}
-        )
+        amount_node = get_xpath(ns, "./ns:AmtDtls/ns:InstdAmt/ns:Amt")(node)
         if amount_node:
             amount = float(amount_node[0].text)
         return amount
@@ -30,7 +34,7 @@ class CamtParser(object):
     @staticmethod
     def parse_date(ns, node):
         """Parse element that contains date."""
-        date_node = node.xpath("./ns:GrpHdr/ns:CreDtTm", namespaces={"ns": ns})
+        date_node = get_xpath(ns, "./ns:GrpHdr/ns:CreDtTm")(node)
         return date_node[0].text[:10]
 
     @staticmethod
@@ -43,7 +47,7 @@ class CamtParser(object):
         if not isinstance(xpath_str, (list, tuple)):
             xpath_str = [xpath_str]
         for search_str in xpath_str:
-            found_node = node.xpath(search_str, namespaces={"ns": ns})
+            found_node = get_xpath(ns, search_str)(node)
             if found_node:
                 if join_str is None:
                     attr_value = found_node[0].text
@@ -86,60 +90,40 @@ class CamtParser(object):
             "reason_additional_information",
         )
 
+    def parse_transaction(self, ns, details_node):
+        """
+        Parse transaction details node, return None if it is not a return.
+        """
+        if not get_xpath(ns, "./ns:RtrInf")(details_node):
+            return None
+        transaction = {}
+        transaction["amount"] = self.parse_amount(ns, details_node)
+        self.parse_transaction_details(ns, details_node, transaction)
+        transaction["raw_import_data"] = etree.tostring(details_node)
+        return transaction
+
     def parse_transactions(self, ns, node, transactions):
         """
         Parse transactions (entry) node.
         """
-        details_nodes = node.xpath("./ns:NtryDtls/ns:TxDtls", namespaces={"ns": ns})
-        for details_node in details_nodes:
-            return_info = details_node.xpath("./ns:RtrInf", namespaces={"ns": ns})
-            if not return_info:
-                continue
-            transaction = {}
-            transaction["amount"] = self.parse_amount(ns, details_node)
-            self.parse_transaction_details(ns, details_node, transaction)
-            transaction["raw_import_data"] = etree.tostring(details_node)
-            transactions.append(transaction)
+        for details_node in get_xpath(ns, "./ns:NtryDtls/ns:TxDtls")(node):
+            transaction = self.parse_transaction(ns, details_node)
+            if transaction:
+                transactions.append(transaction)
         return transactions
 
-    def parse_payment_returns(self, ns, node):
+    def parse_notification(self, ns, notification_node, return_date):
         """
-        Parse entry node.
+        Parse the header of a notification node, shared by the payment
+        returns of its entries.
         """
-        return_date = self.parse_date(ns, node)
-        payment_returns = []
-        notification_nodes = node.xpath("./ns:Ntfctn", namespaces={"ns": ns})
-        for notification_node in notification_nodes:
-            entry_nodes = notification_node.xpath("./ns:Ntry", namespaces={"ns": ns})
-            for i, entry_node in enumerate(entry_nodes):
-                payment_return = {}
-                self.add_value_from_node(
-                    ns, notification_node, "./ns:Id", payment_return, "name"
-                )
-                payment_return["date"] = return_date
-                self.add_value_from_node(
-                    ns,
-                    notification_node,
-                    "./ns:Acct/ns:Id/ns:IBAN",
-                    payment_return,
-                    "account_number",
-                )
-                payment_return["transactions"] = []
-                transactions = []
-                self.parse_transactions(ns, entry_node, transactions)
-                payment_return["transactions"].extend(transactions)
-                subno = 0
-                for transaction in payment_return["transactions"]:
-                    subno += 1
-                    transaction[
-                        "unique_import_id"
-                    ] = "{return_name}{entry_subno}{transaction_subno}".format(
-                        return_name=payment_return["name"],
-                        entry_subno=i,
-                        transaction_subno=subno,
-                    )
-                payment_returns.append(payment_return)
-        return payment_returns
+        header = {}
+        self.add_value_from_node(ns, notification_node, "./ns:Id", header, "name")
+        header["date"] = return_date
+        self.add_value_from_node(
+            ns, notification_node, "./ns:Acct/ns:Id/ns:IBAN", header, "account_number"
+        )
+        return header
 
     def check_version(self, ns, root):
         """
@@ -157,6 +141,84 @@ class CamtParser(object):
         if root_0_0 != "GrpHdr":
             raise ValueError("expected GrpHdr, got: " + root_0_0)
 
+    def _parse_event(self, state, event, element):
+        """Handle an event of the stream of the file.
+
+        :return: the payment return of the entry ended, if any
+        """
+        ns = state["ns"]
+        tag = element.tag[len(ns) + 2 :]
+        parent_tag = element.getparent().tag[len(ns) + 2 :]
+        if event == "start":
+            if tag == "Ntfctn":
+                state.update(header=None, entry_index=-1)
+            elif tag == "Ntry" and parent_tag == "Ntfctn":
+                state["entry_index"] += 1
+                state["transactions"] = []
+        elif tag == "GrpHdr" and element.getparent().getparent() is state["root"]:
+            state["date"] = self.parse_date(ns, element.getparent())
+        elif tag == "TxDtls" and parent_tag == "NtryDtls":
+            transaction = self.parse_transaction(ns, element)
+            if transaction:
+                state["transactions"].append(transaction)
+            release(element)
+        elif tag == "Ntry" and parent_tag == "Ntfctn":
+            if state["header"] is None:
+                state["header"] = self.parse_notification(
+                    ns, element.getparent(), state.get("date")
+                )
+            transactions = state["transactions"]
+            release(element)
+            if transactions:
+                return self._get_payment_return(
+                    state["header"], state["entry_index"], transactions
+                )
+        elif tag == "Ntfctn":
+            release(element)
+        return None
+
+    def iter_parse(self, data):
+        """
+        Parse a camt.054.001.02 file as a stream: the elements are freed as
+        soon as they are parsed and every entry is yielded once complete, so
+        the memory used depends on the largest entry, not on the number of
+        entries of the file. The transactions of an entry are held until
+        then, each with its XML source in ``raw_import_data``.
+        :param data: raw content or file object of the file
+        :return: generator of the account.payment.return records, one by
+                 entry with transactions
+        :raise: ValueError if parsing failed
+        """
+        state = {"ns": None}
+        try:
+            for event, element in iterparse(
+                data, ["GrpHdr", "Ntfctn", "Ntry", "TxDtls"]
+            ):
+                if state["ns"] is None:
+                    state["root"], state["ns"] = get_root_namespace(element)
+                    self.check_version(state["ns"], state["root"])
+                payment_return = self._parse_event(state, event, element)
+                if payment_return:
+                    yield payment_return
+        except etree.XMLSyntaxError:
+            raise ValueError("The XML file is not valid.")
+        if state["ns"] is None:
+            raise ValueError("The XML file is not valid.")
+
+    def _get_payment_return(self, header, entry_index, transactions):
+        payment_return = dict(header, transactions=transactions)
+        subno = 0
+        for transaction in transactions:
+            subno += 1
+            transaction[
+                "unique_import_id"
+            ] = "{return_name}{entry_subno}{transaction_subno}".format(
+                return_name=payment_return["name"],
+                entry_subno=entry_index,
+                transaction_subno=subno,
+            )
+        return payment_return
+
     def parse(self, data):
         """
         Parse a camt.054.001.02 file.
@@ -164,15 +226,4 @@ class CamtParser(object):
         :return: account.payment.return records list
         :raise: ValueError if parsing failed
         """
-        root = etree.fromstring(data, parser=etree.XMLParser(recover=True))
-        if root is None:
-            raise ValueError("The XML file is not valid.")
-        ns = root.tag[1 : root.tag.index("}")]
-        self.check_version(ns, root)
-        parsed_payment_returns = []
-        for node in root:
-            payment_returns = self.parse_payment_returns(ns, node)
-            for payment_return in payment_returns:
-                if payment_return["transactions"]:
-                    parsed_payment_returns.append(payment_return)
-        return parsed_payment_returns
+        return list(self.iter_parse(data))
@@ -6,23 +6,34 @@ import re
 
 from lxml import etree
 
+from .xml_stream import get_root_namespace, get_xpath, iterparse, release
+
+RE_PAIN = re.compile(r"(^urn:iso:std:iso:20022:tech:xsd:pain." r"|^ISO:pain.)")
+RE_PAIN_VERSION = re.compile(
+    r"(^urn:iso:std:iso:20022:tech:xsd:pain.002.001.03" r"|^ISO:pain.002.001.03)"
+)
+
 
 class PainParser(object):
-    """Parser for SEPA Direct Debit Unpaid Report import files."""
+    """Parser for SEPA Direct Debit Unpaid Report import files.
+
+    The transactions keep the ``reason_code`` of the file: their reasons
+    are resolved by ``_complete_payment_return`` of the import wizard.
+    """
 
     def parse_amount(self, ns, node):
         """Parse element that contains Amount and CreditDebitIndicator."""
         if node is None:
             return 0.0
         amount = 0.0
-        amount_node = node.xpath("./ns:Amt/ns:InstdAmt", namespaces={"ns": ns})
+        amount_node = get_xpath(ns, "./ns:Amt/ns:InstdAmt")(node)
         if amount_node:
             amount = float(amount_node[0].text)
         return amount
 
     def parse_date(self, ns, node):
         """Parse element that contains date."""
-        date_node = node.xpath("./ns:GrpHdr/ns:CreDtTm", namespaces={"ns": ns})
+        date_node = get_xpath(ns, "./ns:GrpHdr/ns:CreDtTm")(node)
         return date_node[0].text[:10]
 
     def add_value_from_node(self, ns, node, xpath_str, obj, key, join_str=None):
@@ -34,7 +45,7 @@ class PainParser(object):
         if not isinstance(xpath_str, (list, tuple)):
             xpath_str = [xpath_str]
         for search_str in xpath_str:
-            found_node = node.xpath(search_str, namespaces={"ns": ns})
+            found_node = get_xpath(ns, search_str)(node)
             if found_node:
                 if join_str is None:
                     attr_value = found_node[0].text
@@ -72,7 +83,7 @@ class PainParser(object):
             transaction,
             "reason_additional_information",
         )
-        details_node = node.xpath("./ns:OrgnlTxRef", namespaces={"ns": ns})
+        details_node = get_xpath(ns, "./ns:OrgnlTxRef")(node)
         if details_node:
             self.parse_transaction_details(ns, details_node[0], transaction)
         transaction["raw_import_data"] = etree.tostring(node)
@@ -80,27 +91,38 @@ class PainParser(object):
 
     def parse_payment_return(self, ns, node):
         """Parse a single payment return node."""
-        payment_return = {}
-        self.add_value_from_node(
-            ns, node, "./ns:GrpHdr/ns:MsgId", payment_return, "name"
-        )
-        payment_return["date"] = self.parse_date(ns, node)
-        transaction_nodes = node.xpath(
-            "./ns:OrgnlPmtInfAndSts/ns:TxInfAndSts", namespaces={"ns": ns}
-        )
+        payment_return = self.parse_payment_return_header(ns, node)
+        transaction_nodes = get_xpath(ns, "./ns:OrgnlPmtInfAndSts/ns:TxInfAndSts")(node)
         if transaction_nodes:
-            self.add_value_from_node(
-                ns,
-                transaction_nodes[0],
-                "./ns:OrgnlTxRef/ns:CdtrAcct/ns:Id/ns:IBAN",
-                payment_return,
-                "account_number",
-            )
+            self.parse_payment_return_account(ns, transaction_nodes[0], payment_return)
         payment_return["transactions"] = []
         for entry_node in transaction_nodes:
             transaction = {}
             self.parse_transaction(ns, entry_node, transaction)
             payment_return["transactions"].append(transaction)
+        return self._set_unique_import_ids(payment_return)
+
+    def parse_payment_return_header(self, ns, node):
+        """Parse the group header of a payment return node."""
+        payment_return = {}
+        self.add_value_from_node(
+            ns, node, "./ns:GrpHdr/ns:MsgId", payment_return, "name"
+        )
+        payment_return["date"] = self.parse_date(ns, node)
+        return payment_return
+
+    def parse_payment_return_account(self, ns, node, payment_return):
+        """Parse the account of the payment return from its first
+        transaction node."""
+        self.add_value_from_node(
+            ns,
+            node,
+            "./ns:OrgnlTxRef/ns:CdtrAcct/ns:Id/ns:IBAN",
+            payment_return,
+            "account_number",
+        )
+
+    def _set_unique_import_ids(self, payment_return):
         # Give an unique ID to each transaction
         subno = 0
         for transaction in payment_return["transactions"]:
@@ -113,35 +135,88 @@ class PainParser(object):
     def check_version(self, ns, root):
         """Validate validity of SEPA Direct Debit Unpaid Report file."""
         # Check wether it is SEPA Direct Debit Unpaid Report at all:
-        re_pain = re.compile(r"(^urn:iso:std:iso:20022:tech:xsd:pain." r"|^ISO:pain.)")
-        if not re_pain.search(ns):
+        if not RE_PAIN.search(ns):
             raise ValueError("no pain: " + ns)
         # Check wether version 002.001.03:
-        re_pain_version = re.compile(
-            r"(^urn:iso:std:iso:20022:tech:xsd:pain.002.001.03"
-            r"|^ISO:pain.002.001.03)"
-        )
-        if not re_pain_version.search(ns):
+        if not RE_PAIN_VERSION.search(ns):
             raise ValueError("no PAIN.002.001.03: " + ns)
         # Check GrpHdr element:
         root_0_0 = root[0][0].tag[len(ns) + 2 :]  # strip namespace
         if root_0_0 != "GrpHdr":
             raise ValueError("expected GrpHdr, got: " + root_0_0)
 
-    def parse(self, data):
-        """Parse a pain.002.001.03 file."""
+    def _parse_event(self, state, event, element):
+        """Handle an event of the stream of the file.
+
+        :return: the payment return ended, if it has transactions
+        """
+        ns = state["ns"]
+        tag = element.tag[len(ns) + 2 :]
+        if tag == "CstmrPmtStsRpt":
+            if event == "start":
+                state["payment_return"] = {}
+                state["transactions"] = []
+                return None
+            payment_return = state["payment_return"]
+            release(element)
+            if state["transactions"]:
+                payment_return["transactions"] = state["transactions"]
+                return self._set_unique_import_ids(payment_return)
+        elif event == "start":
+            return None
+        elif tag == "GrpHdr":
+            state["payment_return"].update(
+                self.parse_payment_return_header(ns, element.getparent())
+            )
+        elif element.getparent().tag == "{%s}OrgnlPmtInfAndSts" % ns:
+            if not state["transactions"]:
+                self.parse_payment_return_account(ns, element, state["payment_return"])
+            transaction = {}
+            self.parse_transaction(ns, element, transaction)
+            state["transactions"].append(transaction)
+            release(element)
+        return None
+
+    def _iter_parse(self, data):
+        state = {"ns": None}
+        for event, element in iterparse(
+            data, ["CstmrPmtStsRpt", "GrpHdr", "TxInfAndSts"]
+        ):
+            if state["ns"] is None:
+                root, state["ns"] = get_root_namespace(element)
+                self.check_version(state["ns"], root)
+            payment_return = self._parse_event(state, event, element)
+            if payment_return:
+                yield payment_return
+        if state["ns"] is None:
+            raise ValueError("Not a valid xml file, or not an xml file at all.")
+
+    def iter_parse(self, data):
+        """Parse a pain.002.001.03 file as a stream: the elements are freed
+        as soon as they are parsed, so the XML tree of the file is never
+        held in memory. The file being a single payment return, its
+        transactions are all held until the end of the file, each with its
+        XML source in ``raw_import_data``.
+
+        :param data: raw content or file object of the file
+        :return: generator of the payment returns with transactions
+        :raise: ValueError if parsing failed
+        """
+        parsed = False
         try:
-            root = etree.fromstring(data, parser=etree.XMLParser(recover=True))
+            for payment_return in self._iter_parse(data):
+                parsed = True
+                yield payment_return
+            return
         except etree.XMLSyntaxError:
+            if parsed or hasattr(data, "read"):
+                raise ValueError("The XML file is not valid.")
+        try:
             # ABNAmro is known to mix up encodings
-            root = etree.fromstring(data.decode("iso-8859-15").encode("utf-8"))
-        if root is None:
+            yield from self._iter_parse(data.decode("iso-8859-15").encode("utf-8"))
+        except etree.XMLSyntaxError:
             raise ValueError("Not a valid xml file, or not an xml file at all.")
-        ns = root.tag[1 : root.tag.index("}")]
-        self.check_version(ns, root)
-        payment_returns = []
-        for node in root:
-            payment_return = self.parse_payment_return(ns, node)
-            if payment_return["transactions"]:
-                payment_returns.append(payment_return)
-        return payment_returns
+
+    def parse(self, data):
+        """Parse a pain.002.001.03 file."""
+        return list(self.iter_parse(data))
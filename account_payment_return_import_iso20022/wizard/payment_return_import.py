@@ -3,6 +3,7 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 import logging
+from itertools import chain
 
 from odoo import api, models
 
@@ -30,10 +31,22 @@ class PaymentReturnImport(models.TransientModel):
     @api.model
     def _parse_file(self, data_file):
         data_file_elements = self._xml_split_file(data_file)
-        payment_returns = []
-        for data_file_element in data_file_elements:
-            payment_returns.extend(self._parse_single_document(data_file_element))
-        return payment_returns
+        return chain.from_iterable(
+            [
+                self._parse_single_document(data_file_element)
+                for data_file_element in data_file_elements
+            ]
+        )
+
+    @api.model
+    def _iter_parse_document(self, parser, data_file):
+        """Parse the first payment return of ``data_file`` right away, so
+        other formats fail here, and the next ones lazily."""
+        payment_returns = parser.iter_parse(data_file)
+        payment_return = next(payment_returns, None)
+        if payment_return is None:
+            return []
+        return chain([payment_return], payment_returns)
 
     @api.model
     def _parse_single_document(self, data_file):
@@ -43,17 +56,20 @@ class PaymentReturnImport(models.TransientModel):
             - camt.054.001.02
             - pain.002.001.03
         """
+        # The reasons are resolved by ``_complete_payment_return`` once the
+        # file is parsed, which may be in a process without database access,
+        # see ``_iter_parse_archive``
         camt_parser = CamtParser()
         pain_parser = PainParser()
         try:
             _logger.debug(
                 "Try parsing as a CAMT Bank to Customer " "Debit Credit Notification."
             )
-            return camt_parser.parse(data_file)
+            return self._iter_parse_document(camt_parser, data_file)
         except ValueError:
             try:
                 _logger.debug("Try parsing as a PAIN Direct Debit Unpaid " "Report.")
-                return pain_parser.parse(data_file)
+                return self._iter_parse_document(pain_parser, data_file)
             except ValueError:
                 _logger.debug(
                     "Payment return file is not a ISO20022 " "supported file.",
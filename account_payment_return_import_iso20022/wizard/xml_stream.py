@@ -0,0 +1,46 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from functools import lru_cache
+from io import BytesIO
+
+from lxml import etree
+
+
+@lru_cache(maxsize=256)
+def get_xpath(ns, path):
+    """Return ``path`` compiled once, its ``ns`` prefix bound to ``ns``."""
+    return etree.XPath(path, namespaces={"ns": ns})
+
+
+def iterparse(data, tags):
+    """Stream the elements of the XML document ``data`` named as ``tags``,
+    in any namespace. The other elements are still built, but only
+    ``release`` frees them.
+
+    :param data: raw content or file object of the document
+    :param tags: local names of the elements to get the events of
+    :return: generator of (event, element) for the ``start`` and ``end``
+             events of these elements
+    """
+    source = data if hasattr(data, "read") else BytesIO(data)
+    return etree.iterparse(
+        source,
+        events=("start", "end"),
+        tag=["{*}%s" % tag for tag in tags],
+        recover=True,
+    )
+
+
+def get_root_namespace(element):
+    """Return the root of the document being parsed and its namespace."""
+    root = element.getroottree().getroot()
+    return root, root.tag[1 : root.tag.index("}")]
+
+
+def release(element):
+    """Free ``element`` once parsed, with its previous siblings."""
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
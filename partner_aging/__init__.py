@@ -1,3 +1,4 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from . import wizard
+from . import controllers, models, wizard
+from .hooks import post_init_hook
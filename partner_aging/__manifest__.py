@@ -3,7 +3,7 @@
 {
     "name": "Interactive Partner Aging at any date",
     "summary": "Aging as a view - invoices and credits",
-    "version": "14.0.1.0.4",
+    "version": "14.0.3.4.0",
     "license": "AGPL-3",
     "author": "Open Source Integrators, Odoo Community Association (OCA)",
     "category": "Accounting & Finance",
@@ -11,10 +11,15 @@
     "depends": ["account"],
     "data": [
         "security/ir.model.access.csv",
+        "data/ir_cron.xml",
+        "data/res_partner_aging_bucket.xml",
+        "views/res_partner_aging_bucket.xml",
+        "wizard/res_partner_aging_partner.xml",
         "wizard/res_partner_aging_customer.xml",
         "wizard/res_partner_aging_supplier.xml",
     ],
     "installable": True,
+    "post_init_hook": "post_init_hook",
     "application": True,
     "development_status": "Production/Stable",
     "maintainers": ["smangukiya"],
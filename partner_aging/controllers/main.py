@@ -0,0 +1,129 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import csv
+import io
+import tempfile
+from datetime import date
+
+import xlsxwriter
+
+import odoo
+from odoo import api, fields, http
+from odoo.http import content_disposition, request
+
+AGING_MODELS = {
+    "customer": "res.partner.aging.customer",
+    "supplier": "res.partner.aging.supplier",
+}
+CONTENT_TYPES = {
+    "csv": "text/csv;charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+# Size of the blocks the XLSX file is sent in
+XLSX_BLOCK_SIZE = 64 * 1024
+
+
+class PartnerAgingExport(http.Controller):
+    @http.route(
+        "/partner_aging/export/<string:aging>/<string:file_format>",
+        type="http",
+        auth="user",
+    )
+    def export_aging(
+        self, aging, file_format, age_date=None, company_ids=None, currency_id=None
+    ):
+        """Stream the aging at ``age_date`` as a CSV or XLSX file.
+
+        The rows are read and written chunk by chunk in a cursor of their
+        own, as the response is sent after the request cursor is closed.
+        """
+        if aging not in AGING_MODELS or file_format not in CONTENT_TYPES:
+            raise request.not_found()
+        aging_model = request.env[AGING_MODELS[aging]]
+        aging_model.check_access_rights("read")
+        companies = request.env.company
+        if company_ids:
+            companies = request.env["res.company"].browse(
+                [int(company_id) for company_id in company_ids.split(",")]
+            )
+            if companies - request.env.user.company_ids:
+                raise request.not_found()
+        currency = request.env["res.currency"].browse(
+            int(currency_id) if currency_id else []
+        )
+        age_date = fields.Date.to_date(age_date) or fields.Date.context_today(
+            aging_model
+        )
+        writer = getattr(self, "_write_aging_%s" % file_format)
+        stream = self._stream_aging(
+            writer,
+            request.env.cr.dbname,
+            request.env.uid,
+            dict(request.env.context),
+            aging_model._name,
+            age_date,
+            companies.ids,
+            currency.id,
+        )
+        filename = "%s_aging_%s.%s" % (aging, age_date, file_format)
+        return http.Response(
+            stream,
+            headers=[
+                ("Content-Type", CONTENT_TYPES[file_format]),
+                ("Content-Disposition", content_disposition(filename)),
+            ],
+            direct_passthrough=True,
+        )
+
+    def _stream_aging(
+        self, writer, dbname, uid, context, model, age_date, company_ids, currency_id
+    ):
+        with odoo.registry(dbname).cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            aging_model = env[model].with_company(company_ids[0])
+            columns = aging_model._get_aging_export_columns()
+            chunks = aging_model._iter_aging_export(
+                age_date,
+                companies=env["res.company"].browse(company_ids),
+                currency=env["res.currency"].browse(currency_id or []),
+            )
+            yield from writer([label for _column, label in columns], chunks)
+
+    def _write_aging_csv(self, header, chunks):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    def _write_aging_xlsx(self, header, chunks):
+        # constant_memory flushes every row to disk once written, the file
+        # can only be sent once complete
+        with tempfile.TemporaryFile() as xlsx_file:
+            workbook = xlsxwriter.Workbook(xlsx_file, {"constant_memory": True})
+            worksheet = workbook.add_worksheet()
+            date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+            worksheet.write_row(0, 0, header)
+            row_index = 1
+            for rows in chunks:
+                for row in rows:
+                    for col_index, value in enumerate(row):
+                        if isinstance(value, date):
+                            worksheet.write_datetime(
+                                row_index, col_index, value, date_format
+                            )
+                        else:
+                            worksheet.write(row_index, col_index, value)
+                    row_index += 1
+            workbook.close()
+            xlsx_file.seek(0)
+            while True:
+                block = xlsx_file.read(XLSX_BLOCK_SIZE)
+                if not block:
+                    break
+                yield block
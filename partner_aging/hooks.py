@@ -0,0 +1,11 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import SUPERUSER_ID, api
+
+
+def post_init_hook(cr, registry):
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    entry_model = env["res.partner.aging.entry"]
+    if entry_model._is_enabled():
+        entry_model.rebuild()
@@ -0,0 +1,9 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import tools
+
+
+def migrate(cr, version):
+    # The aging lines are now stored in tables instead of SQL views
+    for view in ("res_partner_aging_customer", "res_partner_aging_supplier"):
+        tools.drop_view_if_exists(cr, view)
@@ -0,0 +1,9 @@
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from . import (
+    account_move,
+    account_partial_reconcile,
+    ir_config_parameter,
+    res_partner_aging_bucket,
+    res_partner_aging_entry,
+)
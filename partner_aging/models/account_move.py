@@ -0,0 +1,24 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import models
+
+
+class AccountMove(models.Model):
+    _inherit = "account.move"
+
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        entry_model = self.env["res.partner.aging.entry"]
+        if entry_model._is_enabled():
+            entry_model._add_move_lines(
+                self.filtered(lambda move: move.state == "posted").line_ids
+            )
+        return posted
+
+    def button_draft(self):
+        res = super().button_draft()
+        entry_model = self.env["res.partner.aging.entry"]
+        if entry_model._is_enabled():
+            entry_model._remove_moves(self)
+        return res
@@ -0,0 +1,16 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+
+class AccountPartialReconcile(models.Model):
+    _inherit = "account.partial.reconcile"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partials = super().create(vals_list)
+        entry_model = self.env["res.partner.aging.entry"]
+        if entry_model._is_enabled():
+            entry_model._add_partials(partials)
+        return partials
@@ -0,0 +1,33 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, models
+
+AGING_STORE_PARAM = "partner_aging.use_aging_store"
+
+
+class IrConfigParameter(models.Model):
+    _inherit = "ir.config_parameter"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        params = super().create(vals_list)
+        if params.filtered(lambda param: param.key == AGING_STORE_PARAM):
+            self._rebuild_aging_store(False)
+        return params
+
+    def write(self, vals):
+        store_param = self.filtered(lambda param: param.key == AGING_STORE_PARAM)
+        was_enabled = bool(store_param.value)
+        res = super().write(vals)
+        if store_param or vals.get("key") == AGING_STORE_PARAM:
+            self._rebuild_aging_store(was_enabled)
+        return res
+
+    @api.model
+    def _rebuild_aging_store(self, was_enabled):
+        """Rebuild the aging store when its parameter gets set, as it is not
+        maintained while the parameter is unset."""
+        entry_model = self.env["res.partner.aging.entry"]
+        if not was_enabled and entry_model._is_enabled():
+            entry_model.rebuild()
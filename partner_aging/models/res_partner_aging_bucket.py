@@ -0,0 +1,74 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import _, api, exceptions, fields, models
+
+
+class ResPartnerAgingBucket(models.Model):
+    """Aging bucket, shared by the customer and the supplier aging.
+
+    A bucket starts at its ``from_day`` and ends the day before the next
+    bucket starts, the first bucket also holds everything before it, so the
+    buckets always cover every number of days past due without gap or
+    overlap. The aging query assigns the bucket with a single
+    ``width_bucket`` call, whatever the number of buckets.
+    """
+
+    _name = "res.partner.aging.bucket"
+    _description = "Res Partner Aging Bucket"
+    _order = "from_day"
+
+    name = fields.Char(required=True, translate=True)
+    from_day = fields.Integer(
+        "From Day",
+        required=True,
+        help="Number of days past due the bucket starts at.",
+    )
+    to_day = fields.Integer(
+        "To Day", compute="_compute_to_day", help="Empty for the last bucket."
+    )
+    aging_field = fields.Selection(
+        [
+            ("not_due", "Not Due Yet"),
+            ("days_due_01to30", "1/30"),
+            ("days_due_31to60", "31/60"),
+            ("days_due_61to90", "61/90"),
+            ("days_due_91to120", "91/120"),
+            ("days_due_121togr", "+121"),
+        ],
+        "Aging Column",
+        help="Column of the aging list views the amounts of the bucket are "
+        "added to. The amounts of every bucket are reported by bucket in the "
+        "pivot views.",
+    )
+
+    _sql_constraints = [
+        ("from_day_uniq", "unique(from_day)", "Two aging buckets start the same day.")
+    ]
+
+    @api.depends("from_day")
+    def _compute_to_day(self):
+        from_days = self.search([]).mapped("from_day")
+        for bucket in self:
+            next_days = [day for day in from_days if day > bucket.from_day]
+            bucket.to_day = min(next_days) - 1 if next_days else False
+
+    @api.model
+    def _get_aging_params(self):
+        """Return the bucket arrays used by the aging query.
+
+        ``bucket_days`` are the thresholds given to ``width_bucket`` (all
+        starts but the first one), the bucket found is at the same index,
+        shifted by one, in ``bucket_ids`` and ``bucket_fields``.
+        """
+        buckets = self.search([], order="from_day")
+        return {
+            "bucket_ids": buckets.ids,
+            "bucket_days": buckets[1:].mapped("from_day"),
+            "bucket_fields": [bucket.aging_field or "" for bucket in buckets],
+        }
+
+    def unlink(self):
+        if not self.search([("id", "not in", self.ids)], limit=1):
+            raise exceptions.UserError(_("At least one aging bucket is required."))
+        return super().unlink()
@@ -0,0 +1,265 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+
+from odoo import api, fields, models, tools
+from odoo.tools import float_compare
+
+_logger = logging.getLogger(__name__)
+
+
+class ResPartnerAgingEntry(models.Model):
+    """Incremental store of the open amounts of the invoice items.
+
+    Every posted invoice item gets an entry with its amount at its date and
+    every partial reconcile an entry with the amount it settles at its
+    creation date, so the open amount of an item at any date is the sum of
+    its entries up to that date.
+
+    The store is maintained on move posting and reset to draft, and on
+    partial reconcile creation, only while the ``partner_aging.use_aging_store``
+    system parameter is set. It is rebuilt when the parameter gets set, so
+    it never serves the amounts of the period it was disabled. The entries
+    of a deleted partial reconcile are removed by the database with the
+    reconcile (``ondelete`` cascade).
+    """
+
+    _name = "res.partner.aging.entry"
+    _description = "Res Partner Aging Entry"
+    _log_access = False
+    _aging_models = ["res.partner.aging.customer", "res.partner.aging.supplier"]
+
+    move_line_id = fields.Many2one(
+        "account.move.line",
+        "Journal Item",
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+    move_id = fields.Many2one(
+        "account.move",
+        "Invoice",
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+    partial_id = fields.Many2one(
+        "account.partial.reconcile",
+        "Partial Reconcile",
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+    partner_id = fields.Many2one("res.partner", "Partner", readonly=True)
+    company_id = fields.Many2one("res.company", "Company", readonly=True)
+    account_type = fields.Char("Account Type", readonly=True)
+    date = fields.Date("Date", readonly=True)
+    amount = fields.Float("Amount", digits="Account", readonly=True)
+
+    def init(self):
+        tools.create_index(
+            self.env.cr,
+            "res_partner_aging_entry_aging_index",
+            self._table,
+            ["company_id", "account_type", "date"],
+        )
+
+    def _get_aging_types(self):
+        """Return the (account type, move types, sign) the store covers."""
+        return [
+            (
+                self.env[model]._aging_account_type,
+                tuple(self.env[model]._aging_move_types),
+                self.env[model]._aging_sign,
+            )
+            for model in self._aging_models
+        ]
+
+    @api.model
+    def _is_enabled(self):
+        """Whether the aging is computed from, and so maintains, the store."""
+        return bool(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("partner_aging.use_aging_store")
+        )
+
+    @api.model
+    def _add_move_lines(self, lines=None):
+        """Add the entries of the posted invoice items among ``lines``.
+
+        Without ``lines``, add the entries of all the posted invoice items.
+        Items already in the store are skipped.
+        """
+        if lines is not None and not lines:
+            return
+        self.env["account.move"].flush()
+        self.env["account.move.line"].flush()
+        for account_type, move_types, sign in self._get_aging_types():
+            query = """
+                INSERT INTO res_partner_aging_entry (move_line_id, move_id,
+                    partner_id, company_id, account_type, date, amount)
+                SELECT aml.id, aml.move_id, aml.partner_id, aml.company_id,
+                    aat.type, aml.date, %(sign)s * (aml.debit - aml.credit)
+                FROM account_move_line aml
+                JOIN account_account ac ON ac.id = aml.account_id
+                JOIN account_account_type aat ON aat.id = ac.user_type_id
+                JOIN account_move am ON am.id = aml.move_id
+                WHERE aat.type = %(account_type)s
+                    AND am.state = 'posted'
+                    AND am.partner_id IS NOT NULL
+                    AND am.move_type IN %(move_types)s
+                    AND NOT EXISTS (
+                        SELECT 1 FROM res_partner_aging_entry e
+                        WHERE e.move_line_id = aml.id AND e.partial_id IS NULL
+                    )
+            """
+            params = {
+                "account_type": account_type,
+                "move_types": move_types,
+                "sign": sign,
+            }
+            if lines is not None:
+                query += " AND aml.id IN %(line_ids)s"
+                params["line_ids"] = tuple(lines.ids)
+            self.env.cr.execute(query, params)
+        self._add_partials(lines=lines)
+
+    @api.model
+    def _add_partials(self, partials=None, lines=None):
+        """Add the entries of ``partials`` or of the partials of ``lines``.
+
+        Only the sides of the reconciles on items of the store get entries.
+        A partial reconcile created during a day is accounted for from the
+        next day on, as the ledger based aging does.
+        """
+        if (partials is not None and not partials) or (lines is not None and not lines):
+            return
+        self.env["account.partial.reconcile"].flush()
+        query = """
+            INSERT INTO res_partner_aging_entry (move_line_id, move_id,
+                partner_id, company_id, account_type, date, amount, partial_id)
+            SELECT e.move_line_id, e.move_id, e.partner_id, e.company_id,
+                e.account_type,
+                (apr.create_date - interval '1 microsecond')::date + 1,
+                CASE WHEN e.account_type = 'payable' THEN -1 ELSE 1 END
+                * CASE WHEN apr.debit_move_id = e.move_line_id
+                    THEN -apr.amount ELSE apr.amount END,
+                apr.id
+            FROM account_partial_reconcile apr
+            JOIN res_partner_aging_entry e ON e.partial_id IS NULL
+                AND e.move_line_id IN (apr.debit_move_id, apr.credit_move_id)
+            WHERE NOT EXISTS (
+                SELECT 1 FROM res_partner_aging_entry x
+                WHERE x.partial_id = apr.id AND x.move_line_id = e.move_line_id
+            )
+        """
+        params = {}
+        if partials is not None:
+            query += " AND apr.id IN %(partial_ids)s"
+            params["partial_ids"] = tuple(partials.ids)
+        if lines is not None:
+            query += " AND e.move_line_id IN %(line_ids)s"
+            params["line_ids"] = tuple(lines.ids)
+        self.env.cr.execute(query, params)
+
+    @api.model
+    def _remove_moves(self, moves):
+        """Remove the entries of ``moves`` items, e.g. reset to draft."""
+        if not moves:
+            return
+        self.env.cr.execute(
+            "DELETE FROM res_partner_aging_entry WHERE move_id IN %s",
+            (tuple(moves.ids),),
+        )
+
+    def _get_aging_amount_query(self):
+        """``aging_amount`` CTE of the aging query, summed from the store.
+
+        See ``res.partner.aging.abstract._get_aging_amount_query``.
+        """
+        return """
+            aging_amount AS (
+                SELECT e.move_line_id AS id, aml.company_id, aml.partner_id,
+                    aml.date,
+                    ai.id AS invoice_id, ai.name AS invoice_ref,
+                    ai.invoice_user_id AS salesman,
+                    ai.invoice_date_due AS inv_date_due,
+                    CASE WHEN ai.invoice_date_due IS NULL THEN 0
+                        ELSE %(age_date)s::date - ai.invoice_date_due
+                    END AS days_due,
+                    e.amount
+                FROM (
+                    SELECT move_line_id, SUM(amount) AS amount
+                    FROM res_partner_aging_entry
+                    WHERE company_id IN %(company_ids)s
+                        AND account_type = %(account_type)s
+                        AND date <= %(age_date)s
+                    GROUP BY move_line_id
+                    HAVING SUM(amount) != 0
+                ) e
+                JOIN account_move_line aml ON aml.id = e.move_line_id
+                JOIN account_move ai ON ai.id = aml.move_id
+                WHERE aml.date <= %(age_date)s
+            )
+        """
+
+    @api.model
+    def rebuild(self):
+        """Rebuild the whole store from the ledger."""
+        _logger.info("Rebuilding the partner aging store")
+        self.env.cr.execute("TRUNCATE res_partner_aging_entry")
+        self._add_move_lines()
+        self.invalidate_cache()
+
+    @api.model
+    def check_consistency(self, age_date=False, company=False):
+        """Diff the aging computed from the store with the ledger aging.
+
+        Only the invoice items not fully reconciled are compared: the
+        ledger aging reports the current residual of the fully reconciled
+        ones whatever the aging date.
+
+        :return: list of (aging model, move line id, ledger amount,
+                 store amount) tuples, one per inconsistent item
+        """
+        age_date = age_date or fields.Date.context_today(self)
+        company = company or self.env.company
+        differences = []
+        for model in self._aging_models:
+            aging = self.env[model]
+            amounts = []
+            for use_store in (False, True):
+                query, params = aging._get_aging_query(
+                    age_date, company, use_store=use_store
+                )
+                # pylint: disable=sql-injection
+                self.env.cr.execute(
+                    """SELECT aging.id, aging.total
+                    FROM ({}) aging
+                    JOIN account_move_line aml ON aml.id = aging.id
+                    WHERE aging.invoice_id IS NOT NULL
+                        AND aml.full_reconcile_id IS NULL
+                    """.format(
+                        query
+                    ),
+                    params,
+                )
+                amounts.append(dict(self.env.cr.fetchall()))
+            ledger_amounts, store_amounts = amounts
+            rounding = company.currency_id.rounding
+            for line_id in set(ledger_amounts) | set(store_amounts):
+                ledger_amount = float(ledger_amounts.get(line_id) or 0.0)
+                store_amount = float(store_amounts.get(line_id) or 0.0)
+                if float_compare(
+                    ledger_amount, store_amount, precision_rounding=rounding
+                ):
+                    differences.append((model, line_id, ledger_amount, store_amount))
+        for difference in differences:
+            _logger.warning(
+                "%s: aging store inconsistent for move line %s: %s != %s", *difference
+            )
+        return differences
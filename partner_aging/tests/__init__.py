@@ -1,4 +1,4 @@
 # Copyright 2012 Open Source Integrators
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
-from . import test_partner_aging
+from . import test_partner_aging, test_partner_aging_benchmark
@@ -4,7 +4,7 @@
 
 from datetime import datetime, timedelta
 
-from odoo import fields
+from odoo import exceptions, fields
 from odoo.tests import common
 from odoo.tools import DEFAULT_SERVER_DATE_FORMAT
 
@@ -157,3 +157,253 @@ class TestPartnerAging(common.TransactionCase):
             [("invoice_id", "!=", False)], limit=1
         )
         partner_aging_supplier_rec.open_document()
+
+    def test_partner_aging_snapshots(self):
+        snapshot_model = self.env["res.partner.aging.snapshot"]
+        snapshot = self.partner_aging_customer_model.execute_aging_query(
+            age_date=self.current_date
+        )
+        other_snapshot = self.partner_aging_customer_model.execute_aging_query(
+            age_date=self.get_date(200)
+        )
+        self.assertNotEqual(snapshot, other_snapshot)
+        self.assertEqual(
+            other_snapshot.age_date, fields.Date.to_date(self.get_date(200))
+        )
+        lines = self.partner_aging_customer_model.search(
+            [("snapshot_id", "=", snapshot.id)]
+        )
+        self.assertTrue(lines)
+        self.assertEqual(lines.snapshot_id, snapshot)
+        self.env.cr.execute(
+            "UPDATE res_partner_aging_snapshot SET create_date = %s WHERE id = %s",
+            (fields.Datetime.now() - timedelta(days=2), snapshot.id),
+        )
+        snapshot_model._gc_snapshots()
+        self.assertFalse(snapshot.exists())
+        self.assertTrue(other_snapshot.exists())
+        self.assertFalse(lines.exists())
+
+    def test_partner_aging_store(self):
+        entry_model = self.env["res.partner.aging.entry"]
+        invoice = self.account_invoice_obj.create(
+            {
+                "move_type": "out_invoice",
+                "partner_id": self.partner_2.id,
+                "invoice_date": self.get_date(-45),
+                "invoice_date_due": self.get_date(-45),
+                "invoice_line_ids": [
+                    (0, 0, {"name": "Aging", "quantity": 1.0, "price_unit": 100.0})
+                ],
+            }
+        )
+        invoice.action_post()
+        # The store is neither maintained nor used while disabled
+        self.assertFalse(entry_model.search([("move_id", "=", invoice.id)]))
+        # and rebuilt once enabled
+        self.env["ir.config_parameter"].sudo().set_param(
+            "partner_aging.use_aging_store", "True"
+        )
+        entries = entry_model.search([("move_id", "=", invoice.id)])
+        self.assertTrue(entries)
+        self.assertFalse(entry_model.check_consistency())
+        snapshot = self.partner_aging_customer_model.execute_aging_query(
+            age_date=self.current_date
+        )
+        self.assertTrue(
+            self.partner_aging_customer_model.search(
+                [("snapshot_id", "=", snapshot.id), ("invoice_id", "=", invoice.id)]
+            )
+        )
+        invoice.button_draft()
+        self.assertFalse(entries.exists())
+        invoice.action_post()
+        self.assertTrue(entry_model.search([("move_id", "=", invoice.id)]))
+        entry_model.rebuild()
+        self.assertTrue(entry_model.search([("move_id", "=", invoice.id)]))
+        self.assertFalse(entry_model.check_consistency())
+
+    def test_partner_aging_buckets(self):
+        bucket_model = self.env["res.partner.aging.bucket"]
+        bucket_181 = bucket_model.create(
+            {"name": "+181", "from_day": 181, "aging_field": "days_due_121togr"}
+        )
+        bucket_121 = self.env.ref("partner_aging.aging_bucket_121togr")
+        self.assertEqual(bucket_121.to_day, 180)
+        self.assertFalse(bucket_181.to_day)
+        invoice = self.account_invoice_obj.create(
+            {
+                "move_type": "out_invoice",
+                "partner_id": self.partner_2.id,
+                "invoice_date": self.get_date(-200),
+                "invoice_date_due": self.get_date(-200),
+                "invoice_line_ids": [
+                    (0, 0, {"name": "Aging", "quantity": 1.0, "price_unit": 100.0})
+                ],
+            }
+        )
+        invoice.action_post()
+        snapshot = self.partner_aging_customer_model.execute_aging_query(
+            age_date=self.current_date
+        )
+        line = self.partner_aging_customer_model.search(
+            [("snapshot_id", "=", snapshot.id), ("invoice_id", "=", invoice.id)]
+        )
+        self.assertEqual(line.bucket_id, bucket_181)
+        self.assertEqual(line.days_due_121togr, line.total)
+        self.assertFalse(line.not_due)
+        with self.assertRaises(exceptions.UserError):
+            bucket_model.search([]).unlink()
+
+    def test_partner_aging_partner(self):
+        partner_model = self.env["res.partner.aging.partner"]
+        snapshot = self.partner_aging_customer_model.execute_aging_query(
+            age_date=self.current_date
+        )
+        lines = self.partner_aging_customer_model.search(
+            [("snapshot_id", "=", snapshot.id)]
+        )
+        rollup = partner_model.search([("snapshot_id", "=", snapshot.id)])
+        self.assertEqual(rollup.partner_id, lines.partner_id)
+        self.assertEqual(sum(rollup.mapped("line_count")), len(lines))
+        self.assertAlmostEqual(
+            sum(rollup.mapped("total")), sum(lines.mapped("total")), places=2
+        )
+        groups = partner_model.read_group(
+            [("snapshot_id", "=", snapshot.id)], ["total"], ["salesman"]
+        )
+        self.assertAlmostEqual(
+            sum(group["total"] for group in groups),
+            sum(rollup.mapped("total")),
+            places=2,
+        )
+        # Keyset pagination, one partner per page
+        page_ids = []
+        page = partner_model.read_page(snapshot.id, ["total"], limit=1)
+        while page["records"]:
+            page_ids += [record["id"] for record in page["records"]]
+            if not page["next"]:
+                break
+            page = partner_model.read_page(
+                snapshot.id, ["total"], after=page["next"], limit=1
+            )
+        self.assertEqual(page_ids, rollup.ids)
+        action = rollup[0].open_aging_lines()
+        self.assertIn(("snapshot_id", "=", snapshot.id), action["domain"])
+
+    def test_partner_aging_partner_totals(self):
+        partner_model = self.env["res.partner.aging.partner"]
+        salesman = self.env.ref("base.user_demo")
+        invoices = self.account_invoice_obj.create(
+            [
+                {
+                    "move_type": "out_invoice",
+                    "partner_id": self.partner_2.id,
+                    "invoice_user_id": user.id,
+                    "invoice_date": self.current_date,
+                    "invoice_line_ids": [
+                        (0, 0, {"name": "Aging", "quantity": 1.0, "price_unit": price})
+                    ],
+                }
+                for user, price in (
+                    (self.env.user, 100.0),
+                    (salesman, 50.0),
+                    (salesman, 25.0),
+                )
+            ]
+        )
+        invoices.action_post()
+        # An item without partner
+        self.env.cr.execute(
+            "UPDATE account_move_line SET partner_id = NULL "
+            "WHERE move_id = %s AND account_internal_type = 'receivable'",
+            (invoices[2].id,),
+        )
+        self.account_move_line_obj.invalidate_cache(["partner_id"])
+        snapshot = self.partner_aging_customer_model.execute_aging_query(
+            age_date=self.current_date
+        )
+        lines = self.partner_aging_customer_model.search(
+            [("snapshot_id", "=", snapshot.id)]
+        )
+        self.assertIn(False, lines.mapped(lambda x: x.partner_id.id))
+        rollup = partner_model.search([("snapshot_id", "=", snapshot.id)])
+        self.assertEqual(sum(rollup.mapped("line_count")), len(lines))
+        self.assertAlmostEqual(
+            sum(rollup.mapped("total")), sum(lines.mapped("total")), places=2
+        )
+        # The totals by partner and by salesperson are the ones of the lines
+        for field_name in ("partner_id", "salesman"):
+            line_totals = {
+                group[field_name]: group["total"]
+                for group in self.partner_aging_customer_model.read_group(
+                    [("snapshot_id", "=", snapshot.id)], ["total"], [field_name]
+                )
+            }
+            rollup_totals = {
+                group[field_name]: group["total"]
+                for group in partner_model.read_group(
+                    [("snapshot_id", "=", snapshot.id)], ["total"], [field_name]
+                )
+            }
+            self.assertEqual(rollup_totals.keys(), line_totals.keys())
+            for key, total in line_totals.items():
+                self.assertAlmostEqual(rollup_totals[key], total, places=2)
+
+    def test_partner_aging_export(self):
+        aging_model = self.partner_aging_customer_model
+        snapshot = aging_model.execute_aging_query(age_date=self.current_date)
+        lines = aging_model.search(
+            [
+                ("snapshot_id", "=", snapshot.id),
+                ("partner_id", "!=", False),
+                ("total", "!=", 0),
+            ]
+        )
+        columns = aging_model._get_aging_export_columns()
+        chunks = list(aging_model._iter_aging_export(self.current_date, chunk_size=1))
+        self.assertTrue(all(len(rows) == 1 for rows in chunks))
+        rows = [row for rows in chunks for row in rows]
+        self.assertEqual(len(rows), len(lines))
+        self.assertTrue(all(len(row) == len(columns) for row in rows))
+        total_index = [column for column, _label in columns].index("total")
+        self.assertAlmostEqual(
+            sum(float(row[total_index]) for row in rows),
+            sum(lines.mapped("total")),
+            places=2,
+        )
+
+    def test_partner_aging_currency(self):
+        aging_model = self.partner_aging_customer_model
+        company = self.env.company
+        currency = self.env["res.currency"].search(
+            [("id", "!=", company.currency_id.id)], limit=1
+        )
+        currency.active = True
+        self.env["res.currency.rate"].create(
+            {
+                "name": self.get_date(-10),
+                "rate": currency.with_company(company).rate * 2 or 2.0,
+                "currency_id": currency.id,
+                "company_id": company.id,
+            }
+        )
+        rate = company.currency_id._get_conversion_rate(
+            company.currency_id, currency, company, self.current_date
+        )
+        snapshot = aging_model.execute_aging_query(age_date=self.current_date)
+        converted_snapshot = aging_model.execute_aging_query(
+            age_date=self.current_date, companies=company, currency=currency
+        )
+        self.assertEqual(converted_snapshot.company_ids, company)
+        self.assertEqual(converted_snapshot.currency_id, currency)
+        lines = aging_model.search([("snapshot_id", "=", snapshot.id)])
+        converted_lines = aging_model.search(
+            [("snapshot_id", "=", converted_snapshot.id)]
+        )
+        self.assertEqual(converted_lines.company_id, company)
+        self.assertAlmostEqual(
+            sum(converted_lines.mapped("total")),
+            sum(lines.mapped("total")) * rate,
+            places=2,
+        )
@@ -0,0 +1,263 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import math
+import time
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import common, tagged
+
+from .legacy_aging_query import LEGACY_CUSTOMER_AGING_QUERY, LEGACY_SUPPLIER_AGING_QUERY
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged("-standard", "-at_install", "post_install", "partner_aging_benchmark")
+class TestPartnerAgingBenchmark(common.TransactionCase):
+    """Compare the aging engine with the legacy aging queries.
+
+    A small ledger (invoices, bills, partial and full payments) is cloned
+    with plain SQL until it reaches the requested number of move lines.
+    Both queries must return the same rows; their timings are logged.
+
+    Rows without partner are left out of the comparison: the legacy
+    supplier query also listed fully reconciled payments without partner,
+    which the engine drops as the customer query always did. The supplier
+    ``not_due`` column is not compared either: the legacy query also added
+    the amounts 1 to 30 days past due to it.
+
+    Not part of the standard test run, use
+    ``--test-tags partner_aging_benchmark`` to run it.
+    """
+
+    def setUp(self):
+        super(TestPartnerAgingBenchmark, self).setUp()
+        self.today = fields.Date.today()
+        self.age_date = self.today + timedelta(days=1)
+        self.customer_aging = self.env["res.partner.aging.customer"]
+        self.supplier_aging = self.env["res.partner.aging.supplier"]
+        partners = [
+            self.env.ref("base.res_partner_12"),
+            self.env.ref("base.res_partner_2"),
+            self.env.ref("base.res_partner_3"),
+        ]
+        for sequence, days in enumerate((-10, 15, 45, 75, 105, 150)):
+            partner = partners[sequence % len(partners)]
+            amount = 100.0 * (sequence + 1)
+            for move_type in ("out_invoice", "in_invoice"):
+                invoice = self._create_invoice(move_type, partner, days, amount)
+                if sequence % 3 == 1:
+                    self._register_payment(invoice, amount / 4)
+                elif sequence % 3 == 2:
+                    self._register_payment(invoice, amount)
+            self._create_invoice("out_refund", partner, days, amount / 10)
+            self._create_invoice("in_refund", partner, days, amount / 10)
+
+    def _create_invoice(self, move_type, partner, days, amount):
+        date = self.today - timedelta(days=days)
+        invoice = self.env["account.move"].create(
+            {
+                "move_type": move_type,
+                "partner_id": partner.id,
+                "invoice_date": date,
+                "invoice_date_due": date,
+                "invoice_line_ids": [
+                    (0, 0, {"name": "Aging", "quantity": 1.0, "price_unit": amount})
+                ],
+            }
+        )
+        invoice.action_post()
+        return invoice
+
+    def _register_payment(self, invoice, amount):
+        self.env["account.payment.register"].with_context(
+            active_model="account.move", active_ids=invoice.ids
+        ).create(
+            {"amount": amount, "payment_date": invoice.invoice_date}
+        )._create_payments()
+
+    def _clone_rows(self, table, ids, copies, remap=None, overrides=None):
+        """Copy the ``ids`` rows of ``table`` ``copies`` times.
+
+        Return the name of a temporary table mapping every source id and
+        copy number to the id of its clone, to be used in ``remap`` of the
+        tables referencing ``table``.
+        """
+        cr = self.env.cr
+        remap = remap or {}
+        overrides = overrides or {}
+        map_table = "aging_benchmark_%s" % table
+        sequence = "%s_id_seq" % table
+        cr.execute(
+            """SELECT column_name FROM information_schema.columns
+            WHERE table_name = %s AND column_name != 'id'""",
+            (table,),
+        )
+        columns = [row[0] for row in cr.fetchall()]
+        cr.execute("SELECT nextval(%s)", (sequence,))
+        first_id = cr.fetchone()[0]
+        cr.execute("SELECT setval(%s, %s)", (sequence, first_id + len(ids) * copies))
+        # pylint: disable=sql-injection
+        cr.execute(
+            """CREATE TEMP TABLE {} (src integer, copy integer, dst integer)
+            """.format(
+                map_table
+            )
+        )
+        cr.execute(
+            """INSERT INTO {map} (src, copy, dst)
+            SELECT s.id, c.copy, %s + (c.copy - 1) * %s + s.rank
+            FROM (
+                SELECT id, row_number() OVER (ORDER BY id) - 1 AS rank
+                FROM {table} WHERE id IN %s
+            ) s
+            CROSS JOIN generate_series(1, %s) AS c(copy)
+            """.format(
+                map=map_table, table=table
+            ),
+            (first_id, len(ids), tuple(ids), copies),
+        )
+        values, joins = [], []
+        for column in columns:
+            if column in overrides:
+                values.append(overrides[column])
+            elif column in remap:
+                alias = "map_%s" % column
+                joins.append(
+                    "LEFT JOIN {map} {alias} ON {alias}.src = t.{column} "
+                    "AND {alias}.copy = m.copy".format(
+                        map=remap[column], alias=alias, column=column
+                    )
+                )
+                values.append("%s.dst" % alias)
+            else:
+                values.append('t."%s"' % column)
+        cr.execute(
+            """INSERT INTO {table} (id, {columns})
+            SELECT m.dst, {values}
+            FROM {map} m
+            JOIN {table} t ON t.id = m.src
+            {joins}
+            """.format(
+                table=table,
+                columns=", ".join('"%s"' % column for column in columns),
+                values=", ".join(values),
+                map=map_table,
+                joins="\n".join(joins),
+            )
+        )
+        return map_table
+
+    def _build_ledger(self, size):
+        """Clone the current ledger until it holds about ``size`` lines."""
+        cr = self.env.cr
+        moves = self.env["account.move"].search([("state", "=", "posted")])
+        lines = moves.line_ids
+        partials = self.env["account.partial.reconcile"].search(
+            [("debit_move_id", "in", lines.ids), ("credit_move_id", "in", lines.ids)]
+        )
+        full_reconciles = lines.full_reconcile_id
+        copies = max(1, math.ceil(size / len(lines)))
+        # Spread the clones over five months so every bucket gets filled
+        shift = "- (m.copy % 150)"
+        move_map = self._clone_rows(
+            "account_move",
+            moves.ids,
+            copies,
+            overrides={
+                "name": "t.name || '/' || m.copy",
+                "date": "t.date %s" % shift,
+                "invoice_date": "t.invoice_date %s" % shift,
+                "invoice_date_due": "t.invoice_date_due %s" % shift,
+            },
+        )
+        full_map = self._clone_rows(
+            "account_full_reconcile", full_reconciles.ids or [0], copies
+        )
+        line_map = self._clone_rows(
+            "account_move_line",
+            lines.ids,
+            copies,
+            remap={"move_id": move_map, "full_reconcile_id": full_map},
+            overrides={
+                "date": "t.date %s" % shift,
+                "date_maturity": "t.date_maturity %s" % shift,
+            },
+        )
+        self._clone_rows(
+            "account_partial_reconcile",
+            partials.ids or [0],
+            copies,
+            remap={
+                "debit_move_id": line_map,
+                "credit_move_id": line_map,
+                "full_reconcile_id": full_map,
+            },
+        )
+        cr.execute("ANALYZE account_move_line")
+        cr.execute("ANALYZE account_partial_reconcile")
+        self.env.cache.invalidate()
+        return len(lines) * (copies + 1)
+
+    def _fetch_rows(self, columns, query, params=None):
+        self.env.cr.execute(query, params)
+        rows = []
+        for row in self.env.cr.dictfetchall():
+            if not row["partner_id"]:
+                continue
+            row = {key: value for key, value in row.items() if key in columns}
+            rows.append(
+                tuple(
+                    sorted(
+                        (key, round(float(value), 2))
+                        if isinstance(value, (float, int)) or hasattr(value, "as_tuple")
+                        else (key, value)
+                        for key, value in row.items()
+                    )
+                )
+            )
+        return sorted(rows, key=repr)
+
+    def _compare(self, aging, legacy_query, line_count, ignored_columns=()):
+        # The legacy queries return the columns of the aging but the bucket
+        # and the company
+        columns = {"id"} | set(aging._aging_columns) - {"bucket_id", "company_id"}
+        columns -= set(ignored_columns)
+        start = time.perf_counter()
+        legacy_rows = self._fetch_rows(
+            columns, legacy_query.format(*[self.age_date] * 35)
+        )
+        legacy_time = time.perf_counter() - start
+        start = time.perf_counter()
+        new_rows = self._fetch_rows(columns, *aging._get_aging_query(self.age_date))
+        new_time = time.perf_counter() - start
+        _logger.info(
+            "%s on %s lines: %s rows, legacy query %.2fs, aging engine %.2fs",
+            aging._name,
+            line_count,
+            len(new_rows),
+            legacy_time,
+            new_time,
+        )
+        self.assertEqual(legacy_rows, new_rows)
+
+    def _run_benchmark(self, size):
+        line_count = self._build_ledger(size)
+        self._compare(self.customer_aging, LEGACY_CUSTOMER_AGING_QUERY, line_count)
+        self._compare(
+            self.supplier_aging,
+            LEGACY_SUPPLIER_AGING_QUERY,
+            line_count,
+            ignored_columns=["not_due"],
+        )
+
+    def test_aging_benchmark_10k(self):
+        self._run_benchmark(10000)
+
+    def test_aging_benchmark_100k(self):
+        self._run_benchmark(100000)
+
+    def test_aging_benchmark_1m(self):
+        self._run_benchmark(1000000)
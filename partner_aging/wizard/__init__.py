@@ -1,7 +1,10 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 
 from . import (
+    res_partner_aging_abstract,
     res_partner_aging_customer,
     res_partner_aging_date,
+    res_partner_aging_partner,
+    res_partner_aging_snapshot,
     res_partner_aging_supplier,
 )
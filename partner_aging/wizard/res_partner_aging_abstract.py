@@ -0,0 +1,435 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+import logging
+import time
+
+from odoo import fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class ResPartnerAgingAbstract(models.AbstractModel):
+    """Shared aging engine for the customer and supplier aging lines.
+
+    Each open item's as-of-date partial reconcile total is aggregated once
+    and its ``res.partner.aging.bucket`` is found with a single
+    ``width_bucket`` call, whatever the number of buckets. Several
+    companies are aged in the same pass, their amounts converted to a
+    reporting currency with one rate per company.
+
+    The lines are stored per ``res.partner.aging.snapshot``, the views only
+    show the lines of the snapshot of the current request.
+    """
+
+    _name = "res.partner.aging.abstract"
+    _description = "Res Partner Aging Engine"
+
+    # Account type and invoice types the aging is computed for
+    _aging_account_type = None
+    _aging_move_types = ()
+    # 1 when open items are receivables, -1 when they are payables
+    _aging_sign = 1
+    # Action listing the aging lines
+    _aging_action = None
+    # Columns returned by the aging query, besides the move line id
+    _aging_columns = [
+        "company_id",
+        "partner_id",
+        "salesman",
+        "date",
+        "date_due",
+        "invoice_ref",
+        "avg_days_overdue",
+        "days_due_01to30",
+        "days_due_31to60",
+        "days_due_61to90",
+        "days_due_91to120",
+        "days_due_121togr",
+        "max_days_overdue",
+        "not_due",
+        "total",
+        "invoice_id",
+        "inv_date_due",
+        "bucket_id",
+    ]
+
+    snapshot_id = fields.Many2one(
+        "res.partner.aging.snapshot",
+        "Snapshot",
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+    move_line_id = fields.Many2one("account.move.line", "Journal Item", readonly=True)
+    company_id = fields.Many2one("res.company", "Company", readonly=True)
+    partner_id = fields.Many2one("res.partner", "Partner", readonly=True)
+    avg_days_overdue = fields.Integer("Avg Days Overdue", readonly=True)
+    date = fields.Date("Date", readonly=True)
+    date_due = fields.Date("Due Date", readonly=True)
+    inv_date_due = fields.Date("Invoice Date", readonly=True)
+    total = fields.Float("Total", readonly=True)
+    not_due = fields.Float("Not Due Yet", readonly=True)
+    days_due_01to30 = fields.Float("1/30", readonly=True)
+    days_due_31to60 = fields.Float("31/60", readonly=True)
+    days_due_61to90 = fields.Float("61/90", readonly=True)
+    days_due_91to120 = fields.Float("91/120", readonly=True)
+    days_due_121togr = fields.Float("+121", readonly=True)
+    max_days_overdue = fields.Integer("Days Outstanding", readonly=True)
+    bucket_id = fields.Many2one(
+        "res.partner.aging.bucket", "Aging Bucket", readonly=True, ondelete="set null"
+    )
+    invoice_ref = fields.Char("Invoice", readonly=True)
+    invoice_id = fields.Many2one("account.move", "Invoice", readonly=True)
+    salesman = fields.Many2one("res.users", "Sales Rep", readonly=True)
+
+    def _get_aging_bucket_fields(self):
+        """Return the aging columns the bucket amounts can be reported in."""
+        bucket_model = self.env["res.partner.aging.bucket"]
+        return [
+            field for field, _label in bucket_model._fields["aging_field"].selection
+        ]
+
+    def _get_aging_query_params(self, age_date, companies, currency=None):
+        params = {
+            "age_date": age_date,
+            "company_ids": tuple(companies.ids),
+            "currency_id": currency.id if currency else None,
+            "account_type": self._aging_account_type,
+            "move_types": tuple(self._aging_move_types),
+            "sign": self._aging_sign,
+        }
+        params.update(self.env["res.partner.aging.bucket"]._get_aging_params())
+        return params
+
+    def _get_aging_amount_query(self, use_store=False):
+        """Return the ``aging_amount`` CTE: one row per open invoice item
+        with its days due and its open amount at the aging date.
+
+        * ``aging_line`` selects the open invoice items and their days due,
+        * ``partial`` sums the partial reconciles created up to the aging
+          date once per item (one indexed join per side of the reconcile),
+        * ``aging_amount`` derives the open amount at the aging date.
+
+        With ``use_store``, the open amounts are summed from the
+        ``res.partner.aging.entry`` store instead of scanning the ledger.
+        """
+        if use_store:
+            return self.env["res.partner.aging.entry"]._get_aging_amount_query()
+        return """
+            aging_line AS (
+                SELECT aml.id, aml.company_id, aml.partner_id, aml.date,
+                    aml.debit, aml.credit,
+                    aml.amount_residual, aml.full_reconcile_id,
+                    ai.id AS invoice_id, ai.name AS invoice_ref,
+                    ai.invoice_user_id AS salesman,
+                    ai.invoice_date_due AS inv_date_due,
+                    CASE WHEN ai.invoice_date_due IS NULL THEN 0
+                        ELSE %(age_date)s::date - ai.invoice_date_due
+                    END AS days_due
+                FROM account_move_line aml
+                JOIN account_account ac ON ac.id = aml.account_id
+                JOIN account_account_type aat ON aat.id = ac.user_type_id
+                JOIN account_move ai ON ai.id = aml.move_id
+                WHERE aat.type = %(account_type)s
+                    AND aml.company_id IN %(company_ids)s
+                    AND aml.date <= %(age_date)s
+                    AND ai.partner_id IS NOT NULL
+                    AND (
+                        (
+                            ai.state = 'posted'
+                            AND (
+                                ai.payment_state != 'paid'
+                                OR aml.full_reconcile_id IS NULL
+                            )
+                            AND ai.move_type IN %(move_types)s
+                        ) OR (
+                            aml.partner_id IS NULL
+                            AND aml.full_reconcile_id IS NULL
+                        )
+                    )
+            ),
+            partial AS (
+                SELECT p.line_id, SUM(p.amount) AS amount
+                FROM (
+                    SELECT apr.debit_move_id AS line_id, apr.amount
+                    FROM account_partial_reconcile apr
+                    JOIN aging_line l ON l.id = apr.debit_move_id
+                    WHERE apr.create_date <= %(age_date)s
+                    UNION ALL
+                    SELECT apr.credit_move_id AS line_id, apr.amount
+                    FROM account_partial_reconcile apr
+                    JOIN aging_line l ON l.id = apr.credit_move_id
+                    WHERE apr.create_date <= %(age_date)s
+                ) p
+                GROUP BY p.line_id
+            ),
+            aging_amount AS (
+                SELECT l.*,
+                    CASE WHEN l.full_reconcile_id IS NULL
+                            AND l.amount_residual <= 0
+                        THEN %(sign)s * (COALESCE(p.amount, 0) - l.credit)
+                    WHEN l.full_reconcile_id IS NULL
+                            AND l.amount_residual >= 0
+                        THEN %(sign)s * (l.debit - COALESCE(p.amount, 0))
+                    WHEN l.full_reconcile_id IS NOT NULL
+                        THEN l.amount_residual
+                    END AS amount
+                FROM aging_line l
+                LEFT JOIN partial p ON p.line_id = l.id
+            )
+        """
+
+    def _get_aging_query(
+        self, age_date, companies=None, currency=None, use_store=False
+    ):
+        """Return the aging query and its parameters for ``age_date``.
+
+        The query works in a single pass over the open items of all
+        ``companies``: all buckets are derived from ``aging_amount`` (see
+        ``_get_aging_amount_query``), ``settled_line`` and
+        ``settled_counterpart`` report the fully reconciled payments whose
+        counterparts are dated after the aging date.
+
+        The amounts are in the currency of their company, or in ``currency``
+        when given: ``aging_rate`` holds the rate of each company at the
+        aging date, looked up once like ``res.currency._get_rates`` does,
+        and is joined to every row.
+        """
+        bucket_fields = self._get_aging_bucket_fields()
+        if self._aging_sign > 0:
+            settled_field, counterpart_field = "credit", "debit"
+        else:
+            settled_field, counterpart_field = "debit", "credit"
+        query = """
+            WITH {aging_amount},
+            aging_rate AS (
+                SELECT c.id AS company_id,
+                    COALESCE((
+                        SELECT r.rate FROM res_currency_rate r
+                        WHERE r.currency_id = COALESCE(
+                                %(currency_id)s, c.currency_id
+                            )
+                            AND r.name <= %(age_date)s
+                            AND (r.company_id IS NULL OR r.company_id = c.id)
+                        ORDER BY r.company_id, r.name DESC
+                        LIMIT 1
+                    ), 1.0) / COALESCE((
+                        SELECT r.rate FROM res_currency_rate r
+                        WHERE r.currency_id = c.currency_id
+                            AND r.name <= %(age_date)s
+                            AND (r.company_id IS NULL OR r.company_id = c.id)
+                        ORDER BY r.company_id, r.name DESC
+                        LIMIT 1
+                    ), 1.0) AS rate
+                FROM res_company c
+                WHERE c.id IN %(company_ids)s
+            ),
+            settled_line AS (
+                SELECT aml.id, aml.company_id, aml.partner_id, aml.create_uid,
+                    aml.date,
+                    aml.full_reconcile_id, aml.{settled} AS amount
+                FROM account_move_line aml
+                JOIN account_account ac ON ac.id = aml.account_id
+                JOIN account_account_type aat ON aat.id = ac.user_type_id
+                WHERE aat.type = %(account_type)s
+                    AND aml.company_id IN %(company_ids)s
+                    AND aml.date <= %(age_date)s
+                    AND aml.partner_id IS NOT NULL
+                    AND aml.full_reconcile_id IS NOT NULL
+                    AND aml.{settled} > 0
+            ),
+            settled_counterpart AS (
+                SELECT l.full_reconcile_id, SUM(l.{counterpart}) AS amount
+                FROM account_move_line l
+                WHERE l.date <= %(age_date)s
+                    AND l.full_reconcile_id IN (
+                        SELECT full_reconcile_id FROM settled_line
+                    )
+                GROUP BY l.full_reconcile_id
+            )
+            SELECT a.id, a.company_id, a.partner_id, a.salesman, a.date,
+                a.date AS date_due, a.invoice_ref,
+                a.days_due AS avg_days_overdue,
+                GREATEST(a.days_due, 0) AS max_days_overdue,
+                a.amount * r.rate AS total,
+                a.invoice_id,
+                a.inv_date_due,
+                b.bucket_id,
+                {bucket_amounts}
+            FROM aging_amount a
+            JOIN aging_rate r ON r.company_id = a.company_id
+            CROSS JOIN LATERAL (
+                SELECT (%(bucket_ids)s::integer[])[i.idx] AS bucket_id,
+                    (%(bucket_fields)s::varchar[])[i.idx] AS aging_field
+                FROM (
+                    SELECT width_bucket(
+                        a.days_due, %(bucket_days)s::integer[]
+                    ) + 1 AS idx
+                ) i
+            ) b
+            UNION ALL
+            SELECT s.id, s.company_id, s.partner_id, s.create_uid AS salesman,
+                s.date, s.date AS date_due, ' ' AS invoice_ref,
+                0 AS avg_days_overdue,
+                0 AS max_days_overdue,
+                CASE WHEN s.amount - c.amount > 0
+                    THEN -(s.amount - c.amount) * r.rate ELSE 0 END AS total,
+                NULL AS invoice_id,
+                s.date AS inv_date_due,
+                NULL AS bucket_id,
+                {settled_bucket_amounts}
+            FROM settled_line s
+            JOIN aging_rate r ON r.company_id = s.company_id
+            LEFT JOIN settled_counterpart c
+                ON c.full_reconcile_id = s.full_reconcile_id
+        """.format(
+            aging_amount=self._get_aging_amount_query(use_store=use_store),
+            bucket_amounts=",\n".join(
+                "CASE WHEN b.aging_field = '{field}' THEN a.amount * r.rate "
+                "ELSE 0 END "
+                "AS {field}".format(field=field)
+                for field in bucket_fields
+            ),
+            settled_bucket_amounts=",\n".join(
+                "0 AS {}".format(field) for field in bucket_fields
+            ),
+            settled=settled_field,
+            counterpart=counterpart_field,
+        )
+        return query, self._get_aging_query_params(
+            age_date, companies or self.env.company, currency
+        )
+
+    def _get_aging_export_columns(self):
+        """Return the (aging query column, label) exported, in order."""
+        return (
+            [
+                ("company_name", self._fields["company_id"].string),
+                ("partner_name", self._fields["partner_id"].string),
+                ("salesman_name", self._fields["salesman"].string),
+                ("invoice_ref", self._fields["invoice_ref"].string),
+                ("date", self._fields["date"].string),
+                ("inv_date_due", self._fields["inv_date_due"].string),
+                ("max_days_overdue", self._fields["max_days_overdue"].string),
+            ]
+            + [
+                (field, self._fields[field].string)
+                for field in self._get_aging_bucket_fields()
+            ]
+            + [("total", self._fields["total"].string)]
+        )
+
+    def _iter_aging_export(
+        self, age_date, companies=None, currency=None, chunk_size=None
+    ):
+        """Yield the aging rows at ``age_date`` in chunks of ``chunk_size``.
+
+        The rows are read straight from the aging query with a server-side
+        (named) cursor, so at most one chunk is held in memory whatever the
+        size of the ledger. No snapshot is written.
+        """
+        if not chunk_size:
+            chunk_size = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("partner_aging.export_chunk_size", 2000)
+            )
+        query, params = self._get_aging_query(
+            age_date,
+            companies,
+            currency,
+            use_store=self.env["res.partner.aging.entry"]._is_enabled(),
+        )
+        columns = [column for column, _label in self._get_aging_export_columns()]
+        # pylint: disable=sql-injection
+        export_query = """
+            SELECT {columns}
+            FROM (
+                SELECT aging.*, co.name AS company_name,
+                    p.name AS partner_name, sp.name AS salesman_name
+                FROM ({query}) aging
+                JOIN res_company co ON co.id = aging.company_id
+                JOIN res_partner p ON p.id = aging.partner_id
+                LEFT JOIN res_users su ON su.id = aging.salesman
+                LEFT JOIN res_partner sp ON sp.id = su.partner_id
+                WHERE aging.total != 0
+            ) aging
+            ORDER BY partner_name, partner_id, company_name, date, id
+        """.format(
+            columns=", ".join(columns), query=query
+        )
+        self.flush()
+        start, count = time.time(), 0
+        cursor = self.env.cr._cnx.cursor("partner_aging_export")
+        try:
+            cursor.itersize = chunk_size
+            cursor.execute(export_query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                count += len(rows)
+                yield rows
+        finally:
+            cursor.close()
+            elapsed = time.time() - start
+            _logger.info(
+                "%s: exported %d aging rows in %.2fs (%.0f rows/s)",
+                self._name,
+                count,
+                elapsed,
+                count / elapsed if elapsed else count,
+            )
+
+    def execute_aging_query(self, age_date=False, companies=None, currency=None):
+        """Compute the aging at ``age_date`` for ``companies``.
+
+        The lines of all the companies (default: the current one) are
+        computed in one query, one line per company and item. The amounts
+        are converted to ``currency`` when given, see ``_get_aging_query``.
+
+        The lines are inserted in a new snapshot with a single parameterized
+        INSERT ... SELECT, no DDL is involved. The open amounts come from the
+        incremental aging store when the ``partner_aging.use_aging_store``
+        system parameter is set.
+
+        The partner totals are aggregated from the lines right away in
+        ``res.partner.aging.partner``.
+
+        :return: the ``res.partner.aging.snapshot`` holding the lines
+        """
+        if not age_date:
+            age_date = fields.Date.context_today(self)
+        companies = companies or self.env.company
+        snapshot = self.env["res.partner.aging.snapshot"].create(
+            {
+                "age_date": age_date,
+                "company_id": self.env.company.id,
+                "company_ids": [(6, 0, companies.ids)],
+                "currency_id": currency.id if currency else False,
+                "aging_model": self._name,
+            }
+        )
+        query, params = self._get_aging_query(
+            age_date,
+            companies,
+            currency,
+            use_store=self.env["res.partner.aging.entry"]._is_enabled(),
+        )
+        params["snapshot_id"] = snapshot.id
+        # pylint: disable=sql-injection
+        self.env.cr.execute(
+            """INSERT INTO {table} (snapshot_id, move_line_id, {columns})
+            SELECT %(snapshot_id)s, aging.id, {columns}
+            FROM ({query}) aging
+            """.format(
+                table=self._table,
+                columns=", ".join(self._aging_columns),
+                query=query,
+            ),
+            params,
+        )
+        self.env["res.partner.aging.partner"]._rollup(snapshot)
+        return snapshot
@@ -13,16 +13,39 @@ class ResPartnerAgingDate(models.TransientModel):
         required=True,
         default=lambda self: fields.Date.context_today(self),
     )
+    company_ids = fields.Many2many(
+        "res.company",
+        string="Companies",
+        required=True,
+        default=lambda self: self.env.companies,
+    )
+    currency_id = fields.Many2one(
+        "res.currency",
+        "Reporting Currency",
+        help="Convert the amounts of all the companies to this currency, at "
+        "the rate of the aging date. Leave empty to keep the amounts in the "
+        "currency of their company.",
+    )
+
+    def _execute_aging_query(self, aging_model):
+        return self.env[aging_model].execute_aging_query(
+            age_date=self.age_date,
+            companies=self.company_ids,
+            currency=self.currency_id,
+        )
 
     def open_customer_aging(self):
         customer_aging = self.env["res.partner.aging.customer"]
         for res in self:
             ctx = self._context.copy()
             ctx.update({"age_date": res.age_date})
-            customer_aging.execute_aging_query(age_date=res.age_date)
+            snapshot = res._execute_aging_query(customer_aging._name)
             xmlid = "partner_aging.action_customer_aging_tree"
             action = self.env["ir.actions.act_window"]._for_xml_id(xmlid)
-            action["domain"] = [("total", "<>", 0.0000000)]
+            action["domain"] = [
+                ("snapshot_id", "=", snapshot.id),
+                ("total", "<>", 0.0000000),
+            ]
             action["context"] = ctx
             return action
 
@@ -31,10 +54,11 @@ class ResPartnerAgingDate(models.TransientModel):
         for res in self:
             ctx = self._context.copy()
             ctx.update({"age_date": res.age_date})
-            supplier_aging.execute_aging_query(age_date=res.age_date)
+            snapshot = res._execute_aging_query(supplier_aging._name)
             xmlid = "partner_aging.action_supplier_aging_tree"
             action = self.env["ir.actions.act_window"]._for_xml_id(xmlid)
             action["domain"] = [
+                ("snapshot_id", "=", snapshot.id),
                 "|",
                 "|",
                 "|",
@@ -51,3 +75,42 @@ class ResPartnerAgingDate(models.TransientModel):
             ]
             action["context"] = ctx
             return action
+
+    def _open_aging_partner(self, aging_model, xmlid):
+        self.ensure_one()
+        snapshot = self._execute_aging_query(aging_model)
+        action = self.env["ir.actions.act_window"]._for_xml_id(xmlid)
+        action["domain"] = [("snapshot_id", "=", snapshot.id)]
+        action["context"] = dict(self._context, age_date=self.age_date)
+        return action
+
+    def open_customer_aging_partner(self):
+        return self._open_aging_partner(
+            "res.partner.aging.customer",
+            "partner_aging.action_customer_aging_partner",
+        )
+
+    def open_supplier_aging_partner(self):
+        return self._open_aging_partner(
+            "res.partner.aging.supplier",
+            "partner_aging.action_supplier_aging_partner",
+        )
+
+    def _export_aging(self, aging):
+        self.ensure_one()
+        file_format = self._context.get("file_format") or "csv"
+        url = "/partner_aging/export/%s/%s?age_date=%s&company_ids=%s" % (
+            aging,
+            file_format,
+            self.age_date,
+            ",".join(str(company_id) for company_id in self.company_ids.ids),
+        )
+        if self.currency_id:
+            url += "&currency_id=%s" % self.currency_id.id
+        return {"type": "ir.actions.act_url", "url": url, "target": "self"}
+
+    def export_customer_aging(self):
+        return self._export_aging("customer")
+
+    def export_supplier_aging(self):
+        return self._export_aging("supplier")
@@ -0,0 +1,121 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models, tools
+
+
+class ResPartnerAgingPartner(models.Model):
+    """Aging totals by partner and salesperson of an aging snapshot.
+
+    Filled with one aggregated query right after the aging lines, so the
+    partner totals are read and grouped (e.g. by salesman) on the server
+    instead of loading every line in the web client. The lines without
+    partner are totalled together, and the salesperson is the one of the
+    lines, so the totals of any grouping add up to the ones of the lines.
+    """
+
+    _name = "res.partner.aging.partner"
+    _description = "Res Partner Aging by Partner"
+    _log_access = False
+    _order = "partner_name, id"
+
+    snapshot_id = fields.Many2one(
+        "res.partner.aging.snapshot",
+        "Snapshot",
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete="cascade",
+    )
+    company_id = fields.Many2one("res.company", "Company", readonly=True)
+    partner_id = fields.Many2one("res.partner", "Partner", readonly=True)
+    partner_name = fields.Char("Partner Name", readonly=True)
+    salesman = fields.Many2one("res.users", "Salesperson", readonly=True)
+    line_count = fields.Integer("Items", readonly=True)
+    max_days_overdue = fields.Integer(
+        "Days Outstanding", readonly=True, group_operator="max"
+    )
+    total = fields.Float("Total", readonly=True)
+    not_due = fields.Float("Not Due Yet", readonly=True)
+    days_due_01to30 = fields.Float("1/30", readonly=True)
+    days_due_31to60 = fields.Float("31/60", readonly=True)
+    days_due_61to90 = fields.Float("61/90", readonly=True)
+    days_due_91to120 = fields.Float("91/120", readonly=True)
+    days_due_121togr = fields.Float("+121", readonly=True)
+
+    def init(self):
+        # Index used by the partner keyset pagination, see ``read_page``
+        tools.create_index(
+            self.env.cr,
+            "res_partner_aging_partner_page_index",
+            self._table,
+            ["snapshot_id", "partner_name", "id"],
+        )
+
+    @api.model
+    def _rollup(self, snapshot):
+        """Aggregate the aging lines of ``snapshot`` by company, partner and
+        salesperson."""
+        aging = self.env[snapshot.aging_model]
+        bucket_fields = aging._get_aging_bucket_fields()
+        # pylint: disable=sql-injection
+        self.env.cr.execute(
+            """INSERT INTO res_partner_aging_partner (snapshot_id, company_id,
+                partner_id, partner_name, salesman, line_count,
+                max_days_overdue, total, {columns})
+            SELECT l.snapshot_id, l.company_id, l.partner_id,
+                COALESCE(p.name, ''), l.salesman,
+                COUNT(*),
+                MAX(l.max_days_overdue), SUM(l.total), {sums}
+            FROM {table} l
+            LEFT JOIN res_partner p ON p.id = l.partner_id
+            WHERE l.snapshot_id = %s
+            GROUP BY l.snapshot_id, l.company_id, l.partner_id, p.name, l.salesman
+            """.format(
+                table=aging._table,
+                columns=", ".join(bucket_fields),
+                sums=", ".join("SUM(l.{})".format(field) for field in bucket_fields),
+            ),
+            (snapshot.id,),
+        )
+
+    @api.model
+    def read_page(self, snapshot_id, field_names=None, after=None, limit=80):
+        """Read one page of partner totals, ordered by partner name.
+
+        Keyset pagination: ``after`` is the ``next`` key returned with the
+        previous page, so every page is an index range scan whatever its
+        position.
+
+        :return: dict with the ``records`` read and the ``next`` key, False
+                 on the last page
+        """
+        domain = [("snapshot_id", "=", snapshot_id)]
+        if after:
+            partner_name, last_id = after
+            domain += [
+                "|",
+                ("partner_name", ">", partner_name),
+                "&",
+                ("partner_name", "=", partner_name),
+                ("id", ">", last_id),
+            ]
+        field_names = list(field_names or []) + ["partner_name"]
+        records = self.search_read(domain, field_names, limit=limit)
+        next_key = False
+        if len(records) == limit:
+            next_key = [records[-1]["partner_name"], records[-1]["id"]]
+        return {"records": records, "next": next_key}
+
+    def open_aging_lines(self):
+        self.ensure_one()
+        snapshot = self.snapshot_id
+        action = self.env["ir.actions.act_window"]._for_xml_id(
+            self.env[snapshot.aging_model]._aging_action
+        )
+        action["domain"] = [
+            ("snapshot_id", "=", snapshot.id),
+            ("partner_id", "=", self.partner_id.id),
+        ]
+        action["context"] = dict(self.env.context, age_date=snapshot.age_date)
+        return action
@@ -0,0 +1,61 @@
+# Copyright 2012 Open Source Integrators
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+
+class ResPartnerAgingSnapshot(models.Model):
+    """One generation of aging lines, computed for a date and companies.
+
+    Every aging request gets its own snapshot, so users running the aging
+    at different dates at the same time do not share any data.
+    """
+
+    _name = "res.partner.aging.snapshot"
+    _description = "Res Partner Aging Snapshot"
+    _order = "id desc"
+
+    age_date = fields.Date("Aging Date", required=True, readonly=True)
+    company_id = fields.Many2one(
+        "res.company",
+        "Company",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+    )
+    company_ids = fields.Many2many(
+        "res.company",
+        "res_partner_aging_snapshot_company_rel",
+        "snapshot_id",
+        "company_id",
+        "Companies",
+        readonly=True,
+    )
+    currency_id = fields.Many2one(
+        "res.currency",
+        "Reporting Currency",
+        readonly=True,
+        help="Currency the amounts are converted to. Empty when the amounts "
+        "are in the currency of their company.",
+    )
+    aging_model = fields.Char("Aging Model", readonly=True)
+    user_id = fields.Many2one(
+        "res.users",
+        "User",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+    )
+
+    @api.model
+    def _gc_snapshots(self):
+        """Delete the snapshots older than the configured retention."""
+        hours = int(
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("partner_aging.snapshot_retention_hours", 24)
+        )
+        limit = fields.Datetime.now() - timedelta(hours=hours)
+        self.sudo().search([("create_date", "<", limit)]).unlink()